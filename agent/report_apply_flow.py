@@ -2,10 +2,12 @@ import argparse
 import os
 import json
 import asyncio
+import statistics
 import subprocess
+import time
 from pathlib import Path
 from urllib.parse import urlparse
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, Iterator, List, Optional
 
 # Load environment variables from .env file
 from dotenv import load_dotenv
@@ -15,22 +17,91 @@ if os.path.exists("../.env"):
 else:
     load_dotenv(dotenv_path=".env")
 
-from agent.src.browser_navigator import BrowserNavigator
-from agent.src.code_apply import apply_code_changes, parse_yaml_performance_report, convert_to_yaml
+from agent.src.ablation import (DEFAULT_BUDGET_S, DEFAULT_TOP_N, Ablation, format_ablation_table,
+                                measure_ablations, plan_ablations, rank_ablations)
+from agent.src.asset_cache import DOCUMENT_PATH, AssetManifest
+from agent.src.browser_navigator import CONFIGS, BrowserNavigator
+from agent.src.coverage import CoverageReport
+from agent.src.browser_pool import BrowserPool, format_timings
+from agent.src.network_archive import NetworkArchive, archive_dir_for
+from agent.src.git_variants import GitObjectReader
+from agent.src.retest_scheduler import retest_branches
+from agent.src.sampling import SamplingPlan, VariantSamples, sample_variants
+from agent.src.metrics import compute_metrics
+from agent.src.llm_cache import CachedLLM, LLMCache
+from agent.src.measurement_cache import MeasurementCache, measurements_path_for
+from agent.src.code_apply import RateLimiter, apply_suggestions_parallel
+from agent.src.flow_options import (DEFAULT_APPLY_WORKERS, DEFAULT_CAPTURE_MAX_AGE_H, DEFAULT_CONCURRENCY,
+                                    DEFAULT_LLM_RPM, add_flow_arguments)
+from agent.src.parse_report import SuggestionStreamParser, stream_suggestions
+from agent.src.tracing import tracer
 from agent.src.utils import read_report_with_check, url_to_folder_name
 from crewai import LLM
 
+DECISION_LABELS = {
+    'better': '✅',
+    'worse': '❌',
+    'equal': '➖',
+    'undecided': '❔',
+}
+
 
 class ReportApplyFlow:
     """Flow to apply performance suggestions from a report to a website"""
     
-    def __init__(self, report_path: str, url: str, device: str = 'desktop', headless: bool = True):
-        self.report_path = Path(report_path)
+    def __init__(self, report_path: Optional[str], url: str, device: str = 'desktop', headless: bool = True,
+                 replay: bool = True, concurrency: int = DEFAULT_CONCURRENCY, sampling: SamplingPlan = None,
+                 llm_cache: bool = True, apply_workers: int = DEFAULT_APPLY_WORKERS,
+                 llm_rpm: int = DEFAULT_LLM_RPM,
+                 measurement_cache: bool = True, recapture: bool = False, serve_encoding: str = 'auto',
+                 ablation: bool = False, ablation_top: int = DEFAULT_TOP_N,
+                 ablation_budget_s: float = DEFAULT_BUDGET_S, coverage: bool = False,
+                 coverage_prune: bool = False, capture_max_age_h: Optional[float] = DEFAULT_CAPTURE_MAX_AGE_H):
+        # May be None until a concurrently generated report is announced
+        self.report_path = Path(report_path) if report_path else None
         self.url = url
         self.device = device
         self.headless = headless
         self.output_dir = None
         self.suggestions = []
+        self.parse_errors = []
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be at least 1, got {concurrency}")
+        self.concurrency = concurrency
+        self.comparison_wall_ms = 0.0
+        self.sampling = sampling or SamplingPlan()
+        self.llm_cache = LLMCache(enabled=llm_cache)
+        self.llm = None
+        self.apply_workers = apply_workers
+        self.rate_limiter = RateLimiter(llm_rpm)
+        self.apply_results = {}
+        self.measurement_cache = measurement_cache
+        self.recapture = recapture
+        # Older captures are fetched live again instead of replayed; None replays any age
+        self.capture_max_age_h = capture_max_age_h
+        # Encoding that sets the throttled transfer size of fulfilled responses
+        self.serve_encoding = serve_encoding
+        # What-if experiments on master before suggesting, ranked by measured LCP impact
+        self.ablation = ablation
+        self.ablation_top = ablation_top
+        self.ablation_budget_s = ablation_budget_s
+        self.ablation_results = []
+        self.ablation_baseline_ms = None
+        # JS/CSS coverage of master up to LCP, mapped onto the saved assets
+        self.coverage = coverage or coverage_prune
+        self.coverage_prune = coverage_prune
+        self.coverage_snapshot = None
+        self.coverage_report = None
+        # Generated variants compared next to the perf-fix branches
+        self.extra_branches = []
+        # Replay-mode capture load, reused as the first master sample
+        self.capture_sample = None
+        self.pool = BrowserPool(headless=headless, max_contexts=concurrency)
+        self.measurement_timings = []
+        # Retests replay the recorded page load unless running live
+        self.replay = replay
+        self.archive = None
+        self.git_reader = None
         
     def read_report(self) -> Dict[str, Any]:
         """Read the report generated by index.js"""
@@ -54,16 +125,30 @@ class ReportApplyFlow:
             
             return report_data
     
+    @tracer.traced('flow.fetch_website_assets')
     async def fetch_website_assets(self):
         """Use BrowserNavigator to fetch and save website assets"""
+        if self.can_replay_capture():
+            return await self._replay_capture()
+        age_h = self._capture_age_h() if (Path("output") / url_to_folder_name(self.url) / '.git').exists() else None
+        if age_h is not None and not self.recapture and self.capture_max_age_h is not None:
+            print(f"\n⚠️ The capture on master is {age_h:.0f}h old (more than --capture-max-age "
+                  f"{self.capture_max_age_h:g}h); fetching the site live again")
         print(f"\n🌐 Fetching website assets from: {self.url}")
         
+        # Record every response so retests can replay the page load offline
+        self.archive = NetworkArchive(self._archive_dir())
+        
         navigator = BrowserNavigator(
             url=self.url,
             device=self.device,
             headless=self.headless,
             auto_save_assets=True,
-            serve_cached_assets=False
+            serve_cached_assets=False,
+            pool=self.pool,
+            archive=self.archive,
+            archive_mode='record',
+            serve_encoding=self.serve_encoding
         )
         
         try:
@@ -74,18 +159,19 @@ class ReportApplyFlow:
             self.output_dir = navigator.ensure_output_dirs(folder_name)
             
             # Navigate and collect performance data
-            perf_data, metrics, response = await navigator.eval_performance(self.output_dir)
+            perf_data, metrics, response = await navigator.eval_performance(self.output_dir, label='capture')
             
-            # Save page DOM
-            page_content = await navigator.page.content()
-            page_dom_path = self.output_dir / "page_dom.html"
-            with open(page_dom_path, "w") as f:
-                f.write(page_content)
+            # Save the served HTML; retests serve each branch's edited copy
+            page_dom_path = await navigator.save_document(self.output_dir, response)
             
             print(f"✅ Assets saved to: {self.output_dir}")
             print(f"✅ Page DOM saved to: {page_dom_path}")
             
-            # Initialize git repo in output directory
+            # Commit the asset header manifest together with the assets
+            if navigator.manifest:
+                navigator.manifest.save()
+            
+            # Initialize git repo in output directory, or commit a re-capture onto master
             self._init_git_repo()
             
             # Allow time for any pending requests to complete
@@ -95,6 +181,109 @@ class ReportApplyFlow:
             
         finally:
             await navigator.close()
+            self._record_timings('capture', navigator)
+    
+    def can_replay_capture(self) -> bool:
+        """An earlier capture left both an archive and the asset repo behind, and is recent enough"""
+        output_dir = Path("output") / url_to_folder_name(self.url)
+        if not (self.replay and not self.recapture and (output_dir / '.git').exists()
+                and NetworkArchive(self._archive_dir()).exists()):
+            return False
+        age_h = self._capture_age_h()
+        return self.capture_max_age_h is None or (age_h is not None and age_h <= self.capture_max_age_h)
+    
+    def _capture_age_h(self) -> Optional[float]:
+        """Hours since the capture on master was committed"""
+        output_dir = Path("output") / url_to_folder_name(self.url)
+        committed = subprocess.run(['git', 'log', '-1', '--format=%ct', 'master'], cwd=output_dir,
+                                   capture_output=True, text=True).stdout.strip()
+        return (time.time() - int(committed)) / 3600 if committed.isdigit() else None
+    
+    async def _replay_capture(self):
+        """Load the page from the archive and master's assets, exactly like a master retest.
+        
+        Nothing needs fetching, so this load is kept as the first baseline
+        sample instead of being thrown away.
+        """
+        self.output_dir = Path("output") / url_to_folder_name(self.url)
+        captured = subprocess.run(['git', 'log', '-1', '--format=%cr', 'master'], cwd=self.output_dir,
+                                  capture_output=True, text=True).stdout.strip()
+        print(f"\n⚠️ Reusing the capture of {self.url} committed to master {captured or 'earlier'} and its "
+              f"archive; the live site may have changed since. Pass --recapture to fetch it again.")
+        start = time.perf_counter()
+        perf_data, metrics, _ = await self.retest_performance('master', label='capture')
+        page_metrics = compute_metrics(perf_data)
+        if page_metrics.lcp is not None:
+            self.capture_sample = {
+                'branch': 'master',
+                'lcp_ms': page_metrics.lcp,
+                'metrics': page_metrics,
+                'perf_data': perf_data,
+                'elapsed_ms': (time.perf_counter() - start) * 1000,
+            }
+            print(f"✅ Capture load counts as a master sample (LCP {page_metrics.lcp:.0f}ms)")
+        return perf_data, metrics
+    
+    def discard_capture_sample(self, reason: str):
+        """Keep the replayed capture out of the samples, e.g. when other work shared the CPU with it"""
+        if self.capture_sample:
+            print(f"⚠️ Capture load not counted as a master sample: {reason}")
+            self.capture_sample = None
+    
+    def capture_summary(self) -> Optional[Dict[str, Any]]:
+        """The reused capture load with its timeline, for the results summary"""
+        if not self.capture_sample:
+            return None
+        return {
+            'branch': 'master',
+            'lcp_ms': round(self.capture_sample['lcp_ms']),
+            'metrics': self.capture_sample['metrics'].to_dict(),
+            'elapsed_ms': round(self.capture_sample['elapsed_ms']),
+            'timeline': self.capture_sample['perf_data'],
+        }
+    
+    def _archive_dir(self) -> Path:
+        return archive_dir_for(Path("output") / url_to_folder_name(self.url))
+    
+    def _replay_archive(self):
+        """Archive to replay retests from, or None when running live"""
+        if not self.replay:
+            return None
+        if self.archive is None:
+            self.archive = NetworkArchive(self._archive_dir())
+        return self.archive if self.archive.exists() else None
+    
+    def _archive_digest(self) -> Optional[str]:
+        """What stored samples of replayed loads depend on besides the tree; None when live"""
+        archive = self._replay_archive()
+        return archive.digest() if archive else None
+    
+    def _record_timings(self, label: str, navigator: BrowserNavigator):
+        """Keep browser launch/teardown apart from page-load time"""
+        self.measurement_timings.append({'label': label, **navigator.timings})
+        print(f"⏱️  {label}: {format_timings(navigator.timings)}")
+    
+    def _reader(self) -> GitObjectReader:
+        if self.git_reader is None:
+            self.git_reader = GitObjectReader(self.output_dir)
+        return self.git_reader
+    
+    async def _variant(self, branch_name: str = None):
+        """Read-only view of a branch, served without checking it out"""
+        if not branch_name:
+            return None
+        return await asyncio.to_thread(self._reader().view, branch_name)
+    
+    async def _tree(self, branch_name: str) -> str:
+        return await asyncio.to_thread(self._reader().tree, branch_name)
+    
+    async def close(self):
+        """Shut down the shared browser pool and git reader"""
+        if self.git_reader:
+            self.git_reader.close()
+        await self.pool.close()
+        print(f"🧹 Browser pool stats: {self.pool.summary()}")
+        print(f"🧠 {self.llm_cache.summary()}")
     
     def _init_git_repo(self):
         """Initialize git repository in output directory"""
@@ -105,86 +294,146 @@ class ReportApplyFlow:
             subprocess.run(['git', 'commit', '-m', 'Initial commit with original assets'], 
                          cwd=self.output_dir, check=True)
             subprocess.run(['git', 'branch', '-M', 'master'], cwd=self.output_dir, check=True)
+        else:
+            self._commit_recapture()
     
-    def parse_suggestions(self, report_content: str) -> List[Dict[str, Any]]:
-        """Parse suggestions from the report content"""
+    def _commit_recapture(self):
+        """Commit a fresh capture onto master, which retests and aider worktrees start from.
+        
+        Only what the capture writes is staged; suggestions, ablation and
+        coverage files in the working tree stay out of master.
+        """
+        head = subprocess.run(['git', 'rev-parse', '--abbrev-ref', 'HEAD'], cwd=self.output_dir,
+                              capture_output=True, text=True, check=True).stdout.strip()
+        if head != 'master':
+            raise RuntimeError(f"{self.output_dir} has {head} checked out; check out master to commit the re-capture")
+        captured = [path for path in ('assets', 'page_dom.html', 'assets.manifest.json')
+                    if (self.output_dir / path).exists()]
+        subprocess.run(['git', 'add', '-A', '--', *captured], cwd=self.output_dir, check=True)
+        unchanged = subprocess.run(['git', 'diff', '--cached', '--quiet'], cwd=self.output_dir).returncode == 0
+        if unchanged:
+            print("📦 Re-capture matches master; nothing to commit")
+            return
+        subprocess.run(['git', 'commit', '-q', '-m', f"Recapture original assets ({time.strftime('%Y-%m-%d %H:%M')})"],
+                       cwd=self.output_dir, check=True)
+        print(f"📦 Committed the re-capture onto master in: {self.output_dir}")
+    
+    def _get_llm(self):
+        """Azure OpenAI client, created once and answered from the cache when possible"""
+        if self.llm is None:
+            self.llm = CachedLLM(LLM(
+                model="azure/gpt-4o",
+                base_url=os.getenv("AZURE_API_BASE"),
+                api_key=os.getenv("AZURE_API_KEY")
+            ), self.llm_cache)
+        return self.llm
+    
+    def stream_suggestions(self, report_content: str) -> Iterator[Dict[str, Any]]:
+        """Yield suggestions one by one while the LLM is still writing the rest"""
         print(f"\n🔍 Parsing suggestions from report...")
+        self.suggestions = []
+        parser = SuggestionStreamParser()
         
-        # Use LLM to convert report to structured YAML format
-        # Configure for Azure OpenAI
-        llm = LLM(
-            model="azure/gpt-4o",
-            base_url=os.getenv("AZURE_API_BASE"),
-            api_key=os.getenv("AZURE_API_KEY")
-        )
-        yaml_response = convert_to_yaml(report_content, llm)
-        suggestions = parse_yaml_performance_report(yaml_response)
+        # Open while the LLM streams; the consumer's work between items runs inside it
+        with tracer.span('flow.stream_suggestions') as span:
+            for suggestion in stream_suggestions(report_content, self._get_llm(), parser):
+                self.suggestions.append(suggestion)
+                print(f"--- Suggestion {len(self.suggestions)}: {suggestion.get('summary', 'No summary')}")
+                yield suggestion
+            span.set(suggestions=len(self.suggestions), errors=len(parser.errors))
         
-        print(f"✅ Found {len(suggestions)} suggestions")
-        self.suggestions = suggestions
+        for error in parser.errors:
+            print(f"⚠️ Skipped malformed suggestion #{error['item']}: {error['error']}")
+        self.parse_errors = parser.errors
+        print(f"✅ Found {len(self.suggestions)} suggestions")
         
         # Save structured suggestions to JSON file
-        if suggestions and self.output_dir:
+        if self.suggestions and self.output_dir:
             # Save the YAML response
             yaml_file = self.output_dir / "suggestions.yaml"
             with open(yaml_file, 'w') as f:
-                f.write(yaml_response)
+                f.write(parser.yaml_text)
             print(f"💾 Saved YAML suggestions to: {yaml_file}")
             
             # Save the parsed JSON version
             suggestions_file = self.output_dir / "parsed_suggestions.json"
             with open(suggestions_file, 'w') as f:
-                json.dump(suggestions, f, indent=2)
+                json.dump(self.suggestions, f, indent=2)
             print(f"💾 Saved structured suggestions to: {suggestions_file}")
-        
-        return suggestions
     
-    def apply_suggestions(self):
-        """Apply each suggestion as a separate git commit"""
-        print(f"\n🔧 Applying {len(self.suggestions)} suggestions...")
+    def parse_suggestions(self, report_content: str) -> List[Dict[str, Any]]:
+        """Parse suggestions from the report content"""
+        return list(self.stream_suggestions(report_content))
+    
+    @tracer.traced('flow.apply_suggestions')
+    def apply_suggestions(self, suggestions: Iterable[Dict[str, Any]] = None, checkpoint=None):
+        """Apply suggestions concurrently, each on its own branch and worktree.
         
-        for idx, suggestion in enumerate(self.suggestions, 1):
-            print(f"\n--- Suggestion {idx}/{len(self.suggestions)} ---")
-            print(f"Summary: {suggestion.get('summary', 'No summary')}")
-            
-            # Generate unique ID for this suggestion
-            suggestion_id = f"perf-fix-{idx}"
-            
-            # Apply the code changes
-            apply_code_changes(
-                output_dir=str(self.output_dir),
-                suggestion=suggestion,
-                model_name="azure/gpt-4o",
-                suggestion_id=suggestion_id
-            )
-            
-            print(f"✅ Applied suggestion in branch: {suggestion_id}")
+        `suggestions` may be a stream; each one is handed to a worker as soon
+        as it arrives. With a `StageCheckpoint`, branches an interrupted run
+        already applied from the same suggestion are kept, not re-applied.
+        """
+        print(f"\n🔧 Applying suggestions with {self.apply_workers} workers...")
+        results = apply_suggestions_parallel(
+            output_dir=str(self.output_dir),
+            suggestions=self.suggestions if suggestions is None else suggestions,
+            model_name="azure/gpt-4o",
+            workers=self.apply_workers,
+            cache=self.llm_cache,
+            rate_limiter=self.rate_limiter,
+            notes_for=self.coverage_report.notes_for if self.coverage_report else None,
+            reuse=checkpoint.reuse_applied if checkpoint else None,
+            on_result=checkpoint.mark_applied if checkpoint else None
+        )
+        
+        for result in results:
+            self.apply_results[result['branch']] = result
+            if result['status'] == 'applied':
+                print(f"✅ Applied suggestion in branch: {result['branch']} ({result['duration_s']}s)")
+            else:
+                reason = result.get('error') or result['status']
+                print(f"❌ Failed to apply suggestion in branch: {result['branch']} ({reason})")
+        return results
     
-    async def retest_performance(self, branch_name: str = None):
-        """Re-test performance with modified assets"""
-        print(f"\n🔄 Re-testing performance with modified assets...")
+    async def retest_performance(self, branch_name: str = None, label: str = None,
+                                 ablation: Ablation = None, coverage: bool = False):
+        """Re-test performance with modified assets, optionally with one resource ablated.
         
-        # Checkout specific branch if provided
-        if branch_name:
-            subprocess.run(['git', 'checkout', branch_name], 
-                         cwd=self.output_dir, check=True)
+        With `coverage`, the load's JS/CSS coverage is kept in `coverage_snapshot`.
+        """
+        print(f"\n🔄 Re-testing performance with modified assets...")
         
+        # Serve the branch's assets from git objects, leaving the working tree alone
+        variant = await self._variant(branch_name)
+        archive = self._replay_archive()
         navigator = BrowserNavigator(
             url=self.url,
             device=self.device,
             headless=self.headless,
             auto_save_assets=False,
-            serve_cached_assets=True  # Use modified local assets
+            serve_cached_assets=True,  # Use modified local assets
+            pool=self.pool,
+            archive=archive,
+            archive_mode='replay',
+            variant=variant,
+            serve_encoding=self.serve_encoding,
+            ablation=ablation,
+            coverage=coverage
         )
         
         try:
-            await navigator.setup()
-            
-            # Re-test performance
-            perf_data, metrics, response = await navigator.eval_performance(self.output_dir)
-            
-            # Extract key metrics
-            lcp_score = self._extract_lcp_score(perf_data)
+            async with tracer.span('flow.retest', branch=branch_name or 'current', label=label) as span:
+                await navigator.setup()
+                
+                # Re-test performance
+                perf_data, metrics, response = await navigator.eval_performance(
+                    self.output_dir, label=label or branch_name or 'current')
+                
+                # Extract key metrics
+                lcp_score = self._extract_lcp_score(perf_data)
+                span.set(lcp_ms=round(lcp_score))
+                if navigator.coverage:
+                    self.coverage_snapshot = await navigator.coverage.finish()
             
             print(f"✅ Re-test complete. LCP: {lcp_score}ms")
             
@@ -195,60 +444,269 @@ class ReportApplyFlow:
             
         finally:
             await navigator.close()
+            self._record_timings(label or branch_name or 'current', navigator)
+    
+    @tracer.traced('flow.compare_branches')
+    async def compare_branches(self, suggestion_count: int) -> List[Dict[str, Any]]:
+        """Sample master and every perf-fix branch, interleaved, and compare LCP"""
+        print("\n📊 Performance comparison:")
+        print("-" * 50)
+        
+        all_branches = [f"perf-fix-{idx}" for idx in range(1, suggestion_count + 1)] + self.extra_branches
+        # Branches whose apply step failed hold nothing new to measure
+        candidates = [b for b in all_branches
+                      if self.apply_results.get(b, {}).get('status', 'applied') == 'applied']
+        await asyncio.to_thread(self._warn_unserved_documents, candidates)
+        start = time.perf_counter()
+        
+        async def measure_round(branches):
+            async with tracer.span('sampling.round', branches=len(branches)):
+                results, _ = await retest_branches(self, branches, self.concurrency)
+            return results
+        
+        # Unchanged variants reuse samples from earlier runs
+        measurements = MeasurementCache(measurements_path_for(self.output_dir), enabled=self.measurement_cache)
+        archive = self._archive_digest()
+        keys = {}
+        for branch in ['master'] + candidates:
+            try:
+                keys[branch] = measurements.key(await self._tree(branch), self.url,
+                                                self._device_config(), archive)
+            except subprocess.CalledProcessError:
+                continue
+        prior = {branch: measurements.get(key) for branch, key in keys.items()}
+        if self.capture_sample:
+            prior['master'] = prior.get('master', []) + [self.capture_sample]
+        
+        variants = await sample_variants(measure_round, 'master', candidates, self.sampling, prior)
+        self.comparison_wall_ms = (time.perf_counter() - start) * 1000
+        
+        for branch, key in keys.items():
+            measurements.put(key, variants[branch], self.sampling.max_samples)
+        measurements.save()
+        reused = {b: v.cached for b, v in variants.items() if v.cached}
+        if reused:
+            print(f"♻️  Reused stored samples: {', '.join(f'{b} ({n})' for b, n in reused.items())}")
+        
+        original = variants['master']
+        if not original.samples:
+            raise RuntimeError(f"Could not measure master: {original.errors[-1] if original.errors else 'no samples'}")
+        alpha = self.sampling.alpha
+        base = original.summary(alpha)
+        print(f"Original LCP: {base['median']:.0f}ms "
+              f"(p75 {base['p75']:.0f}ms, n={base['samples']}{self._cached_note(original)})")
+        performance_results = [self._result_row('Original', original, base, base['median'], 'baseline')]
+        
+        for idx, branch_name in enumerate(all_branches, 1):
+            if branch_name not in variants:
+                print(f"{branch_name}: Skipped - suggestion was not applied")
+                continue
+            variant = variants[branch_name]
+            if not variant.samples:
+                print(f"{branch_name}: Error - {variant.errors[-1] if variant.errors else 'no samples'}")
+                continue
+            summary = variant.summary(alpha)
+            improvement = base['median'] - summary['median']
+            percent = (improvement / base['median']) * 100 if base['median'] > 0 else 0
+            
+            print(f"{branch_name} LCP: {summary['median']:.0f}ms "
+                  f"({DECISION_LABELS[variant.decision]} "
+                  f"{improvement:+.0f}ms, {percent:+.1f}%) "
+                  f"p75 {summary['p75']:.0f}ms, n={summary['samples']}{self._cached_note(variant)}, {variant.decision}")
+            
+            version = f'Optimization {idx}' if idx <= suggestion_count else branch_name
+            performance_results.append(self._result_row(
+                version, variant, summary, base['median'], variant.decision))
+        
+        print(f"⏱️  Compared {len(candidates) + 1} variants in {self.comparison_wall_ms / 1000:.1f}s "
+              f"(concurrency {self.concurrency})")
+        return performance_results
+    
+    def _device_config(self, ablation: Ablation = None) -> Dict[str, Any]:
+        """Everything about the page load, besides the tree, that stored samples depend on"""
+        config = {**CONFIGS[self.device], 'serve_encoding': self.serve_encoding}
+        if ablation:
+            config['ablation'] = ablation.key
+        return config
+    
+    def _captured_document(self):
+        """Master's captured document URL and HTML, when retests serve it"""
+        view = self._reader().view('master')
+        entry = AssetManifest.from_bytes(view.read("assets.manifest.json")).entries.get(DOCUMENT_PATH)
+        html = view.read("page_dom.html")
+        return (entry['url'], html) if entry and html else None
+    
+    def _warn_unserved_documents(self, branches: List[str]):
+        """Branches whose page_dom.html edits cannot be measured, because master's capture has no document entry"""
+        if self._captured_document() is not None:
+            return
+        edited = [branch for branch in branches
+                  if subprocess.run(['git', 'diff', '--quiet', 'master', branch, '--', 'page_dom.html'],
+                                    cwd=self.output_dir).returncode == 1]
+        if edited:
+            print(f"⚠️ {', '.join(edited)} edit page_dom.html, but this capture predates serving the document, "
+                  f"so those edits are not measured. Run again with --recapture to measure them.")
+    
+    @tracer.traced('flow.ablate_resources')
+    async def ablate_resources(self, perf_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Block or defer third-party origins and render-blocking resources one at a time.
+        
+        Each experiment is an interleaved variant of master, sampled like a
+        branch until its LCP difference is decided or the time budget runs
+        out. Returns the impact table, largest LCP saving first.
+        """
+        document = await asyncio.to_thread(self._captured_document)
+        ablations = plan_ablations(perf_data, self.url, self.ablation_top, document)
+        if not ablations:
+            print("\n🧪 Nothing to ablate: no LCP or no third-party and render-blocking resources")
+            return []
+        print(f"\n🧪 Running {len(ablations)} ablation experiments "
+              f"(budget {self.ablation_budget_s:.0f}s, concurrency {self.concurrency})...")
+        by_key = {ablation.key: ablation for ablation in ablations}
+        
+        async def measure_round(keys):
+            async with tracer.span('ablation.round', experiments=len(keys)):
+                return await measure_ablations(self, keys, by_key, self.concurrency)
+        
+        # Stored samples of unchanged experiments count, like those of branches
+        measurements = MeasurementCache(measurements_path_for(self.output_dir), enabled=self.measurement_cache)
+        archive = self._archive_digest()
+        tree = await self._tree('master')
+        keys = {ablation.key: measurements.key(tree, self.url, self._device_config(ablation), archive)
+                for ablation in ablations}
+        prior = {name: measurements.get(key) for name, key in keys.items()}
+        prior['master'] = measurements.get(measurements.key(tree, self.url, self._device_config(), archive))
+        if self.capture_sample:
+            prior['master'] = prior['master'] + [self.capture_sample]
+        
+        # Every experiment is its own test against master: split alpha across them too
+        plan = SamplingPlan(min_samples=self.sampling.min_samples, max_samples=self.sampling.max_samples,
+                            warmup=self.sampling.warmup, alpha=self.sampling.alpha / len(ablations),
+                            equivalence_ms=self.sampling.equivalence_ms)
+        start = time.perf_counter()
+        variants = await sample_variants(measure_round, 'master', list(by_key), plan, prior,
+                                         budget_s=self.ablation_budget_s)
+        for name, key in keys.items():
+            measurements.put(key, variants[name], self.sampling.max_samples)
+        measurements.save()
+        
+        self.ablation_results = rank_ablations(ablations, variants, ci_level=100 * (1 - plan.alpha_per_look))
+        master = variants['master'].samples
+        self.ablation_baseline_ms = statistics.median(master) if master else None
+        print(f"🧪 Ablation impact ({time.perf_counter() - start:.1f}s, "
+              f"{100 * (1 - plan.alpha_per_look):.4g}% confidence per experiment):")
+        for row in self.ablation_results:
+            print(f"- {row['change']}: {row['lcp_saved_ms']:+d}ms LCP saved "
+                  f"({DECISION_LABELS[row['decision']]} n={row['samples']})")
+        skipped = len(ablations) - len(self.ablation_results)
+        if skipped:
+            print(f"⚠️ {skipped} experiments got no samples (errors or budget exhausted)")
+        
+        with open(self.output_dir / "ablation.json", 'w') as f:
+            json.dump(self.ablation_results, f, indent=2)
+        return self.ablation_results
+    
+    @tracer.traced('flow.capture_coverage')
+    async def capture_coverage(self) -> Optional[CoverageReport]:
+        """Load master once with JS/CSS coverage and map unused bytes onto the saved assets"""
+        print("\n🧮 Capturing JS/CSS coverage up to LCP...")
+        await self.retest_performance('master', label='coverage', coverage=True)
+        if not self.coverage_snapshot:
+            print("⚠️ No coverage was recorded")
+            return None
+        report = CoverageReport.build(self.coverage_snapshot, self.output_dir, self.url)
+        totals = report.to_dict()
+        path = report.save(self.output_dir / "coverage.json")
+        print(f"🧮 {totals['unused_bytes'] / 1024:.0f}KB of {totals['total_bytes'] / 1024:.0f}KB JS/CSS "
+              f"unused during the load (saved to: {path}):")
+        print(report.summary())
+        self.coverage_report = report
+        
+        if self.coverage_prune:
+            branch = report.prune_css(self.output_dir)
+            if branch:
+                print(f"✂️  Committed stylesheets without unused rules to branch: {branch}")
+                self.extra_branches.append(branch)
+        return report
+    
+    def with_measurements(self, report_content: str) -> str:
+        """Report text with the measured ablation and coverage tables appended for the suggestion stage"""
+        tables = []
+        if self.ablation_results:
+            tables.append(format_ablation_table(self.ablation_results, self.ablation_baseline_ms))
+        if self.coverage_report:
+            tables.append(self.coverage_report.table())
+        tables = [table for table in tables if table]
+        if not tables:
+            return report_content
+        return "\n\n".join([report_content] + tables)
+    
+    @staticmethod
+    def _cached_note(variant: VariantSamples) -> str:
+        return f", {variant.cached} stored" if variant.cached else ""
+    
+    @staticmethod
+    def _result_row(version: str, variant: VariantSamples, summary: Dict[str, Any],
+                    baseline_median: float, decision: str) -> Dict[str, Any]:
+        improvement = baseline_median - summary['median']
+        percent = (improvement / baseline_median) * 100 if baseline_median > 0 else 0
+        return {
+            'version': version,
+            'branch': variant.branch,
+            'lcp_ms': round(summary['median']),
+            'improvement_ms': round(improvement),
+            'improvement_percent': round(percent, 1),
+            'lcp_p75_ms': round(summary['p75']),
+            'lcp_ci_low_ms': round(summary['ci_low']),
+            'lcp_ci_high_ms': round(summary['ci_high']),
+            'samples': summary['samples'],
+            'decision': decision,
+            **variant.metric_medians(),
+            'lcp_samples': [round(x) for x in variant.samples],
+        }
     
     def _extract_lcp_score(self, perf_data: Dict) -> float:
         """Extract LCP score from performance data"""
-        if 'data' in perf_data:
-            # Last item's end time is typically the LCP
-            return perf_data['data'][-1]['end']
-        return 0
+        return compute_metrics(perf_data).lcp or 0
     
     async def run(self):
         """Execute the complete flow"""
         print("🚀 Starting Report Apply Flow\n")
-        
+        try:
+            await self._run()
+        finally:
+            await self.close()
+    
+    async def _run(self):
         # Step 1: Read the report
         report_data = self.read_report()
         
         # Step 2: Fetch website assets
-        await self.fetch_website_assets()
+        async with tracer.span('stage.capture', profile=True):
+            perf_data, _ = await self.fetch_website_assets()
         
-        # Step 3: Parse suggestions from report
+        # Step 2b: Measure which resources actually move LCP
+        if self.ablation:
+            async with tracer.span('stage.ablation', profile=True):
+                await self.ablate_resources(perf_data)
+        if self.coverage:
+            async with tracer.span('stage.coverage', profile=True):
+                await self.capture_coverage()
+        
+        # Step 3 + 4: Parse suggestions from the report and apply each as it arrives
         if isinstance(report_data, dict) and 'content' in report_data:
-            suggestions = self.parse_suggestions(report_data['content'])
+            report_content = report_data['content']
         else:
             # Handle other report formats
-            suggestions = self.parse_suggestions(str(report_data))
+            report_content = str(report_data)
+        report_content = self.with_measurements(report_content)
+        with tracer.span('stage.suggest+apply', profile=True):
+            self.apply_suggestions(self.stream_suggestions(report_content))
         
-        # Step 4: Apply suggestions
-        if suggestions:
-            self.apply_suggestions()
-            
-            # Step 5: Re-test performance for each branch
-            print("\n📊 Performance comparison:")
-            print("-" * 50)
-            
-            # Test original
-            original_data, _, original_lcp = await self.retest_performance("master")
-            print(f"Original LCP: {original_lcp}ms")
-            
-            # Test each suggestion branch
-            for idx in range(1, len(suggestions) + 1):
-                branch_name = f"perf-fix-{idx}"
-                try:
-                    _, _, modified_lcp = await self.retest_performance(branch_name)
-                    improvement = original_lcp - modified_lcp
-                    percent = (improvement / original_lcp) * 100 if original_lcp > 0 else 0
-                    
-                    print(f"{branch_name} LCP: {modified_lcp}ms "
-                          f"({'✅ ' if improvement > 0 else '❌ '}"
-                          f"{improvement:+.0f}ms, {percent:+.1f}%)")
-                except Exception as e:
-                    print(f"{branch_name}: Error - {str(e)}")
-            
-            # Return to master branch
-            subprocess.run(['git', 'checkout', 'master'], 
-                         cwd=self.output_dir, check=True)
+        # Step 5: Re-test performance for each branch
+        if self.suggestions:
+            async with tracer.span('stage.compare', profile=True):
+                await self.compare_branches(len(self.suggestions))
         
         print("\n✅ Flow complete!")
         print(f"📁 All changes saved in: {self.output_dir}")
@@ -277,18 +735,41 @@ async def main():
         action='store_true',
         help='Run browser in headless mode'
     )
+    add_flow_arguments(parser)
     
     args = parser.parse_args()
+    trace_dir = Path("final_output") / url_to_folder_name(args.url)
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    tracer.configure(profiler=args.profile, profile_dir=trace_dir / f"profiles_{timestamp}")
     
     # Create and run the flow
     flow = ReportApplyFlow(
         report_path=args.report_path,
         url=args.url,
         device=args.device,
-        headless=args.headless
+        headless=args.headless,
+        replay=not args.live,
+        concurrency=args.concurrency,
+        sampling=SamplingPlan(max_samples=args.samples, warmup=args.warmup),
+        llm_cache=not args.no_llm_cache,
+        apply_workers=args.apply_workers,
+        llm_rpm=args.llm_rpm,
+        measurement_cache=not args.no_measurement_cache,
+        recapture=args.recapture,
+        serve_encoding=args.serve_encoding,
+        ablation=args.ablation,
+        ablation_top=args.ablation_top,
+        ablation_budget_s=args.ablation_budget,
+        coverage=args.coverage,
+        coverage_prune=args.coverage_prune,
+        capture_max_age_h=args.capture_max_age
     )
     
-    await flow.run()
+    try:
+        await flow.run()
+    finally:
+        trace_path = tracer.export(trace_dir / f"trace_{timestamp}.json")
+        print(f"🧵 Trace saved to: {trace_path}")
 
 
 if __name__ == "__main__":
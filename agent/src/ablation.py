@@ -0,0 +1,253 @@
+import asyncio
+import re
+import statistics
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urldefrag, urljoin, urlparse
+
+from agent.src.metrics import compute_metrics
+from agent.src.sampling import VariantSamples
+from agent.src.timeline import Timeline
+
+BLOCK = 'block'
+DEFER = 'defer'
+
+# Render-blocking resources from the timeline to experiment with
+DEFAULT_TOP_N = 5
+# Seconds after which no new ablation round is started
+DEFAULT_BUDGET_S = 180
+
+# Resource types that can sit in the render path of the LCP element
+RENDER_BLOCKING_TYPES = ('script', 'link', 'css', 'img', 'other')
+
+_SCRIPT_TAG = re.compile(r'<script\b[^>]*>', re.IGNORECASE)
+_LINK_TAG = re.compile(r'<link\b[^>]*>', re.IGNORECASE)
+_ATTR = re.compile(r'''([\w:-]+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s"'>]+))?''')
+
+
+def _origin(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return None
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def _attrs(tag: str) -> Dict[str, str]:
+    body = re.sub(r'^<\w+', '', tag).rstrip('>').rstrip('/')
+    return {name.lower(): (value or '').strip('"\'') for name, value in _ATTR.findall(body)}
+
+
+@dataclass(frozen=True)
+class Ablation:
+    """One what-if change to the page load: block or defer a resource or a whole origin"""
+    kind: str  # 'origin' or 'resource'
+    target: str
+    action: str
+    resource_type: Optional[str] = None
+    size: int = 0
+
+    @property
+    def key(self) -> str:
+        return f"{self.action}:{self.target}"
+
+    @property
+    def label(self) -> str:
+        what = 'third-party origin' if self.kind == 'origin' else (self.resource_type or 'resource')
+        return f"{self.action} {what} {self.target}"
+
+    def matches(self, url: str) -> bool:
+        if self.kind == 'origin':
+            return _origin(url) == self.target
+        return urldefrag(url)[0] == self.target
+
+    def rewrite(self, html: bytes, base_url: str) -> bytes:
+        """Make matching `<script src>` tags `defer` and matching stylesheets non-blocking.
+
+        Only changes the document for `defer`; resources a script inserts
+        later are out of reach and leave the document unchanged.
+        """
+        if self.action != DEFER:
+            return html
+        text = html.decode('utf-8', errors='surrogateescape')
+
+        def script(match):
+            tag = match.group(0)
+            attrs = _attrs(tag)
+            if ('src' not in attrs or 'defer' in attrs or 'async' in attrs
+                    or attrs.get('type') == 'module' or not self.matches(urljoin(base_url, attrs['src']))):
+                return tag
+            return tag[:-1].rstrip() + ' defer>'
+
+        def stylesheet(match):
+            tag = match.group(0)
+            attrs = _attrs(tag)
+            if (attrs.get('rel', '').lower() != 'stylesheet' or 'href' not in attrs
+                    or not self.matches(urljoin(base_url, attrs['href']))):
+                return tag
+            # Loads without blocking render, then applies like the original
+            tag = re.sub(r'''\smedia\s*=\s*("[^"]*"|'[^']*'|[^\s>]+)''', '', tag, flags=re.IGNORECASE)
+            end = -2 if tag.endswith('/>') else -1
+            return tag[:end].rstrip() + ''' media="print" onload="this.media='all'">'''
+
+        text = _SCRIPT_TAG.sub(script, text)
+        text = _LINK_TAG.sub(stylesheet, text)
+        return text.encode('utf-8', errors='surrogateescape')
+
+
+def plan_ablations(perf_data: Dict[str, Any], page_url: str, top_n: int = DEFAULT_TOP_N,
+                   document: Optional[Tuple[str, bytes]] = None) -> List[Ablation]:
+    """Experiments worth running for one baseline timeline.
+
+    Every third-party origin that transferred bytes before LCP is blocked
+    as a whole, largest first. The `top_n` render-blocking resources (the
+    blocking chain to LCP first, then the longest script/stylesheet
+    loads before LCP) are each blocked, and deferred too when `document`
+    (captured URL and HTML) holds a tag for them. The LCP resource itself
+    and its origin are never ablated.
+    """
+    timeline = Timeline.from_report(perf_data)
+    lcp = timeline.lcp
+    if lcp is None:
+        return []
+    lcp_url = compute_metrics(perf_data).lcp_url
+    skip_origins = {_origin(page_url), _origin(lcp_url)}
+    ablations = []
+
+    by_origin = sorted(timeline.bytes_per_origin(before=lcp).items(), key=lambda item: -item[1])
+    for origin, size in by_origin:
+        if origin not in skip_origins and origin.startswith('http'):
+            ablations.append(Ablation('origin', origin, BLOCK, size=size))
+
+    values = timeline.strings.values
+    before = [int(i) for i in timeline.finished_before(lcp)
+              if values[timeline.type_id[i]] in RENDER_BLOCKING_TYPES]
+    longest = sorted(before, key=lambda i: -timeline.duration[i])
+    seen = {urldefrag(lcp_url)[0]} if lcp_url else set()
+    picked = []
+    for i in timeline.blocking_chain() + longest:
+        url = values[timeline.url_id[i]]
+        if not url or not url.startswith('http') or values[timeline.type_id[i]] == 'navigation':
+            continue
+        url = urldefrag(url)[0]
+        if url in seen:
+            continue
+        seen.add(url)
+        picked.append(i)
+        if len(picked) >= top_n:
+            break
+
+    for i in picked:
+        url = urldefrag(values[timeline.url_id[i]])[0]
+        resource_type = values[timeline.type_id[i]]
+        size = int(timeline.size[i])
+        ablations.append(Ablation('resource', url, BLOCK, resource_type, size))
+        deferred = Ablation('resource', url, DEFER, resource_type, size)
+        if document and deferred.rewrite(document[1], document[0]) != document[1]:
+            ablations.append(deferred)
+    return ablations
+
+
+async def measure_ablations(flow, keys: List[str], ablations: Dict[str, Ablation],
+                            concurrency: int = 2) -> List[Dict[str, Any]]:
+    """Measure master once per key, with that key's ablation applied ('master' runs unchanged).
+
+    Shaped like `retest_branches`, so the results feed `sample_variants`.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def measure(key: str) -> Dict[str, Any]:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                perf_data, _, _ = await flow.retest_performance('master', label=key, ablation=ablations.get(key))
+                page_metrics = compute_metrics(perf_data)
+                if page_metrics.lcp is None:
+                    return {'branch': key, 'error': 'No LCP entry in the timeline'}
+                return {
+                    'branch': key,
+                    'lcp_ms': page_metrics.lcp,
+                    'metrics': page_metrics,
+                    'elapsed_ms': (time.perf_counter() - start) * 1000,
+                }
+            except Exception as e:
+                return {'branch': key, 'error': str(e)}
+
+    return list(await asyncio.gather(*(measure(key) for key in keys)))
+
+
+def _lcp_element(variant: VariantSamples) -> Optional[str]:
+    urls = Counter(m.lcp_url for m in variant.metrics if m is not None)
+    return urls.most_common(1)[0][0] if urls else None
+
+
+def rank_ablations(ablations: List[Ablation], variants: Dict[str, VariantSamples],
+                   baseline: str = 'master', ci_level: float = None) -> List[Dict[str, Any]]:
+    """Impact table, largest LCP saving first; unmeasured ablations are left out.
+
+    `ci_level` is the confidence level (in percent) the decisions and
+    intervals were computed at, recorded in every row.
+    """
+    base = variants[baseline]
+    if not base.samples:
+        return []
+    base_median = statistics.median(base.samples)
+    base_element = _lcp_element(base)
+    rows = []
+    for ablation in ablations:
+        variant = variants.get(ablation.key)
+        if variant is None or not variant.samples:
+            continue
+        median = statistics.median(variant.samples)
+        element = _lcp_element(variant)
+        rows.append({
+            'change': ablation.label,
+            'action': ablation.action,
+            'kind': ablation.kind,
+            'target': ablation.target,
+            'resource_type': ablation.resource_type,
+            'bytes': ablation.size,
+            'lcp_ms': round(median),
+            'lcp_saved_ms': round(base_median - median),
+            'ci_low_ms': round(variant.diff_ci[0]) if variant.diff_ci else None,
+            'ci_high_ms': round(variant.diff_ci[1]) if variant.diff_ci else None,
+            'ci_level': ci_level,
+            'samples': len(variant.samples),
+            'decision': variant.decision,
+            # A different LCP element makes the saving less directly comparable
+            'lcp_element_changed': bool(element and base_element and element != base_element),
+        })
+    rows.sort(key=lambda row: -row['lcp_saved_ms'])
+    return rows
+
+
+def _ci_label(rows: List[Dict[str, Any]]) -> str:
+    level = rows[0].get('ci_level')
+    return f"{level:.4g}% CI" if level else "CI"
+
+
+def format_ablation_table(rows: List[Dict[str, Any]], baseline_lcp_ms: float = None) -> str:
+    """Markdown section for the report the suggestions are extracted from"""
+    if not rows:
+        return ""
+    lines = [
+        "## Measured resource impact (ablation experiments)",
+        "",
+        "Each row re-ran the page with one resource or third-party origin blocked or deferred. "
+        "'LCP saved' is the measured median change against the unchanged page"
+        + (f" (LCP {baseline_lcp_ms:.0f}ms)" if baseline_lcp_ms is not None else "")
+        + "; 'better' means the saving is statistically significant, with the confidence level "
+        "corrected for the number of experiments and interim looks. "
+        "Recommendations touching resources with large measured savings should come first; "
+        "resources whose removal changes nothing are not worth optimizing for LCP.",
+        "",
+        f"| Change | LCP saved | {_ci_label(rows)} | Decision | Bytes | Note |",
+        "|---|---|---|---|---|---|",
+    ]
+    for row in rows:
+        ci = (f"{row['ci_low_ms']}..{row['ci_high_ms']}ms" if row['ci_low_ms'] is not None else "-")
+        note = "LCP element changed" if row['lcp_element_changed'] else ""
+        lines.append(f"| {row['change']} | {row['lcp_saved_ms']:+d}ms | {ci} | {row['decision']} "
+                     f"| {row['bytes']} | {note} |")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,106 @@
+import json
+import mimetypes
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+# Response headers worth replaying for a locally served asset
+KEPT_HEADERS = {'content-type', 'cache-control', 'access-control-allow-origin', 'vary'}
+
+# Manifest key of the main document; page_dom.html sits next to assets/
+DOCUMENT_PATH = '../page_dom.html'
+
+
+class AssetManifest:
+    """Response headers of saved assets, keyed by their path under assets/"""
+
+    def __init__(self, path: Path = None, entries: Dict[str, Dict] = None):
+        self.path = Path(path) if path else None
+        self.entries: Dict[str, Dict] = entries or {}
+        self.dirty = False
+        if entries is None and self.path and self.path.exists():
+            with open(self.path) as f:
+                self.entries = json.load(f)
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes]) -> "AssetManifest":
+        """Read-only manifest loaded from a git blob"""
+        return cls(entries=json.loads(data) if data else {})
+
+    def record(self, rel_path: str, url: str, headers: Dict[str, str]):
+        self.entries[rel_path] = {
+            'url': url,
+            'headers': {k.lower(): v for k, v in headers.items() if k.lower() in KEPT_HEADERS},
+            # Saved bodies are decoded; the origin's encoding still sets the throttled transfer size
+            'encoding': next((v for k, v in headers.items() if k.lower() == 'content-encoding'), None),
+        }
+        self.dirty = True
+
+    def headers_for(self, rel_path: str) -> Dict[str, str]:
+        entry = self.entries.get(rel_path)
+        if entry:
+            return dict(entry['headers'])
+        content_type, _ = mimetypes.guess_type(rel_path)
+        if content_type and content_type.startswith('text/'):
+            content_type += '; charset=utf-8'
+        return {'content-type': content_type} if content_type else {}
+
+    def encoding_for(self, rel_path: str) -> Optional[str]:
+        entry = self.entries.get(rel_path)
+        return entry.get('encoding') if entry else None
+
+    def save(self):
+        if self.dirty and self.path:
+            with open(self.path, 'w') as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            self.dirty = False
+
+
+class AssetCache:
+    """In-memory LRU of asset bytes, invalidated when the file on disk changes"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Path, tuple]" = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, path: Path) -> Optional[bytes]:
+        """Return the file's bytes, or None if it does not exist"""
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self._drop(path)
+            return None
+
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._entries.get(path)
+        if cached and cached[0] == signature:
+            self._entries.move_to_end(path)
+            self.stats['hits'] += 1
+            return cached[1]
+
+        self.stats['misses'] += 1
+        body = path.read_bytes()
+        self.put(path, signature, body)
+        return body
+
+    def put(self, path: Path, signature: tuple, body: bytes):
+        self._drop(path)
+        if len(body) > self.max_bytes:
+            return
+        self._entries[path] = (signature, body)
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.stats['evictions'] += 1
+
+    def _drop(self, path: Path):
+        cached = self._entries.pop(path, None)
+        if cached:
+            self.size -= len(cached[1])
+
+
+# Shared by every navigator in the process; entries revalidate against disk
+default_cache = AssetCache()
@@ -0,0 +1,222 @@
+import asyncio
+import csv
+import json
+import os
+import random
+import sys
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlparse
+
+import requests
+
+from agent.src.pipeline_stages import read_handshake
+from agent.src.utils import url_to_folder_name
+
+# Per-URL status in the state store
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+RESULT_FIELDS = ['url', 'status', 'attempts', 'suggestions', 'baseline_lcp_ms', 'best_branch',
+                 'best_lcp_ms', 'improvement_ms', 'improvement_percent', 'decision', 'summary', 'error']
+
+
+def load_urls(path: str) -> List[str]:
+    """URLs from a sitemap (XML), a JSON array or a plain list, one per line"""
+    text = Path(path).read_text()
+    stripped = text.lstrip()
+    if stripped.startswith('<'):
+        urls = _sitemap_urls(text)
+    elif stripped.startswith('['):
+        urls = json.loads(text)
+    else:
+        urls = [line.strip() for line in text.splitlines()
+                if line.strip() and not line.strip().startswith('#')]
+    # Keep the first occurrence of each URL
+    return list(dict.fromkeys(urls))
+
+
+def split_folder_collisions(urls: List[str]) -> Tuple[List[str], Dict[str, str]]:
+    """URLs with an output folder of their own, and each later URL mapped to the one whose folder it shares.
+
+    `url_to_folder_name` keeps three path levels and 100 characters, and
+    pipelines sharing a folder would clobber each other's asset repo.
+    """
+    owners: Dict[str, str] = {}
+    unique, collisions = [], {}
+    for url in urls:
+        folder = url_to_folder_name(url)
+        if folder in owners:
+            collisions[url] = owners[folder]
+        else:
+            owners[folder] = url
+            unique.append(url)
+    return unique, collisions
+
+
+def _sitemap_urls(xml_text: str) -> List[str]:
+    root = ET.fromstring(xml_text)
+    locs = [el.text.strip() for el in root.iter() if el.tag.endswith('loc') and el.text]
+    if not root.tag.endswith('sitemapindex'):
+        return locs
+    # A sitemap index only lists further sitemaps
+    urls = []
+    for loc in locs:
+        response = requests.get(loc, timeout=30)
+        response.raise_for_status()
+        urls.extend(_sitemap_urls(response.text))
+    return urls
+
+
+class BatchState:
+    """Progress of every URL in a batch, saved to disk after each change.
+
+    A URL marked done is never run again, so an interrupted batch picks up
+    where it stopped. URLs left `running` by a crash go back to pending.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.urls: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                self.urls = json.load(f).get('urls', {})
+        for entry in self.urls.values():
+            if entry['status'] == RUNNING:
+                entry['status'] = PENDING
+
+    def get(self, url: str) -> Dict[str, Any]:
+        return self.urls.setdefault(url, {'status': PENDING, 'attempts': 0})
+
+    def update(self, url: str, **fields):
+        self.get(url).update(fields, updated=time.time())
+        self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'urls': self.urls}, f, indent=2)
+        tmp.replace(self.path)
+
+
+class BatchRunner:
+    """Runs `run.py pipeline` for many URLs through a bounded worker pool.
+
+    At most `workers` pipelines run at once and at most `per_host` per
+    host. A failed URL is retried up to `retries` times with exponential
+    backoff and jitter, resuming after the stages its earlier attempt
+    finished (`--resume`). Each pipeline runs in its own process, logs to
+    `<log_dir>/<folder>.log` and announces its summary file with a JSON
+    handshake line.
+    """
+
+    def __init__(self, state: BatchState, pipeline_args: List[str], log_dir: Path,
+                 workers: int = 4, per_host: int = 1, retries: int = 2, backoff_s: float = 30):
+        self.state = state
+        self.pipeline_args = pipeline_args
+        self.log_dir = Path(log_dir)
+        self.workers = asyncio.Semaphore(workers)
+        self.per_host = per_host
+        self.host_limits: Dict[str, asyncio.Semaphore] = {}
+        self.retries = retries
+        self.backoff_s = backoff_s
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self.host_limits:
+            self.host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self.host_limits[host]
+
+    async def _attempt(self, url: str) -> Dict[str, Any]:
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        log_path = self.log_dir / f"{url_to_folder_name(url)}.log"
+        cmd = [sys.executable, "run.py", "pipeline", "--url", url, *self.pipeline_args, "--handshake", "--resume"]
+        with open(log_path, 'a') as log:
+            log.write(f"\n$ {' '.join(cmd)}\n")
+            event, returncode, stderr = await read_handshake(cmd, 'pipeline', lambda line: log.write(line + "\n"))
+            if stderr:
+                log.write(stderr + "\n")
+        if event is None:
+            return {'error': stderr.splitlines()[-1] if stderr else f"pipeline exited with status {returncode}"}
+        return event
+
+    async def run_url(self, url: str):
+        entry = self.state.get(url)
+        while entry['status'] != DONE and entry['attempts'] <= self.retries:
+            if entry['attempts']:
+                delay = self.backoff_s * 2 ** (entry['attempts'] - 1) * random.uniform(0.8, 1.2)
+                print(f"🔁 Retrying {url} in {delay:.0f}s (attempt {entry['attempts'] + 1})")
+                await asyncio.sleep(delay)
+            async with self._host_limit(url), self.workers:
+                self.state.update(url, status=RUNNING, attempts=entry['attempts'] + 1)
+                print(f"▶️  {url}")
+                start = time.perf_counter()
+                event = await self._attempt(url)
+                elapsed = round(time.perf_counter() - start, 1)
+            if event.get('error'):
+                self.state.update(url, status=FAILED, error=event['error'], duration_s=elapsed)
+                print(f"❌ {url}: {event['error']} ({elapsed}s)")
+            else:
+                self.state.update(url, status=DONE, error=None, duration_s=elapsed,
+                                  summary=event.get('summary'), suggestions=event.get('suggestions'))
+                print(f"✅ {url} ({elapsed}s)")
+
+    async def run(self, urls: List[str]):
+        todo = [url for url in urls if self.state.get(url)['status'] != DONE]
+        print(f"📦 Batch: {len(urls)} URLs, {len(urls) - len(todo)} already done, {len(todo)} to run")
+        # Give URLs that ran out of retries in an earlier session a fresh budget
+        for url in todo:
+            if self.state.get(url)['attempts'] > self.retries:
+                self.state.get(url)['attempts'] = 0
+        self.state.save()
+        await asyncio.gather(*(self.run_url(url) for url in todo))
+
+
+def result_row(url: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+    """One aggregated row: baseline LCP and the best-performing branch of a URL"""
+    row = {'url': url, 'status': entry['status'], 'attempts': entry['attempts'],
+           'suggestions': entry.get('suggestions'), 'summary': entry.get('summary'),
+           'error': entry.get('error')}
+    summary_path = entry.get('summary')
+    if not summary_path or not os.path.exists(summary_path):
+        return row
+    with open(summary_path) as f:
+        results = json.load(f).get('performance_results', [])
+    baseline = next((r for r in results if r['version'] == 'Original'), None)
+    branches = [r for r in results if r['version'] != 'Original' and r.get('lcp_ms') is not None]
+    if baseline:
+        row['baseline_lcp_ms'] = baseline['lcp_ms']
+    if branches:
+        best = max(branches, key=lambda r: r.get('improvement_ms') or 0)
+        row.update(best_branch=best['branch'], best_lcp_ms=best['lcp_ms'],
+                   improvement_ms=best.get('improvement_ms'),
+                   improvement_percent=best.get('improvement_percent'),
+                   decision=best.get('decision'))
+    return row
+
+
+def write_results(state: BatchState, urls: List[str], csv_path: Path) -> List[Dict[str, Any]]:
+    """Aggregate every URL's outcome into one CSV and print it as a table"""
+    rows = [result_row(url, state.get(url)) for url in urls]
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    columns = ['url', 'status', 'baseline_lcp_ms', 'best_branch', 'best_lcp_ms', 'improvement_percent', 'decision']
+    table = [[str(row.get(c) if row.get(c) is not None else '-') for c in columns] for row in rows]
+    widths = [max(len(c), *(len(r[i]) for r in table)) if table else len(c) for i, c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)).rstrip())
+    for r in table:
+        print("  ".join(v.ljust(w) for v, w in zip(r, widths)).rstrip())
+
+    done = sum(1 for row in rows if row['status'] == DONE)
+    print(f"\n✅ {done}/{len(rows)} URLs done, results saved to: {csv_path}")
+    return rows
@@ -0,0 +1,406 @@
+import asyncio
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import yaml
+
+from agent.src.browser_navigator import BrowserNavigator
+from agent.src.browser_pool import BrowserPool
+from agent.src.fixture_site import SCENARIOS, STOREFRONT, FixtureSite
+from agent.src.llm_cache import CachedLLM, LLMCache
+from agent.src.measurement_cache import measurements_path_for
+from agent.src.metrics import compute_metrics
+from agent.src.network_archive import archive_dir_for
+from agent.src.pipeline_stages import PipelineStages
+from agent.src.sampling import SamplingPlan, percentile
+from agent.src.utils import url_to_folder_name
+
+BENCH_DIR = Path("final_output") / "benchmarks"
+
+# A change must move a metric by more than both of these to count as a regression
+REGRESSION_RATIO = 0.10
+REGRESSION_MIN_MS = 20
+
+# Scripted stand-ins for the aider edits of the end-to-end run, one per
+# suggestion of the stubbed LLM reply, with the comparison outcome each
+# must produce on the storefront page
+E2E_EDITS = [
+    {
+        'summary': "Inject the hero image without waiting",
+        'reasoning': "The hero is the LCP element and app.js holds it back for 800ms.",
+        'technical_implementation': "Set HERO_DELAY_MS to 0 in app.js.",
+        'metadata': {'impact': 'high', 'complexity': 'low', 'affected_metrics': ['LCP']},
+        'file': 'assets/storefront/app.js',
+        'old': "var HERO_DELAY_MS = 800;",
+        'new': "var HERO_DELAY_MS = 0;",
+        'expected': 'better',
+    },
+    {
+        'summary': "Let the headline render with a fallback font",
+        'reasoning': "font-display: block hides the headline until the web font arrives.",
+        'technical_implementation': "Use font-display: swap in app.css.",
+        'metadata': {'impact': 'low', 'complexity': 'low', 'affected_metrics': ['FCP']},
+        'file': 'assets/storefront/app.css',
+        'old': "font-display: block;",
+        'new': "font-display: swap;",
+        # The hero, not the headline, is the LCP element
+        'expected': 'equal',
+    },
+    {
+        'summary': "Hide the hero image on first paint",
+        'reasoning': "Deliberately harmful edit: LCP falls back to the font-blocked headline.",
+        'technical_implementation': "Set .hero to display: none in app.css.",
+        'metadata': {'impact': 'low', 'complexity': 'low', 'affected_metrics': ['LCP']},
+        'file': 'assets/storefront/app.css',
+        'old': ".hero { display: block;",
+        'new': ".hero { display: none;",
+        'expected': 'worse',
+    },
+    {
+        'summary': "Put the hero image in the HTML",
+        'reasoning': "Markup-level fix: the hero no longer waits for app.js to insert it.",
+        'technical_implementation': "Add the hero <img> to #hero-slot in page_dom.html.",
+        'metadata': {'impact': 'high', 'complexity': 'low', 'affected_metrics': ['LCP']},
+        'file': 'page_dom.html',
+        'old': '<div id="hero-slot"></div>',
+        'new': ('<div id="hero-slot"><img class="hero" alt="" elementtiming="lcp" '
+                'src="/static/hero.png?bytes=400000"></div>'),
+        # Only measurable when retests serve the branch's document
+        'expected': 'better',
+    },
+]
+
+STUB_REPORT = """# Performance report (benchmark stub)
+
+The hero image is injected late by app.js, and the headline font blocks rendering.
+"""
+
+
+class StubLLM(CachedLLM):
+    """Streams a canned reply in small chunks, standing in for the model"""
+
+    def __init__(self, reply: str, chunk_size: int = 64, chunk_delay_s: float = 0.005):
+        super().__init__(llm=None, cache=LLMCache(enabled=False))
+        self.reply = reply
+        self.chunk_size = chunk_size
+        self.chunk_delay_s = chunk_delay_s
+
+    def call(self, messages, *args, **kwargs) -> str:
+        return self.reply
+
+    def stream(self, messages):
+        for offset in range(0, len(self.reply), self.chunk_size):
+            time.sleep(self.chunk_delay_s)
+            yield self.reply[offset:offset + self.chunk_size]
+
+
+def stub_reply(edits: List[Dict[str, Any]] = E2E_EDITS) -> str:
+    fields = ('summary', 'reasoning', 'technical_implementation', 'metadata')
+    suggestions = [{k: edit[k] for k in fields} for edit in edits]
+    return f"```yaml\n{yaml.safe_dump(suggestions, sort_keys=False)}```\n"
+
+
+def _median(values: List[float]) -> Optional[float]:
+    return round(statistics.median(values), 1) if values else None
+
+
+def _p95(values: List[float]) -> Optional[float]:
+    return round(percentile(values, 95), 1) if values else None
+
+
+async def measure_once(site: FixtureSite, pool: BrowserPool, scenario: str, device: str,
+                       out_dir: Path) -> Dict[str, Any]:
+    """One collector measurement of a fixture page next to its element-timing ground truth"""
+    navigator = BrowserNavigator(url=site.url(scenario), device=device, headless=True, pool=pool)
+    started = time.perf_counter()
+    try:
+        await navigator.setup()
+        perf_data, _, _ = await navigator.eval_performance(out_dir)
+        truth = await navigator.page.evaluate("window.__groundTruth || []")
+    finally:
+        await navigator.close()
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    lcp = compute_metrics(perf_data).lcp
+    truth_ms = max((e['renderTime'] for e in truth if e['id'] == 'lcp'), default=None)
+    timings = navigator.timings
+    sample = {
+        'lcp_ms': round(lcp, 1) if lcp is not None else None,
+        'truth_ms': round(truth_ms, 1) if truth_ms is not None else None,
+        'error_ms': round(lcp - truth_ms, 1) if lcp is not None and truth_ms is not None else None,
+        'completion': navigator.completion['reason'],
+        'wall_ms': round(wall_ms, 1),
+        'launch_ms': round(timings.get('launch_ms', 0), 1),
+        'page_load_ms': round(timings.get('page_load_ms', 0), 1),
+        'teardown_ms': round(timings.get('teardown_ms', 0), 1),
+    }
+    # Time spent waiting for the measurement to settle once LCP was final
+    if lcp is not None:
+        sample['after_lcp_ms'] = round(timings.get('page_load_ms', 0) - lcp, 1)
+    return sample
+
+
+def summarize_scenario(samples: List[Dict[str, Any]], floor_ms: float) -> Dict[str, Any]:
+    errors = [abs(s['error_ms']) for s in samples if s['error_ms'] is not None]
+    lcps = [s['lcp_ms'] for s in samples if s['lcp_ms'] is not None]
+    return {
+        'samples': len(samples),
+        'lcp_median_ms': _median(lcps),
+        'truth_median_ms': _median([s['truth_ms'] for s in samples if s['truth_ms'] is not None]),
+        'abs_error_median_ms': _median(errors),
+        'abs_error_p95_ms': _p95(errors),
+        'abs_error_max_ms': round(max(errors), 1) if errors else None,
+        'missing_lcp': len(samples) - len(lcps),
+        'below_floor': sum(1 for v in lcps if v < floor_ms),
+        'deadline_hits': sum(1 for s in samples if s['completion'] == 'deadline'),
+        'wall_median_ms': _median([s['wall_ms'] for s in samples]),
+        'page_load_median_ms': _median([s['page_load_ms'] for s in samples]),
+        'after_lcp_median_ms': _median([s['after_lcp_ms'] for s in samples if 'after_lcp_ms' in s]),
+        'setup_median_ms': _median([s['launch_ms'] for s in samples]),
+        'teardown_median_ms': _median([s['teardown_ms'] for s in samples]),
+    }
+
+
+async def run_accuracy(site: FixtureSite, scenarios: Iterable[str], device: str = 'desktop',
+                       runs: int = 5, warmup: int = 1) -> Dict[str, Any]:
+    """Collector accuracy and per-measurement overhead on every scenario.
+
+    Scenarios are measured round-robin so drift on the machine spreads over
+    all of them; `warmup` loads of the first scenario absorb the browser
+    launch and are discarded.
+    """
+    scenarios = list(scenarios)
+    samples: Dict[str, List[Dict[str, Any]]] = {name: [] for name in scenarios}
+    pool = BrowserPool(headless=True, max_contexts=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(tmp)
+        try:
+            for _ in range(warmup):
+                await measure_once(site, pool, scenarios[0], device, out_dir)
+            for run in range(1, runs + 1):
+                for name in scenarios:
+                    sample = await measure_once(site, pool, name, device, out_dir)
+                    samples[name].append(sample)
+                    print(f"📏 {name} #{run}: LCP {sample['lcp_ms']}ms, truth {sample['truth_ms']}ms "
+                          f"(error {sample['error_ms']}ms), {sample['wall_ms']:.0f}ms wall")
+        finally:
+            await pool.close()
+
+    results = {}
+    for name in scenarios:
+        scenario = SCENARIOS[name]
+        results[name] = {
+            'description': scenario.description,
+            'floor_ms': scenario.floor_ms,
+            'summary': summarize_scenario(samples[name], scenario.floor_ms),
+            'samples': samples[name],
+        }
+    every = [s for name in scenarios for s in samples[name]]
+    errors = [abs(s['error_ms']) for s in every if s['error_ms'] is not None]
+    overall = {
+        'abs_error_median_ms': _median(errors),
+        'abs_error_p95_ms': _p95(errors),
+        'wall_median_ms': _median([s['wall_ms'] for s in every]),
+        'after_lcp_median_ms': _median([s['after_lcp_ms'] for s in every if 'after_lcp_ms' in s]),
+        'below_floor': sum(r['summary']['below_floor'] for r in results.values()),
+        'deadline_hits': sum(r['summary']['deadline_hits'] for r in results.values()),
+        'missing_lcp': sum(r['summary']['missing_lcp'] for r in results.values()),
+    }
+    return {'scenarios': results, 'overall': overall}
+
+
+def _run_git(args: List[str], cwd: Path) -> subprocess.CompletedProcess:
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True)
+
+
+def _import_flow():
+    # Deferred: the flow pulls in crewai and aider, which the accuracy run doesn't need
+    from agent.report_apply_flow import ReportApplyFlow
+
+    class BenchmarkFlow(ReportApplyFlow):
+        """The real flow with the LLM and aider replaced by canned suggestions and scripted edits"""
+
+        def _get_llm(self):
+            if self.llm is None:
+                self.llm = StubLLM(stub_reply())
+            return self.llm
+
+        def apply_suggestions(self, suggestions=None):
+            results = []
+            for idx, suggestion in enumerate(self.suggestions if suggestions is None else suggestions, 1):
+                edit = next(e for e in E2E_EDITS if e['summary'] == suggestion['summary'])
+                results.append(scripted_edit(self.output_dir, f"perf-fix-{idx}", edit))
+            for result in results:
+                self.apply_results[result['branch']] = result
+            return results
+
+    return BenchmarkFlow
+
+
+def scripted_edit(output_dir: Path, branch: str, edit: Dict[str, Any]) -> Dict[str, Any]:
+    """Commit one text replacement on `branch` (from master), shaped like an apply result"""
+    from agent.src.code_apply import worktree_root
+    started = time.perf_counter()
+    worktree = worktree_root(output_dir) / branch
+    _run_git(["worktree", "add", "--force", "-B", branch, str(worktree), "master"], output_dir)
+    try:
+        path = worktree / edit['file']
+        text = path.read_text()
+        if edit['old'] not in text:
+            raise ValueError(f"{edit['file']} does not contain {edit['old']!r}")
+        path.write_text(text.replace(edit['old'], edit['new']))
+        _run_git(["commit", "-qam", edit['summary']], worktree)
+    finally:
+        _run_git(["worktree", "remove", "--force", str(worktree)], output_dir)
+    return {'suggestion_id': branch, 'branch': branch, 'files': [edit['file']], 'edited': [edit['file']],
+            'returncode': None, 'status': 'applied', 'duration_s': round(time.perf_counter() - started, 1)}
+
+
+def _reset_output(url: str):
+    """Remove everything an earlier end-to-end run left for the fixture page"""
+    from agent.src.code_apply import worktree_root
+    output_dir = Path("output") / url_to_folder_name(url)
+    for path in (output_dir, worktree_root(output_dir), archive_dir_for(output_dir)):
+        shutil.rmtree(path, ignore_errors=True)
+    measurements_path_for(output_dir).unlink(missing_ok=True)
+
+
+async def run_e2e(site: FixtureSite, device: str = 'desktop', samples: int = 5,
+                  concurrency: int = 2) -> Dict[str, Any]:
+    """Wall time of the pipeline stages on the storefront page, LLM and aider stubbed.
+
+    Runs live against the fixture server (no replay, no stored samples) so
+    every retest pays the page's real delays, and checks that each scripted
+    edit gets the decision it was built for.
+    """
+    BenchmarkFlow = _import_flow()
+    url = site.url(STOREFRONT.name)
+    _reset_output(url)
+    flow = BenchmarkFlow(
+        report_path=None,
+        url=url,
+        device=device,
+        headless=True,
+        replay=False,
+        concurrency=concurrency,
+        sampling=SamplingPlan(max_samples=samples, warmup=1),
+        llm_cache=False,
+        apply_workers=1,
+        measurement_cache=False,
+        recapture=True
+    )
+    stages = PipelineStages()
+
+    async def report_stage():
+        async with stages.stage('report'):
+            report_path = Path(tempfile.mkdtemp()) / "storefront.desktop.benchmark.summary.md"
+            report_path.write_text(STUB_REPORT)
+            return report_path
+
+    async def capture_stage():
+        async with stages.stage('capture'):
+            await flow.fetch_website_assets()
+
+    try:
+        flow.report_path, _ = await asyncio.gather(report_stage(), capture_stage())
+        async with stages.stage('suggest+apply'):
+            flow.apply_suggestions(flow.stream_suggestions(flow.read_report()['content']))
+        async with stages.stage('compare'):
+            performance_results = await flow.compare_branches(len(flow.suggestions))
+    finally:
+        await flow.close()
+
+    rows = {row['branch']: row for row in performance_results if row.get('branch')}
+    outcomes = []
+    for idx, edit in enumerate(E2E_EDITS, 1):
+        row = rows.get(f"perf-fix-{idx}", {})
+        outcomes.append({'branch': f"perf-fix-{idx}", 'summary': edit['summary'],
+                         'expected': edit['expected'], 'decision': row.get('decision'),
+                         'lcp_ms': row.get('lcp_ms'), 'samples': row.get('samples')})
+    return {
+        'url': url,
+        'total_ms': stages.total_ms(),
+        'stage_timings': stages.stages,
+        'comparison_wall_ms': round(flow.comparison_wall_ms),
+        'measurements': len(flow.measurement_timings),
+        'baseline_lcp_ms': rows.get('master', {}).get('lcp_ms'),
+        'decisions': outcomes,
+        'decisions_correct': sum(1 for o in outcomes if o['decision'] == o['expected']),
+    }
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = _run_git(["rev-parse", "HEAD"], Path.cwd()).stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        commit = None
+    try:
+        from importlib.metadata import version
+        playwright_version = version("playwright")
+    except Exception:
+        playwright_version = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'playwright': playwright_version,
+    }
+
+
+def latest_result(bench_dir: Path = BENCH_DIR, exclude: Path = None) -> Optional[Path]:
+    results = sorted(p for p in Path(bench_dir).glob("benchmark_*.json") if p != exclude)
+    return results[-1] if results else None
+
+
+def _regressed(before: Optional[float], after: Optional[float]) -> bool:
+    if before is None or after is None:
+        return False
+    return after - before > max(REGRESSION_MIN_MS, abs(before) * REGRESSION_RATIO)
+
+
+def compare_results(previous: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """Print metric deltas against an earlier result; returns the regressions found"""
+    checks = []
+    prev_acc = (previous.get('accuracy') or {}).get('scenarios', {})
+    for name, result in ((current.get('accuracy') or {}).get('scenarios') or {}).items():
+        if name not in prev_acc:
+            continue
+        before, after = prev_acc[name]['summary'], result['summary']
+        for metric in ('abs_error_median_ms', 'abs_error_p95_ms', 'wall_median_ms', 'after_lcp_median_ms'):
+            checks.append((f"{name}.{metric}", before.get(metric), after.get(metric)))
+    if previous.get('e2e') and current.get('e2e'):
+        checks.append(("e2e.total_ms", previous['e2e']['total_ms'], current['e2e']['total_ms']))
+        checks.append(("e2e.comparison_wall_ms", previous['e2e']['comparison_wall_ms'],
+                       current['e2e']['comparison_wall_ms']))
+
+    regressions = []
+    for label, before, after in checks:
+        if before is None or after is None:
+            continue
+        flag = ""
+        if _regressed(before, after):
+            flag = " ⚠️ regression"
+            regressions.append(label)
+        print(f"- {label}: {before} → {after} ({after - before:+.1f}){flag}")
+    if previous.get('e2e') and current.get('e2e'):
+        before, after = previous['e2e']['decisions_correct'], current['e2e']['decisions_correct']
+        print(f"- e2e.decisions_correct: {before} → {after}")
+        if after < before:
+            regressions.append("e2e.decisions_correct")
+    return regressions
+
+
+def save_result(result: Dict[str, Any], bench_dir: Path = BENCH_DIR) -> Path:
+    bench_dir = Path(bench_dir)
+    bench_dir.mkdir(parents=True, exist_ok=True)
+    path = bench_dir / f"benchmark_{result['timestamp']}.json"
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+    return path
@@ -3,12 +3,25 @@ from playwright.async_api import async_playwright
 import argparse
 from typing import Dict, Any
 import datetime
+import time
 import json
+import re
+import uuid
 from pathlib import Path
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urldefrag, urlparse, urljoin
 
 # Import the new function
 from agent.src.utils import url_to_folder_name
+from agent.src.browser_pool import LAUNCH_ARGS, BrowserPool
+from agent.src.coverage import CoverageRecorder
+from agent.src.completion import DEADLINE_MS, QUIET_MS, CompletionDetector
+from agent.src.perf_collector import PerformanceCollector
+from agent.src.network_archive import NetworkArchive, decoded_headers
+from agent.src.ablation import BLOCK, Ablation
+from agent.src.asset_cache import DOCUMENT_PATH, AssetCache, AssetManifest, default_cache
+from agent.src.git_variants import VariantView
+from agent.src.throttle import ThrottledLink
+from agent.src.tracing import tracer
 
 # Device configurations
 CONFIGS = {
@@ -46,9 +59,19 @@ CONFIGS = {
     }
 }
 
+def reports_dir_for(output_dir: Path) -> Path:
+    """Performance reports sit next to the asset repo so they never end up in its branches"""
+    output_dir = Path(output_dir)
+    return output_dir.parent / f"{output_dir.name}.reports"
+
+
 class BrowserNavigator:
     
-    def __init__(self, url: str = None, device: str = 'desktop', headless: bool = False, auto_save_assets: bool = False, serve_cached_assets: bool = False):
+    def __init__(self, url: str = None, device: str = 'desktop', headless: bool = False, auto_save_assets: bool = False, serve_cached_assets: bool = False, pool: BrowserPool = None,
+                 deadline_ms: int = DEADLINE_MS, quiet_ms: int = QUIET_MS,
+                 archive: NetworkArchive = None, archive_mode: str = None,
+                 asset_cache: AssetCache = None, variant: VariantView = None,
+                 serve_encoding: str = 'auto', ablation: Ablation = None, coverage: bool = False):
         self.url = url
         self.device = device
         self.headless = headless
@@ -60,19 +83,31 @@ class BrowserNavigator:
         self.playwright = None
         self.auto_save_assets = auto_save_assets
         self.serve_cached_assets = serve_cached_assets
+        self.pool = pool
+        self.lease = None
+        self.timings = {}
+        self.deadline_ms = deadline_ms
+        self.quiet_ms = quiet_ms
+        self.detector = None
+        self.completion = None
+        self.collector = None
+        # 'record' archives every response, 'replay' serves the page load from it
+        self.archive = archive
+        self.archive_mode = archive_mode if archive else None
+        self.asset_cache = asset_cache or default_cache
+        self.manifest = None
+        # Serve local assets from this git revision instead of the working tree
+        self.variant = variant
+        # Responses fulfilled from Python skip the browser's network emulation
+        self.link = ThrottledLink(self.config['network_conditions'], encoding=serve_encoding)
+        # What-if experiment: one resource or origin blocked, or deferred in the document
+        self.ablation = ablation
+        # JS/CSS coverage of the load, split at LCP; read with `coverage.finish()`
+        self.record_coverage = coverage
+        self.coverage = None
 
-    async def setup(self):
-        """Setup browser instance"""
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(
-            headless=self.headless,
-            args=[
-                '--start-maximized',
-                '--enable-features=LocalOverrides',
-                '--auto-open-devtools-for-tabs'
-            ]
-        )
-        self.context = await self.browser.new_context(
+    def _context_options(self) -> Dict[str, Any]:
+        return dict(
             viewport=self.config['viewport'],
             user_agent=self.config['user_agent'],
             extra_http_headers={
@@ -81,10 +116,37 @@ class BrowserNavigator:
                 "cache-control": "max-age=0"
             }
         )
-        self.page = await self.context.new_page()
-        self.client = await self.page.context.new_cdp_session(self.page)
-        await self._setup_cdp()
-        await self.setup_route_handler(self.page)
+
+    async def setup(self):
+        """Setup browser instance, leasing a context from the pool when one is given"""
+        async with tracer.span('browser.setup', device=self.device, pooled=bool(self.pool)):
+            start = time.perf_counter()
+            async with tracer.span('browser.launch'):
+                if self.pool:
+                    self.lease = await self.pool.acquire(**self._context_options())
+                    self.browser = self.lease.browser
+                    self.context = self.lease.context
+                else:
+                    self.playwright = await async_playwright().start()
+                    self.browser = await self.playwright.chromium.launch(
+                        headless=self.headless,
+                        args=LAUNCH_ARGS
+                    )
+                    self.context = await self.browser.new_context(**self._context_options())
+            self.timings['launch_ms'] = (time.perf_counter() - start) * 1000
+            async with tracer.span('browser.instrument'):
+                self.page = await self.context.new_page()
+                self.client = await self.page.context.new_cdp_session(self.page)
+                await self._setup_cdp()
+                self.detector = await CompletionDetector(
+                    self.page, self.client,
+                    deadline_ms=self.deadline_ms,
+                    quiet_ms=self.quiet_ms
+                ).install()
+                self.collector = await PerformanceCollector(self.page, self.client).install()
+                if self.record_coverage:
+                    self.coverage = await CoverageRecorder(self.page, self.client).install()
+                await self.setup_route_handler(self.page)
         return self
 
     async def _setup_cdp(self):
@@ -106,65 +168,35 @@ class BrowserNavigator:
         return timestamp_dir
 
     async def close(self):
-        """Close browser"""
-        if self.context:
-            await self.context.close()
-        if self.browser:
-            await self.browser.close()
-        if self.playwright:
-            await self.playwright.stop()
+        """Close browser, or hand the context back to the pool"""
+        if self.archive_mode == 'record':
+            self.archive.save()
+            print(f"Recorded {len(self.archive.entries)} responses to: {self.archive.root}")
+        elif self.archive_mode == 'replay':
+            print(f"Replay stats: {self.archive.stats}")
+        if self.link.stats['responses']:
+            print(f"Throttling: {self.link.summary()}")
+        if self.manifest:
+            self.manifest.save()
+        start = time.perf_counter()
+        async with tracer.span('browser.close', pooled=bool(self.lease)):
+            if self.lease:
+                await self.pool.release(self.lease)
+                self.lease = None
+            else:
+                if self.context:
+                    await self.context.close()
+                if self.browser:
+                    await self.browser.close()
+                if self.playwright:
+                    await self.playwright.stop()
+        self.timings['teardown_ms'] = (time.perf_counter() - start) * 1000
 
-    async def setup_route_handler(self, page, inject_script=None):
-        """Set up route handling for JavaScript interception"""
-        async def handle_js_css(route):
+    def _guard_route(self, handler):
+        """Wrap a route handler so shutdown races and failures don't hang requests"""
+        async def guarded(route):
             try:
-                request = route.request
-                response = await route.fetch()
-                headers = {**response.headers}
-                headers['Timing-Allow-Origin'] = '*'
-
-                resource_hostname = urlparse(request.url).hostname
-                root_hostname = urlparse(self.url).hostname
-
-                if request.resource_type in ["script", "stylesheet"]:
-                    if self.serve_cached_assets and resource_hostname == root_hostname:
-                        # load the cached asset and serve it
-                        folder_name = url_to_folder_name(self.url)
-                        output_dir = self.ensure_output_dirs(folder_name)
-                        path = urlparse(request.url).path.lstrip('/')
-                        full_path = output_dir / "assets" / path
-                        cached_asset_exists = full_path.exists()
-                        if cached_asset_exists:
-                            print(f"Serving cached asset from: {full_path}")
-                            with open(full_path, "r", encoding='utf-8') as f:
-                                body = f.read().encode('utf-8')
-
-                            return await route.fulfill(
-                                status=200,
-                                headers=headers,
-                                body=body
-                            )   
-                            
-                    body = await response.body()
-                    
-                    if self.auto_save_assets and resource_hostname != root_hostname:
-                        print(f"Skipping {request.url} because it's from another domain.")
-
-                    if self.auto_save_assets and resource_hostname == root_hostname:
-                        folder_name = url_to_folder_name(self.url)
-                        output_dir = self.ensure_output_dirs(folder_name)
-                        path = urlparse(request.url).path.lstrip('/')
-                        full_path = output_dir / "assets" / path
-                        full_path.parent.mkdir(parents=True, exist_ok=True)
-                        with open(full_path, "wb") as f:
-                            f.write(body)
-                            print(f"Saved file: {full_path}.")
-
-                    await route.fulfill(
-                        status=response.status,
-                        headers=headers,
-                        body=body
-                    )
+                await handler(route)
             except Exception as e:
                 # Handle cases where browser/page is closed
                 if "Target page, context or browser has been closed" in str(e):
@@ -181,43 +213,207 @@ class BrowserNavigator:
                         await route.abort()
                     except:
                         pass
+        return guarded
+
+    def _cached_asset_path(self, url: str):
+        """Path of the local copy of a same-origin asset, or None for other origins"""
+        if urlparse(url).hostname != urlparse(self.url).hostname:
+            return None
+        folder_name = url_to_folder_name(self.url)
+        output_dir = self.ensure_output_dirs(folder_name)
+        path = urlparse(url).path.lstrip('/')
+        return output_dir / "assets" / path
+
+    def _asset_manifest(self) -> AssetManifest:
+        if self.manifest is None and self.variant:
+            self.manifest = AssetManifest.from_bytes(self.variant.read("assets.manifest.json"))
+        elif self.manifest is None:
+            output_dir = self.ensure_output_dirs(url_to_folder_name(self.url))
+            self.manifest = AssetManifest(output_dir / "assets.manifest.json")
+        return self.manifest
+
+    async def _serve_local(self, route) -> bool:
+        """Fulfill from the local asset tree without touching the origin"""
+        request = route.request
+        full_path = self._cached_asset_path(request.url)
+        if full_path is None:
+            return False
+        rel_path = urlparse(request.url).path.lstrip('/')
+        if self.variant:
+            body = await asyncio.to_thread(self.variant.read, f"assets/{rel_path}")
+        else:
+            body = self.asset_cache.get(full_path)
+        if body is None:
+            return False
+
+        manifest = self._asset_manifest()
+        headers = manifest.headers_for(rel_path)
+        headers['Timing-Allow-Origin'] = '*'
+        source = f"{self.variant.rev}:assets/{rel_path}" if self.variant else full_path
+        print(f"Serving cached asset from: {source}")
+        await self.link.deliver(body, headers.get('content-type'), manifest.encoding_for(rel_path))
+        await route.fulfill(status=200, headers=headers, body=body)
+        return True
+
+    def _document_url(self):
+        """URL the captured page_dom.html was served from, if it was captured for serving"""
+        entry = self._asset_manifest().entries.get(DOCUMENT_PATH)
+        return entry['url'] if entry else None
+
+    async def _serve_document(self, route) -> bool:
+        """Fulfill the main navigation with the variant's page_dom.html.
+
+        The document is only served at the URL it was captured from (after
+        any redirects, which still go through the archive or origin), so
+        relative URLs resolve exactly as they did on the origin.
+        """
+        request = route.request
+        if not (request.resource_type == 'document' and request.is_navigation_request()
+                and request.frame.parent_frame is None):
+            return False
+        document_url = self._document_url()
+        if document_url is None or urldefrag(request.url)[0] != urldefrag(document_url)[0]:
+            return False
+        if self.variant:
+            body = await asyncio.to_thread(self.variant.read, "page_dom.html")
+        else:
+            output_dir = self.ensure_output_dirs(url_to_folder_name(self.url))
+            body = self.asset_cache.get(output_dir / "page_dom.html")
+        if body is None:
+            return False
+        if self.ablation:
+            body = self.ablation.rewrite(body, request.url)
+
+        manifest = self._asset_manifest()
+        # Only the kept origin headers; length and encoding no longer describe the bytes
+        headers = manifest.headers_for(DOCUMENT_PATH)
+        headers['Timing-Allow-Origin'] = '*'
+        source = f"{self.variant.rev}:page_dom.html" if self.variant else "page_dom.html"
+        print(f"Serving document from: {source}")
+        await self.link.deliver(body, headers.get('content-type'), manifest.encoding_for(DOCUMENT_PATH))
+        await route.fulfill(status=200, headers=headers, body=body)
+        return True
 
+    async def save_document(self, output_dir: Path, response) -> Path:
+        """Save the HTML the origin served as page_dom.html, ready to be served back.
+
+        Falls back to the rendered DOM when the response body is unavailable;
+        that copy is saved but not served, since its scripts would run twice.
+        """
+        page_dom_path = Path(output_dir) / "page_dom.html"
+        body = None
+        if response is not None:
+            try:
+                body = await response.body()
+            except Exception as e:
+                print(f"⚠️ Could not read the document response: {e}")
+        if body:
+            page_dom_path.write_bytes(body)
+            self._asset_manifest().record(DOCUMENT_PATH, response.url, response.headers)
+        else:
+            page_dom_path.write_text(await self.page.content())
+        return page_dom_path
+
+    async def setup_route_handler(self, page, inject_script=None):
+        """Set up route handling for JavaScript interception"""
+        if self.archive_mode == 'record':
+            await page.route("**/*", self._guard_route(lambda route: self.archive.record_route(route, self.link)))
+        elif self.archive_mode == 'replay':
+            await page.route("**/*", self._guard_route(lambda route: self.archive.replay_route(route, self.link)))
+
+        async def handle_js_css(route):
+            request = route.request
+            if request.resource_type not in ["script", "stylesheet"]:
+                return await route.fallback()
+            # Local copies win and never cost an upstream round trip
+            if self.serve_cached_assets and await self._serve_local(route):
+                return
+            if self.archive_mode == 'replay':
+                return await route.fallback()
+
+            fetch_start = time.perf_counter()
+            response = await route.fetch()
+            headers = decoded_headers(response.headers)
+            headers['Timing-Allow-Origin'] = '*'
+
+            resource_hostname = urlparse(request.url).hostname
+            root_hostname = urlparse(self.url).hostname
+
+            body = await response.body()
+            elapsed_ms = (time.perf_counter() - fetch_start) * 1000
+            if self.archive_mode == 'record':
+                self.archive.store(request, response.status, response.headers, body, elapsed_ms)
+            
+            if self.auto_save_assets and resource_hostname != root_hostname:
+                print(f"Skipping {request.url} because it's from another domain.")
+
+            if self.auto_save_assets and resource_hostname == root_hostname:
+                full_path = self._cached_asset_path(request.url)
+                full_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(full_path, "wb") as f:
+                    f.write(body)
+                    print(f"Saved file: {full_path}.")
+                rel_path = urlparse(request.url).path.lstrip('/')
+                self._asset_manifest().record(rel_path, request.url, response.headers)
+
+            await self.link.deliver(body, response.headers.get('content-type'),
+                                    response.headers.get('content-encoding'), elapsed_ms / 1000)
+            await route.fulfill(
+                status=response.status,
+                headers=headers,
+                body=body
+            )
+
+        handle_js_css = self._guard_route(handle_js_css)
         await page.route("**/*.js", handle_js_css)
         await page.route("**/*.css", handle_js_css)
 
+        async def handle_document(route):
+            if not await self._serve_document(route):
+                await route.fallback()
+
+        # Edits to page_dom.html reach the measured load, not just the assets
+        document_url = self._document_url() if self.serve_cached_assets else None
+        if document_url:
+            pattern = re.compile(f"^{re.escape(urldefrag(document_url)[0])}(#.*)?$")
+            await page.route(pattern, self._guard_route(handle_document))
+
+        if self.ablation and self.ablation.action == BLOCK:
+            await page.route(self.ablation.matches,
+                             self._guard_route(lambda route: route.abort('blockedbyclient')))
+
     async def capture_performance_data(self):
         """Capture performance metrics and data"""
         metrics = await self.client.send("Performance.getMetrics")
-        perf_data = await self.page.evaluate("window.PERFORMANCE_REPORT_DATA")
-        while perf_data is None:
-            print("Waiting for performance data...")
-            await asyncio.sleep(1)
-            metrics = await self.client.send("Performance.getMetrics")
-            perf_data = await self.page.evaluate("window.PERFORMANCE_REPORT_DATA")
+        perf_data = await self.collector.collect(self.url, self.device)
         return metrics, perf_data
 
-    async def eval_performance(self, output_dir):
+    async def eval_performance(self, output_dir, label: str = None):
         print(f"\nNavigating to {self.url} with {self.device} configuration...")
-        response = await self.page.goto(self.url, wait_until="load")
-
-        """Evaluate performance report script"""
-        await self.page.evaluate("""
-            window.setTimeout(() => {
-                const s = document.createElement('script');
-                s.id='hlx-report';
-                s.src='https://main--hlxplayground--kptdobe.hlx.live/tools/report/report.js';
-                if(document.getElementById('hlx-report')) document.getElementById('hlx-report').replaceWith(s);
-                else document.head.append(s);
-            }, 6000);
-        """)
-
-        # Wait and collect performance data
-        await self.page.wait_for_timeout(10000)
-        metrics, perf_data = await self.capture_performance_data()
+        load_start = time.perf_counter()
+        self.detector.reset()
+        self.collector.reset()
+        async with tracer.span('browser.measure', url=self.url) as span:
+            async with tracer.span('browser.goto'):
+                response = await self.page.goto(self.url, wait_until="load")
+
+            # Wait until LCP is final and the network has settled
+            async with tracer.span('browser.settle'):
+                self.completion = await self.detector.wait()
+            print(f"Measurement settled after {self.completion['elapsed_ms']:.0f}ms "
+                  f"({self.completion['reason']})")
+
+            async with tracer.span('browser.collect'):
+                metrics, perf_data = await self.capture_performance_data()
+            span.set(reason=self.completion['reason'])
+        self.timings['page_load_ms'] = (time.perf_counter() - load_start) * 1000
         
-        # Save performance report
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        perf_report_path = output_dir / f"performance_report_{timestamp}.json"
+        # Save performance report, one file per load even when concurrent loads end in the same second
+        reports_dir = reports_dir_for(output_dir)
+        reports_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        name = re.sub(r'[^\w.-]+', '-', label or 'page')
+        perf_report_path = reports_dir / f"performance_report_{name}_{timestamp}_{uuid.uuid4().hex[:8]}.json"
         with open(perf_report_path, 'w') as f:
             json.dump(perf_data, f, indent=2)
         print(f"\nPerformance report saved to: {perf_report_path}")
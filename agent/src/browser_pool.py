@@ -0,0 +1,180 @@
+import asyncio
+import time
+from typing import Any, Dict, List
+
+from playwright.async_api import async_playwright
+
+# Chromium flags shared by pooled and standalone browsers
+LAUNCH_ARGS = [
+    '--start-maximized',
+    '--enable-features=LocalOverrides',
+    '--auto-open-devtools-for-tabs'
+]
+
+
+class PooledBrowser:
+    """A launched Chromium instance tracked by the pool"""
+
+    def __init__(self, browser, launch_ms: float):
+        self.browser = browser
+        self.launch_ms = launch_ms
+        self.uses = 0
+        self.active = 0
+        self.crashed = False
+        browser.on("disconnected", self._on_disconnected)
+
+    def _on_disconnected(self, *_):
+        self.crashed = True
+
+    @property
+    def healthy(self) -> bool:
+        return not self.crashed and self.browser.is_connected()
+
+
+class BrowserLease:
+    """An isolated browser context handed out by the pool for one measurement"""
+
+    def __init__(self, pooled: PooledBrowser, context, launch_ms: float, context_ms: float):
+        self.pooled = pooled
+        self.browser = pooled.browser
+        self.context = context
+        self.launch_ms = launch_ms
+        self.context_ms = context_ms
+        self.teardown_ms = 0.0
+
+
+class BrowserPool:
+    """Long-lived pool of Chromium browsers handing out fresh contexts.
+
+    Browsers are launched lazily, shared between measurements and recycled
+    after `max_uses` contexts or as soon as they disconnect.
+    """
+
+    def __init__(self, headless: bool = True, size: int = 1, max_uses: int = 20,
+                 max_contexts: int = 4):
+        self.headless = headless
+        self.size = size
+        self.max_uses = max_uses
+        self.playwright = None
+        self._browsers: List[PooledBrowser] = []
+        self._lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(max_contexts)
+        self.stats = {
+            'launches': 0,
+            'recycles': 0,
+            'crashes': 0,
+            'contexts': 0,
+            'launch_ms': 0.0,
+            'teardown_ms': 0.0,
+        }
+
+    async def start(self):
+        """Start the Playwright driver"""
+        if self.playwright is None:
+            self.playwright = await async_playwright().start()
+        return self
+
+    async def _launch(self) -> PooledBrowser:
+        start = time.perf_counter()
+        browser = await self.playwright.chromium.launch(
+            headless=self.headless,
+            args=LAUNCH_ARGS
+        )
+        launch_ms = (time.perf_counter() - start) * 1000
+        self.stats['launches'] += 1
+        self.stats['launch_ms'] += launch_ms
+        pooled = PooledBrowser(browser, launch_ms)
+        self._browsers.append(pooled)
+        return pooled
+
+    async def _retire(self, pooled: PooledBrowser):
+        """Close a browser that crashed or reached its use limit"""
+        if pooled in self._browsers:
+            self._browsers.remove(pooled)
+        start = time.perf_counter()
+        try:
+            await pooled.browser.close()
+        except Exception:
+            pass
+        self.stats['teardown_ms'] += (time.perf_counter() - start) * 1000
+
+    async def _pick_browser(self):
+        """Return a healthy browser and the launch cost paid to obtain it"""
+        for pooled in list(self._browsers):
+            if not pooled.healthy:
+                self.stats['crashes'] += 1
+                print("⚠️  Pooled browser disconnected, replacing it")
+                await self._retire(pooled)
+
+        candidates = [b for b in self._browsers if b.uses < self.max_uses]
+        if len(candidates) < self.size:
+            pooled = await self._launch()
+            return pooled, pooled.launch_ms
+        return min(candidates, key=lambda b: b.active), 0.0
+
+    async def acquire(self, **context_options) -> BrowserLease:
+        """Create a fresh, isolated context on a warm browser"""
+        await self._slots.acquire()
+        try:
+            async with self._lock:
+                await self.start()
+                pooled, launch_ms = await self._pick_browser()
+                pooled.uses += 1
+                pooled.active += 1
+            start = time.perf_counter()
+            context = await pooled.browser.new_context(**context_options)
+            context_ms = (time.perf_counter() - start) * 1000
+        except Exception:
+            self._slots.release()
+            raise
+        self.stats['contexts'] += 1
+        return BrowserLease(pooled, context, launch_ms, context_ms)
+
+    async def release(self, lease: BrowserLease) -> float:
+        """Close a leased context and recycle its browser if needed"""
+        pooled = lease.pooled
+        start = time.perf_counter()
+        try:
+            await lease.context.close()
+        except Exception:
+            pass
+        finally:
+            pooled.active -= 1
+            self._slots.release()
+
+        async with self._lock:
+            if pooled not in self._browsers:
+                pass
+            elif not pooled.healthy:
+                self.stats['crashes'] += 1
+                await self._retire(pooled)
+            elif pooled.uses >= self.max_uses and pooled.active == 0:
+                self.stats['recycles'] += 1
+                await self._retire(pooled)
+
+        lease.teardown_ms = (time.perf_counter() - start) * 1000
+        self.stats['teardown_ms'] += lease.teardown_ms
+        return lease.teardown_ms
+
+    async def close(self):
+        """Close every pooled browser and stop the driver"""
+        async with self._lock:
+            for pooled in list(self._browsers):
+                await self._retire(pooled)
+            if self.playwright:
+                await self.playwright.stop()
+                self.playwright = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'launch_ms': round(self.stats['launch_ms']),
+            'teardown_ms': round(self.stats['teardown_ms']),
+        }
+
+
+def format_timings(timings: Dict[str, float]) -> str:
+    """Format navigator timings as a one-line summary"""
+    return (f"launch {timings.get('launch_ms', 0):.0f}ms, "
+            f"page load {timings.get('page_load_ms', 0):.0f}ms, "
+            f"teardown {timings.get('teardown_ms', 0):.0f}ms")
@@ -6,12 +6,21 @@ import yaml
 from crewai import LLM
 from agent.src.utils import read_report_with_check
 from agent.src.parse_report import convert_to_yaml, parse_yaml_performance_report
+from agent.src.llm_cache import CachedLLM, LLMCache
+from agent.src.tracing import tracer
 from aider.io import InputOutput
 from aider.models import Model
+from aider.coders import Coder
 from aider.coders.context_coder import ContextCoder
+from aider.repo import GitRepo
 from aider.repomap import find_src_files
 from aider.io import InputOutput
-import tempfile
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional
 
 io = InputOutput(yes=True)
 
@@ -43,53 +52,251 @@ context_prompt = lambda src_files: f"""For the following files, point out the fi
     {'\n'.join(src_files)}
     Give me the list of files to edit and nothing else, enclose each filename in backticks."""
 
-def get_context_files(output_dir, model, summary, reasoning, technical_implementation):
-    context_coder = ContextCoder(main_model=model, io=io, detect_urls=False)
-    skiplen = len(output_dir) + (0 if output_dir.endswith("/") else 1)
-    src_files = [f[skiplen:] for f in find_src_files(output_dir) if url_filter(f)]
-    prompt = context_prompt(src_files) + format_aider_instruction(summary, reasoning, technical_implementation)
-    response = context_coder.run(prompt)
-    files = re.findall(r'`(.*?)`', response)
-    return files
-
-def apply_code_changes(output_dir, suggestion, model_name, suggestion_id):
-    model = Model(model_name)
+class AiderSession:
+    """Long-lived aider engine for one output directory.
+
+    The model, the filtered source file list and the context coder (with
+    its repo map) are built once and reused for every suggestion. Edits
+    land in per-suggestion worktrees and never touch `output_dir`, so the
+    file list describes master for the whole session; cached file choices
+    are keyed by master's tree (`assets_key`). Edits run in-process
+    instead of in a separate `aider` CLI.
+    """
+
+    def __init__(self, output_dir, model_name):
+        self.output_dir = str(Path(output_dir).resolve())
+        self.model = Model(model_name)
+        self._files = None
+        self._assets_key = None
+        self._context_coder = None
+        # The context coder keeps chat state, so one suggestion at a time uses it
+        self._lock = threading.Lock()
+        self.stats = {'scans': 0, 'context_calls': 0, 'edits': 0}
+
+    def src_files(self):
+        """Relative paths of editable sources, scanned once per session"""
+        if self._files is None:
+            skiplen = len(self.output_dir) + 1
+            self._files = {
+                f[skiplen:]: os.path.getmtime(f)
+                for f in find_src_files(self.output_dir) if url_filter(f)
+            }
+            self.stats['scans'] += 1
+        return sorted(self._files)
+
+    def assets_key(self):
+        """What the file choice depends on besides the prompt: master's tree, or file mtimes outside git"""
+        if self._assets_key is None:
+            result = _git(["rev-parse", "master^{tree}"], self.output_dir)
+            if result.returncode == 0:
+                self._assets_key = result.stdout.strip()
+            else:
+                self.src_files()
+                self._assets_key = sorted(self._files.items())
+        return self._assets_key
+
+    def _get_context_coder(self):
+        if self._context_coder is None:
+            repo = GitRepo(io, [], self.output_dir)
+            self._context_coder = ContextCoder(main_model=self.model, io=io, repo=repo, detect_urls=False)
+        # Each suggestion starts from an empty chat, but keeps the warm repo map
+        self._context_coder.done_messages = []
+        self._context_coder.cur_messages = []
+        return self._context_coder
+
+    def context_files(self, summary, reasoning, technical_implementation, cache: LLMCache = None):
+        """Ask the model which files a suggestion needs to edit"""
+        with self._lock, tracer.span('aider.context_files') as span:
+            prompt = context_prompt(self.src_files()) + format_aider_instruction(summary, reasoning, technical_implementation)
+            # A re-capture with different contents must not reuse an old file choice
+            key = {'prompt': prompt, 'assets': self.assets_key()} if cache else None
+            response = cache.get(self.model.name, key) if cache else None
+            span.set(cached=response is not None)
+            if response is None:
+                response = self._get_context_coder().run(prompt)
+                self.stats['context_calls'] += 1
+                if cache:
+                    cache.put(self.model.name, key, response)
+        return re.findall(r'`(.*?)`', response)
+
+    def edit(self, root, files, message):
+        """Apply `message` to `files` under `root` and commit; returns the edited files.
+
+        The files were already picked with the warm repo map, so the edit
+        coder skips building a map of its own.
+        """
+        fnames = [os.path.join(root, f) for f in files]
+        with tracer.span('aider.edit', files=len(fnames)) as span:
+            coder = Coder.create(
+                main_model=self.model,
+                io=io,
+                fnames=fnames,
+                repo=GitRepo(io, fnames, str(root)),
+                map_tokens=0,
+                detect_urls=False,
+                auto_commits=True
+            )
+            coder.run(with_message=message)
+            span.set(edited=len(coder.aider_edited_files))
+        self.stats['edits'] += 1
+        return sorted(coder.aider_edited_files)
+
+    def summary(self) -> str:
+        return (f"Aider session: {self.stats['scans']} scans, {self.stats['context_calls']} context calls, "
+                f"{self.stats['edits']} edits")
+
+def get_context_files(output_dir, model, summary, reasoning, technical_implementation, cache: LLMCache = None):
+    session = AiderSession(output_dir, model.name)
+    return session.context_files(summary, reasoning, technical_implementation, cache)
+
+class RateLimiter:
+    """Thread-safe limit on LLM-bound calls per minute shared by all workers"""
+
+    def __init__(self, calls_per_minute: int = 20):
+        self.interval = 60.0 / calls_per_minute if calls_per_minute > 0 else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+# git refuses concurrent ref/worktree updates, so branch creation is serialized
+_git_lock = threading.Lock()
+
+def worktree_root(output_dir):
+    """Worktrees sit next to the asset repo, outside its working tree"""
+    output_dir = Path(output_dir).resolve()
+    return output_dir.parent / f"{output_dir.name}.worktrees"
+
+def _git(args, cwd):
+    with tracer.span(f"git.{args[0]}", args=' '.join(args[1:])):
+        return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True)
+
+def apply_code_changes(output_dir, suggestion, model_name, suggestion_id, cache: LLMCache = None,
+                       rate_limiter: RateLimiter = None, session: AiderSession = None,
+                       notes_for: Callable[[List[str]], str] = None):
+    """Apply one suggestion with aider in its own worktree on a new branch from master.
+
+    `notes_for` maps the files chosen for editing to extra instruction text
+    (such as measured unused line ranges) appended to aider's prompt.
+    """
+    with tracer.span('apply.suggestion', branch=str(suggestion_id)) as span:
+        result = _apply_code_changes(output_dir, suggestion, model_name, suggestion_id, cache,
+                                     rate_limiter, session, notes_for)
+        span.set(status=result['status'], files=len(result['files']))
+    return result
+
+def _apply_code_changes(output_dir, suggestion, model_name, suggestion_id, cache, rate_limiter, session,
+                        notes_for=None):
+    started = time.perf_counter()
+    result = {'suggestion_id': str(suggestion_id), 'branch': str(suggestion_id), 'files': [],
+              'returncode': None, 'status': 'failed', 'duration_s': 0.0}
+    session = session or AiderSession(output_dir, model_name)
     summary = suggestion.get("summary", "").strip()
     reasoning = suggestion.get("reasoning", "").strip()
     technical_implementation = suggestion.get(
         "technical_implementation", ""
     ).strip()
-    edit_files = get_context_files(output_dir, model, summary, reasoning, technical_implementation)
+    if rate_limiter:
+        with tracer.span('apply.rate_limit'):
+            rate_limiter.wait()
+    edit_files = session.context_files(summary, reasoning, technical_implementation, cache)
+    result['files'] = edit_files
     
-    # Create a temporary file with the edit prompt to avoid shell escaping issues
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False) as f:
-        edit_prompt = f"Implement the following changes in the webpage\n{format_aider_instruction(summary, reasoning, technical_implementation)}"
-        f.write(edit_prompt)
-        temp_file = f.name
+    worktree = worktree_root(output_dir) / str(suggestion_id)
+    with _git_lock:
+        _git(["worktree", "prune"], output_dir)
+        # -B resets a branch left over from a previous run back to master
+        created = _git(["worktree", "add", "--force", "-B", str(suggestion_id), str(worktree), "master"], output_dir)
+    if created.returncode != 0:
+        result['error'] = created.stderr.strip()
+        result['duration_s'] = round(time.perf_counter() - started, 1)
+        return result
     
+    edit_prompt = f"Implement the following changes in the webpage\n{format_aider_instruction(summary, reasoning, technical_implementation)}"
+    if notes_for:
+        edit_prompt += notes_for(edit_files)
     try:
-        # Use message-file instead of message to avoid shell escaping issues
-        command = f"cd {output_dir} && git checkout -b {suggestion_id} && aider {' '.join(edit_files)} --model {model_name} --message-file '{temp_file}' --yes && git checkout master"
-        print("Command: ", command)
-        os.system(command)
-        print(f"Applied changes to {edit_files} in branch {suggestion_id}")
+        print(f"Editing {edit_files} in {worktree}")
+        if rate_limiter:
+            with tracer.span('apply.rate_limit'):
+                rate_limiter.wait()
+        edited = session.edit(worktree, edit_files, edit_prompt)
+        result['edited'] = [os.path.relpath(f, worktree) if os.path.isabs(f) else f for f in edited]
+        if edited:
+            result['status'] = 'applied'
+        else:
+            result['error'] = 'aider made no edits'
     finally:
-        # Clean up temp file
-        os.unlink(temp_file)
+        # Clean up the worktree; the branch keeps the commits
+        with _git_lock:
+            _git(["worktree", "remove", "--force", str(worktree)], output_dir)
+        result['duration_s'] = round(time.perf_counter() - started, 1)
+    return result
+
+def apply_suggestions_parallel(output_dir, suggestions, model_name, workers: int = 2,
+                               cache: LLMCache = None, rate_limiter: RateLimiter = None,
+                               branch_prefix: str = "perf-fix", notes_for: Callable[[List[str]], str] = None,
+                               reuse: Callable[[str, dict], Optional[dict]] = None,
+                               on_result: Callable[[dict, dict], None] = None):
+    """Apply suggestions concurrently; returns one result per suggestion, in order.
+
+    `suggestions` may be a generator: each one is submitted as soon as it
+    is produced, so workers start before the last suggestion exists.
+    `reuse(branch, suggestion)` may return the result of an earlier run to
+    keep instead of applying again; `on_result(result, suggestion)` is
+    called from the worker as each suggestion finishes.
+    """
+    # One warm session serves every worker
+    session = AiderSession(output_dir, model_name)
+
+    def run(idx, suggestion):
+        suggestion_id = f"{branch_prefix}-{idx}"
+        previous = reuse(suggestion_id, suggestion) if reuse else None
+        if previous:
+            print(f"♻️  Keeping {suggestion_id} from an earlier run of the same suggestion")
+            return previous
+        try:
+            result = apply_code_changes(output_dir, suggestion, model_name, suggestion_id,
+                                        cache, rate_limiter, session, notes_for)
+        except Exception as e:
+            result = {'suggestion_id': suggestion_id, 'branch': suggestion_id, 'files': [],
+                      'returncode': None, 'status': 'failed', 'duration_s': 0.0, 'error': str(e)}
+        if on_result:
+            on_result(result, suggestion)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(run, idx, suggestion) for idx, suggestion in enumerate(suggestions, 1)]
+        results = [future.result() for future in futures]
+    print(session.summary())
+    return results
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Parse a performance report and apply code changes using aider.")
     parser.add_argument("--report-path", required=True, help="Path to the performance report file.")
     parser.add_argument("--output-dir", required=True, help="Path to the output directory.")
     parser.add_argument("--model", default="azure/gpt-4o", help="model to use")
+    parser.add_argument("--no-llm-cache", action="store_true", help="Bypass the LLM response cache")
     args = parser.parse_args()
 
+    cache = LLMCache(enabled=not args.no_llm_cache)
     device, url, report_text = read_report_with_check(args.report_path)
-    llm = LLM(model=args.model)
+    llm = CachedLLM(LLM(model=args.model), cache)
     yaml_response = convert_to_yaml(report_text, llm)
     parsed_report = parse_yaml_performance_report(yaml_response)
     
+    session = AiderSession(args.output_dir, args.model)
     for suggestion in parsed_report:
         suggestion_id = uuid.uuid4()
         print(f"Applying suggestion: {suggestion['summary']}")
-        apply_code_changes(args.output_dir, suggestion, args.model, suggestion_id)
\ No newline at end of file
+        result = apply_code_changes(args.output_dir, suggestion, args.model, suggestion_id, cache,
+                                    session=session)
+        print(f"{result['status']}: {result['branch']} ({result['duration_s']}s)")
+    print(session.summary())
+    print(cache.summary())
\ No newline at end of file
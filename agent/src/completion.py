@@ -0,0 +1,137 @@
+import asyncio
+import time
+from typing import Any, Dict
+
+# Reports every largest-contentful-paint candidate of the top frame back to Python
+LCP_OBSERVER_SCRIPT = """
+(() => {
+  if (window !== window.top) return;
+  const report = (entry) => window.__perfLcpCandidate({
+    startTime: entry.startTime,
+    url: entry.url || '',
+  });
+  new PerformanceObserver((list) => list.getEntries().forEach(report))
+    .observe({ type: 'largest-contentful-paint', buffered: true });
+  ['keydown', 'pointerdown'].forEach((type) => addEventListener(type, () => window.__perfLcpFinal(), { once: true, capture: true }));
+  addEventListener('visibilitychange', () => document.visibilityState === 'hidden' && window.__perfLcpFinal());
+})();
+"""
+
+# Default time budget for a single measurement
+DEADLINE_MS = 30000
+# How long LCP and the network must stay unchanged to be considered settled
+QUIET_MS = 1500
+# Requests allowed in flight while still counting the network as idle
+# (analytics beacons and long-polling connections never finish)
+MAX_INFLIGHT = 2
+
+
+class CompletionDetector:
+    """Resolves a measurement as soon as LCP is final and the network has settled.
+
+    LCP candidates arrive through a PerformanceObserver bound with
+    `page.expose_binding`; in-flight requests and the load event come from
+    CDP Network and Page lifecycle events. `wait()` returns when no new LCP
+    candidate or request activity happened for `quiet_ms` after load, or
+    when `deadline_ms` runs out.
+    """
+
+    def __init__(self, page, client, deadline_ms: int = DEADLINE_MS,
+                 quiet_ms: int = QUIET_MS, max_inflight: int = MAX_INFLIGHT):
+        self.page = page
+        self.client = client
+        self.deadline_ms = deadline_ms
+        self.quiet_ms = quiet_ms
+        self.max_inflight = max_inflight
+        self.lcp = None
+        self.lcp_final = False
+        self.loaded = False
+        self._inflight = set()
+        self._last_activity = time.perf_counter()
+        self._changed = asyncio.Event()
+
+    async def install(self):
+        """Register the observer binding and CDP listeners before navigation"""
+        await self.page.expose_binding("__perfLcpCandidate", self._on_lcp)
+        await self.page.expose_binding("__perfLcpFinal", self._on_lcp_final)
+        await self.page.add_init_script(LCP_OBSERVER_SCRIPT)
+
+        await self.client.send("Page.enable")
+        await self.client.send("Page.setLifecycleEventsEnabled", {"enabled": True})
+        self.client.on("Network.requestWillBeSent", self._on_request)
+        self.client.on("Network.loadingFinished", self._on_request_done)
+        self.client.on("Network.loadingFailed", self._on_request_done)
+        self.client.on("Page.lifecycleEvent", self._on_lifecycle)
+        return self
+
+    def reset(self):
+        """Forget state from a previous navigation on the same page"""
+        self.lcp = None
+        self.lcp_final = False
+        self.loaded = False
+        self._inflight.clear()
+        self._touch()
+
+    def _touch(self):
+        self._last_activity = time.perf_counter()
+        self._changed.set()
+
+    def _on_lcp(self, source, entry):
+        self.lcp = entry
+        self._touch()
+
+    def _on_lcp_final(self, source):
+        self.lcp_final = True
+        self._changed.set()
+
+    def _on_request(self, event):
+        self._inflight.add(event["requestId"])
+        self._touch()
+
+    def _on_request_done(self, event):
+        self._inflight.discard(event["requestId"])
+        self._touch()
+
+    def _on_lifecycle(self, event):
+        if event.get("name") == "load":
+            self.loaded = True
+            self._touch()
+
+    def _settled(self, now: float) -> bool:
+        if self.lcp is None or not self.loaded:
+            return False
+        if self.lcp_final:
+            return True
+        quiet = (now - self._last_activity) * 1000 >= self.quiet_ms
+        return quiet and len(self._inflight) <= self.max_inflight
+
+    async def wait(self) -> Dict[str, Any]:
+        """Wait for completion and report why and when it resolved"""
+        start = time.perf_counter()
+        deadline = start + self.deadline_ms / 1000
+        reason = "deadline"
+        while True:
+            now = time.perf_counter()
+            if self._settled(now):
+                reason = "settled"
+                break
+            if now >= deadline:
+                break
+            # Wake up on the next event, or when the quiet window could elapse
+            quiet_left = self.quiet_ms / 1000 - (now - self._last_activity)
+            timeout = min(max(quiet_left, 0.05), deadline - now)
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if reason == "deadline":
+            print(f"⚠️  Measurement hit the {self.deadline_ms}ms deadline "
+                  f"(LCP seen: {self.lcp is not None}, in-flight: {len(self._inflight)})")
+        return {
+            'reason': reason,
+            'elapsed_ms': elapsed_ms,
+            'lcp_ms': self.lcp['startTime'] if self.lcp else None,
+        }
@@ -0,0 +1,356 @@
+import asyncio
+import bisect
+import json
+import os
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urldefrag, urlparse
+
+# Takes a coverage delta at every largest-contentful-paint candidate of the top frame
+COVERAGE_OBSERVER_SCRIPT = """
+(() => {
+  if (window !== window.top) return;
+  new PerformanceObserver((list) => list.getEntries().forEach((entry) => window.__coverageLcp(entry.startTime)))
+    .observe({ type: 'largest-contentful-paint', buffered: true });
+})();
+"""
+
+# Branch holding every local stylesheet without the rules no page-load code used
+PRUNED_CSS_BRANCH = 'coverage-pruned-css'
+
+# Unused line ranges listed per file in an aider instruction
+MAX_NOTED_RANGES = 20
+
+Ranges = List[Tuple[int, int]]
+
+
+def _disjoint_used(functions: List[Dict[str, Any]]) -> Ranges:
+    """Executed ranges of one script from V8 block coverage.
+
+    Ranges nest (function, then blocks inside it), and the innermost range
+    decides whether an offset ran, as in Puppeteer's convertToDisjointRanges.
+    """
+    points = []
+    for function in functions:
+        for r in function['ranges']:
+            points.append((r['startOffset'], 0, r['endOffset'] - r['startOffset'], r['count']))
+            points.append((r['endOffset'], 1, r['endOffset'] - r['startOffset'], r['count']))
+    # Ends before starts; longer ranges open first and close last
+    points.sort(key=lambda p: (p[0], -p[1], -p[2] if p[1] == 0 else p[2]))
+    stack: List[int] = []
+    used: Ranges = []
+    last = 0
+    for offset, kind, _, count in points:
+        if stack and last < offset and stack[-1] > 0:
+            if used and used[-1][1] == last:
+                used[-1] = (used[-1][0], offset)
+            else:
+                used.append((last, offset))
+        last = offset
+        if kind == 0:
+            stack.append(count)
+        else:
+            stack.pop()
+    return used
+
+
+def _union(ranges: Ranges) -> Ranges:
+    merged: Ranges = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        elif end > start:
+            merged.append((start, end))
+    return merged
+
+
+def _subtract(ranges: Ranges, cut: Ranges) -> Ranges:
+    """Parts of `ranges` not covered by `cut` (both disjoint and sorted)"""
+    result: Ranges = []
+    cut = _union(cut)
+    for start, end in _union(ranges):
+        for c_start, c_end in cut:
+            if c_end <= start or c_start >= end:
+                continue
+            if c_start > start:
+                result.append((start, c_start))
+            start = max(start, c_end)
+            if start >= end:
+                break
+        if start < end:
+            result.append((start, end))
+    return result
+
+
+def _length(ranges: Ranges) -> int:
+    return sum(end - start for start, end in ranges)
+
+
+class CoverageRecorder:
+    """Precise JS coverage and CSS rule usage of one page load, split at LCP.
+
+    V8 block coverage and CSS rule usage are both taken as deltas. A delta
+    is taken at every LCP candidate, so everything up to the last candidate
+    counts as used before LCP; `finish()` takes the rest as used after LCP
+    and stops tracking. A delta lands a few milliseconds after its LCP
+    candidate, the time for the binding call to reach Python.
+    """
+
+    def __init__(self, page, client):
+        self.page = page
+        self.client = client
+        self.stylesheets: Dict[str, Dict[str, Any]] = {}
+        self.js: Dict[str, Dict[str, Any]] = {}
+        # (start, end, used, bucket) of every rule usage reported per stylesheet
+        self.css: Dict[str, List[Tuple[int, int, bool, str]]] = {}
+        self.lcp_ms = None
+        self._lock = asyncio.Lock()
+        self._finished = False
+
+    async def install(self):
+        """Start tracking before navigation"""
+        await self.page.expose_binding("__coverageLcp", self._on_lcp)
+        await self.page.add_init_script(COVERAGE_OBSERVER_SCRIPT)
+        self.client.on("CSS.styleSheetAdded", self._on_stylesheet)
+        await self.client.send("Profiler.enable")
+        await self.client.send("Profiler.startPreciseCoverage", {'callCount': False, 'detailed': True})
+        await self.client.send("DOM.enable")
+        await self.client.send("CSS.enable")
+        await self.client.send("CSS.startRuleUsageTracking")
+        return self
+
+    def _on_stylesheet(self, event):
+        header = event['header']
+        self.stylesheets[header['styleSheetId']] = header
+
+    async def _on_lcp(self, source, start_time):
+        async with self._lock:
+            if self._finished:
+                return
+            self.lcp_ms = start_time
+            await self._take('before')
+
+    async def _take(self, bucket: str):
+        js = await self.client.send("Profiler.takePreciseCoverage")
+        for script in js['result']:
+            url = urldefrag(script.get('url') or '')[0]
+            if not url.startswith('http'):
+                continue
+            entry = self.js.setdefault(url, {'length': 0, 'before': [], 'after': []})
+            for function in script['functions']:
+                for r in function['ranges']:
+                    entry['length'] = max(entry['length'], r['endOffset'])
+            entry[bucket].extend(_disjoint_used(script['functions']))
+        if bucket == 'before':
+            css = await self.client.send("CSS.takeCoverageDelta")
+            self._add_rules(css['coverage'], bucket)
+
+    def _add_rules(self, rules: List[Dict[str, Any]], bucket: str):
+        for rule in rules:
+            self.css.setdefault(rule['styleSheetId'], []).append(
+                (int(rule['startOffset']), int(rule['endOffset']), bool(rule['used']), bucket))
+
+    async def finish(self) -> Dict[str, Any]:
+        """Take the after-LCP delta, stop tracking and return per-URL ranges"""
+        async with self._lock:
+            self._finished = True
+            await self._take('after')
+            # The last delta of rule usage, up to the end of the load
+            css = await self.client.send("CSS.stopRuleUsageTracking")
+            await self.client.send("Profiler.stopPreciseCoverage")
+        self._add_rules(css['ruleUsage'], 'after')
+
+        assets: Dict[str, Dict[str, Any]] = {}
+        for url, entry in self.js.items():
+            before = _union(entry['before'])
+            used = _union(entry['before'] + entry['after'])
+            assets[url] = {'type': 'js', 'length': entry['length'], 'before': before,
+                           'after': _subtract(used, before), 'rules': []}
+        for sheet_id, header in self.stylesheets.items():
+            url = urldefrag(header.get('sourceURL') or '')[0]
+            if header.get('isInline') or not url.startswith('http') or url in assets:
+                continue
+            rules = self.css.get(sheet_id, [])
+            before = _union([(start, end) for start, end, used, bucket in rules if used and bucket == 'before'])
+            used = _union([(start, end) for start, end, used, _ in rules if used])
+            # Whole rules nothing used during the load; the only ranges safe to cut
+            unused_rules = {(start, end) for start, end, used, _ in rules if not used}
+            assets[url] = {
+                'type': 'css',
+                'length': int(header.get('length') or 0),
+                'before': before,
+                'after': _subtract(used, before),
+                'rules': _subtract(sorted(unused_rules), used),
+            }
+        return {'lcp_ms': self.lcp_ms, 'assets': assets}
+
+
+def _line_ranges(text: str, ranges: Ranges) -> List[Tuple[int, int]]:
+    """1-based inclusive line spans of character ranges"""
+    newlines = [i for i, char in enumerate(text) if char == '\n']
+    spans = []
+    for start, end in ranges:
+        first = bisect.bisect_right(newlines, start - 1) + 1
+        last = bisect.bisect_right(newlines, max(end - 1, start) - 1) + 1
+        if spans and first <= spans[-1][1] + 1:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], last))
+        else:
+            spans.append((first, last))
+    return spans
+
+
+def _bytes(text: str, ranges: Ranges) -> int:
+    return sum(len(text[start:end].encode('utf-8', errors='surrogateescape')) for start, end in ranges)
+
+
+class CoverageReport:
+    """Unused JS/CSS bytes per asset, mapped onto the files saved under assets/"""
+
+    def __init__(self, page_url: str, lcp_ms: Optional[float], assets: List[Dict[str, Any]]):
+        self.page_url = page_url
+        self.lcp_ms = lcp_ms
+        self.assets = assets
+
+    @classmethod
+    def build(cls, snapshot: Dict[str, Any], output_dir: Path, page_url: str) -> "CoverageReport":
+        """Map the recorder's character ranges onto local files (same-origin assets only)"""
+        host = urlparse(page_url).hostname
+        assets = []
+        for url, entry in snapshot['assets'].items():
+            length = entry['length']
+            unused = _subtract([(0, length)], entry['before'] + entry['after'])
+            row = {
+                'url': url,
+                'type': entry['type'],
+                'path': None,
+                'total_bytes': length,
+                'used_before_lcp_bytes': _length(entry['before']),
+                'used_after_lcp_bytes': _length(entry['after']),
+                'unused_bytes': _length(unused),
+                'unused_lines': [],
+                'after_lcp_lines': [],
+                'unused_rules': [],
+            }
+            rel_path = Path("assets") / urlparse(url).path.lstrip('/')
+            local = Path(output_dir) / rel_path
+            if urlparse(url).hostname == host and local.is_file():
+                text = local.read_bytes().decode('utf-8', errors='surrogateescape')
+                if len(text) == length:
+                    row['path'] = rel_path.as_posix()
+                    # Offsets are characters; report what the file actually holds
+                    row.update(total_bytes=_bytes(text, [(0, length)]),
+                               used_before_lcp_bytes=_bytes(text, entry['before']),
+                               used_after_lcp_bytes=_bytes(text, entry['after']),
+                               unused_bytes=_bytes(text, unused),
+                               # CSS: whole unused rules, not the whitespace between rules
+                               unused_lines=_line_ranges(text, entry['rules'] or unused),
+                               after_lcp_lines=_line_ranges(text, entry['after']),
+                               unused_rules=entry['rules'])
+                else:
+                    row['mismatch'] = f"served {length} characters, {local} holds {len(text)}"
+            total = row['total_bytes']
+            row['unused_percent'] = round(100 * row['unused_bytes'] / total, 1) if total else 0.0
+            assets.append(row)
+        assets.sort(key=lambda row: -row['unused_bytes'])
+        return cls(page_url, snapshot.get('lcp_ms'), assets)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CoverageReport":
+        """Report saved with `to_dict`; line and rule ranges come back as lists"""
+        return cls(data['url'], data.get('lcp_ms'), data['assets'])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'url': self.page_url,
+            'lcp_ms': self.lcp_ms,
+            'total_bytes': sum(a['total_bytes'] for a in self.assets),
+            'unused_bytes': sum(a['unused_bytes'] for a in self.assets),
+            'assets': self.assets,
+        }
+
+    def save(self, path: Path) -> Path:
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    def summary(self, top: int = 10) -> str:
+        lines = []
+        for asset in self.assets[:top]:
+            where = asset['path'] or asset['url']
+            lines.append(f"- {where}: {asset['unused_bytes'] / 1024:.1f}KB of "
+                         f"{asset['total_bytes'] / 1024:.1f}KB unused ({asset['unused_percent']}%), "
+                         f"{asset['used_after_lcp_bytes'] / 1024:.1f}KB only after LCP")
+        return "\n".join(lines)
+
+    def table(self, top: int = 10) -> str:
+        """Markdown section for the report the suggestions are extracted from"""
+        rows = [a for a in self.assets if a['unused_bytes']][:top]
+        if not rows:
+            return ""
+        lines = [
+            "## Measured unused JavaScript and CSS (coverage up to LCP)",
+            "",
+            "Bytes of each file that no code executed or no style rule matched during the page load, "
+            "and bytes first used only after LCP (candidates for deferring or splitting).",
+            "",
+            "| File | Type | Size | Unused | Used only after LCP |",
+            "|---|---|---|---|---|",
+        ]
+        for asset in rows:
+            lines.append(f"| {asset['path'] or asset['url']} | {asset['type']} | {asset['total_bytes']} "
+                         f"| {asset['unused_bytes']} ({asset['unused_percent']}%) | {asset['used_after_lcp_bytes']} |")
+        return "\n".join(lines) + "\n"
+
+    def notes_for(self, files: List[str]) -> str:
+        """Unused line ranges of the files aider is about to edit, for its instruction"""
+        by_path = {a['path']: a for a in self.assets if a['path']}
+        notes = []
+        for name in files:
+            asset = by_path.get(Path(os.path.normpath(name)).as_posix())
+            if not asset or not asset['unused_lines']:
+                continue
+            spans = ", ".join(f"{a}-{b}" if a != b else str(a) for a, b in asset['unused_lines'][:MAX_NOTED_RANGES])
+            more = len(asset['unused_lines']) - MAX_NOTED_RANGES
+            notes.append(f"- `{asset['path']}`: {asset['unused_percent']}% unused during page load; "
+                         f"unused lines {spans}" + (f" (and {more} more ranges)" if more > 0 else ""))
+            if asset['after_lcp_lines']:
+                spans = ", ".join(f"{a}-{b}" if a != b else str(a)
+                                  for a, b in asset['after_lcp_lines'][:MAX_NOTED_RANGES])
+                notes.append(f"  first used only after LCP: lines {spans}")
+        if not notes:
+            return ""
+        return ("\n## Measured coverage\n"
+                "Code at these lines never ran (CSS: never matched) while the page loaded. "
+                "Lines are as of the unedited file.\n" + "\n".join(notes) + "\n")
+
+    def prune_css(self, output_dir: Path, branch: str = PRUNED_CSS_BRANCH) -> Optional[str]:
+        """Commit every local stylesheet without its unused rules to `branch`, from master.
+
+        Rules unused during the load may still matter for hover states,
+        other breakpoints or later interactions; the branch is a variant to
+        measure and review, not a fix to ship as is. JS is not pruned: its
+        coverage ranges do not line up with statements that can be cut safely.
+        """
+        from agent.src.code_apply import worktree_root
+        prunable = [a for a in self.assets if a['type'] == 'css' and a['path'] and a['unused_rules']]
+        if not prunable:
+            return None
+        worktree = worktree_root(output_dir) / branch
+        _run_git(["worktree", "add", "--force", "-B", branch, str(worktree), "master"], output_dir)
+        try:
+            for asset in prunable:
+                path = worktree / asset['path']
+                text = path.read_bytes().decode('utf-8', errors='surrogateescape')
+                for start, end in reversed(asset['unused_rules']):
+                    text = text[:start] + text[end:]
+                path.write_bytes(text.encode('utf-8', errors='surrogateescape'))
+            _run_git(["commit", "-qam", f"Remove CSS rules unused during page load from {len(prunable)} files"],
+                     worktree)
+        finally:
+            _run_git(["worktree", "remove", "--force", str(worktree)], output_dir)
+        return branch
+
+
+def _run_git(args: List[str], cwd: Path) -> subprocess.CompletedProcess:
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True)
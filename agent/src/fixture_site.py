@@ -0,0 +1,316 @@
+import random
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from string import Template
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_PORT = 8765
+# Served from the same port under another hostname, so the page sees a cross-origin host
+FIRST_PARTY_HOST = "127.0.0.1"
+THIRD_PARTY_HOST = "localhost"
+
+# Element timing of every element tagged `elementtiming="lcp"`, recorded by
+# the page itself independently of the collector under test
+GROUND_TRUTH_SCRIPT = """
+window.__groundTruth = [];
+new PerformanceObserver((list) => list.getEntries().forEach((e) => window.__groundTruth.push({
+  id: e.identifier, renderTime: e.renderTime || e.loadTime, url: e.url || '', size: e.intersectionRect.width * e.intersectionRect.height,
+}))).observe({ type: 'element', buffered: true });
+"""
+
+PAGE = Template("""<!doctype html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>$title</title>
+<script>$ground_truth</script>
+$head
+</head>
+<body>
+$body
+</body>
+</html>
+""")
+
+CONTENT_TYPES = {
+    '.js': 'application/javascript',
+    '.css': 'text/css',
+    '.woff2': 'font/woff2',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.html': 'text/html; charset=utf-8',
+}
+
+# The tagged headline or hero is always the largest element, so LCP and its
+# element timing describe the same paint
+HEADLINE = "Fast pages start with a measurable baseline"
+COPY = "Synthetic fixture copy for the benchmark suite. It stays smaller than the hero."
+
+
+class Scenario:
+    """One synthetic page: its markup, first-party assets and the LCP it is built for.
+
+    `floor_ms` is the server-side delay on the LCP element's critical path;
+    no correct measurement can report an LCP below it. `$tp` in the markup
+    and assets is replaced by the third-party origin.
+    """
+
+    def __init__(self, name: str, description: str, head: str, body: str,
+                 assets: Dict[str, str] = None, floor_ms: float = 0):
+        self.name = name
+        self.description = description
+        self.head = head
+        self.body = body
+        self.assets = assets or {}
+        self.floor_ms = floor_ms
+
+    def render(self, third_party: str) -> str:
+        return PAGE.substitute(
+            title=self.name,
+            ground_truth=GROUND_TRUTH_SCRIPT,
+            head=Template(self.head).safe_substitute(tp=third_party),
+            body=Template(self.body).safe_substitute(tp=third_party),
+        )
+
+
+SCENARIOS: Dict[str, Scenario] = {s.name: s for s in [
+    Scenario(
+        'text-hero',
+        "Text-only hero, nothing render-blocking",
+        head="<style>h1{font:64px/1.2 sans-serif;margin:24px} p{font:16px/1.5 sans-serif;margin:24px}</style>",
+        body=f'<h1 elementtiming="lcp">{HEADLINE}</h1><p>{COPY}</p>',
+    ),
+    Scenario(
+        'blocking-script',
+        "Render-blocking stylesheet (200ms) and two blocking scripts (500ms, 300ms) in <head>",
+        head=('<link rel="stylesheet" href="/static/blocking.css?delay=200&bytes=4000">\n'
+              '<script src="/static/blocking-a.js?delay=500&bytes=40000"></script>\n'
+              '<script src="/static/blocking-b.js?delay=300&bytes=8000"></script>\n'
+              '<style>h1{font:64px/1.2 sans-serif;margin:24px}</style>'),
+        body=f'<h1 elementtiming="lcp">{HEADLINE}</h1><p>{COPY}</p>',
+        floor_ms=500,
+    ),
+    Scenario(
+        'slow-font',
+        "Text hero in a web font that arrives after 1000ms with font-display: block",
+        head=("<style>@font-face{font-family:Brand;src:url(/static/brand.woff2?delay=1000&bytes=30000) "
+              "format('woff2');font-display:block}"
+              "h1{font:64px/1.2 Brand,sans-serif;margin:24px}</style>"),
+        body=f'<h1 elementtiming="lcp">{HEADLINE}</h1>',
+        floor_ms=1000,
+    ),
+    Scenario(
+        'large-hero',
+        "1.2MB hero image, first byte after 200ms, trickled at 8Mbps",
+        head="<style>img{display:block;width:100%;height:auto}</style>",
+        body=('<img elementtiming="lcp" alt="" src="/static/hero.png?delay=200&bytes=1200000&kbps=8000">'
+              '<p>Caption</p>'),
+        floor_ms=1400,
+    ),
+    Scenario(
+        'third-party',
+        "Blocking third-party tag (400ms), async widget (900ms) and a long-polling beacon",
+        head=('<script src="$tp/static/tag.js?delay=400&bytes=30000"></script>\n'
+              '<script async src="$tp/static/widget.js?delay=900&bytes=80000"></script>\n'
+              '<style>h1{font:64px/1.2 sans-serif;margin:24px}</style>'),
+        body=(f'<h1 elementtiming="lcp">{HEADLINE}</h1><p>{COPY}</p>\n'
+              '<img alt="" src="$tp/static/pixel.gif?delay=300" width="1" height="1">\n'
+              '<script>fetch("$tp/static/poll?hang=20000").catch(() => {});</script>'),
+        floor_ms=400,
+    ),
+    Scenario(
+        'late-lcp',
+        "Small headline first, a larger hero image swapped in by script after 1500ms",
+        head="<style>h1{font:24px/1.2 sans-serif;margin:24px} img{display:block;width:100%;height:auto}</style>",
+        body=('<h1 elementtiming="lcp">Loading</h1><div id="slot"></div>\n'
+              '<script>setTimeout(() => { const img = new Image(); img.alt = "";'
+              ' img.setAttribute("elementtiming", "lcp"); img.src = "/static/late.png?bytes=300000";'
+              ' document.getElementById("slot").appendChild(img); }, 1500);</script>'),
+        floor_ms=1500,
+    ),
+]}
+
+# Page of the end-to-end benchmark; its first-party CSS and JS are what the
+# scripted suggestions edit (see agent.src.benchmark.E2E_EDITS)
+STOREFRONT = Scenario(
+    'storefront',
+    "Hero image injected by app.js after 800ms, headline in a web font blocked for 1500ms",
+    head=('<link rel="stylesheet" href="/storefront/app.css">\n'
+          '<script src="/storefront/app.js" defer></script>\n'
+          '<script async src="$tp/static/analytics.js?delay=600&bytes=40000"></script>'),
+    body=f'<h1 elementtiming="lcp">{HEADLINE}</h1><div id="hero-slot"></div><p>Free shipping on every order.</p>',
+    assets={
+        'app.css': ("@font-face { font-family: Brand; src: url(/static/brand.woff2?delay=1500&bytes=30000) "
+                    "format('woff2'); font-display: block; }\n"
+                    "h1 { font: 56px/1.2 Brand, sans-serif; margin: 24px; }\n"
+                    ".hero { display: block; width: 100%; height: auto; }\n"),
+        'app.js': ("var HERO_DELAY_MS = 800;\n"
+                   "setTimeout(function () {\n"
+                   "  var img = document.createElement('img');\n"
+                   "  img.className = 'hero';\n"
+                   "  img.alt = '';\n"
+                   "  img.setAttribute('elementtiming', 'lcp');\n"
+                   "  img.src = '/static/hero.png?bytes=400000';\n"
+                   "  document.getElementById('hero-slot').appendChild(img);\n"
+                   "}, HERO_DELAY_MS);\n"),
+    },
+)
+
+
+def noise_png(size: int, width: int = 800, seed: int = 0) -> bytes:
+    """A valid PNG of roughly `size` bytes; random pixels keep it from compressing"""
+    height = max(1, size // (width * 3 + 1))
+    rng = random.Random(seed)
+    raw = b"".join(b"\x00" + rng.randbytes(width * 3) for _ in range(height))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr)
+            + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b""))
+
+
+# 1x1 transparent GIF
+PIXEL_GIF = bytes.fromhex("47494638396101000100800000000000ffffff21f90401000000002c"
+                          "00000000010001000002024401003b")
+
+
+def padding(ext: str, size: int) -> bytes:
+    """Filler of `size` bytes that parses as the given resource type"""
+    if ext == '.js':
+        line = b"/* fixture padding */ void 0;\n"
+    elif ext == '.css':
+        line = b".fixture-padding { color: inherit; }\n"
+    else:
+        # Fonts are deliberately invalid: the browser gives up on them and
+        # falls back once the (delayed) response is complete
+        line = b"\x00" * 64
+    return (line * (size // len(line) + 1))[:size]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        site: FixtureSite = self.server.site
+        site.requests += 1
+        parsed = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        status, content_type, body = site.resolve(parsed.path, params)
+
+        # Long polls are held open like an analytics beacon that never finishes
+        if 'hang' in params:
+            time.sleep(float(params['hang']) / 1000)
+        if 'delay' in params:
+            time.sleep(float(params['delay']) / 1000)
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Timing-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+
+        kbps = float(params.get('kbps', 0))
+        if not kbps:
+            self.wfile.write(body)
+            return
+        # Trickle the body to emulate a slow link for this one resource
+        chunk_size = 16 * 1024
+        for offset in range(0, len(body), chunk_size):
+            self.wfile.write(body[offset:offset + chunk_size])
+            self.wfile.flush()
+            time.sleep(chunk_size * 8 / (kbps * 1000))
+
+
+class FixtureSite:
+    """Local HTTP server for the synthetic benchmark pages.
+
+    `/<scenario>/` serves a scenario page and `/<scenario>/<file>` its
+    first-party assets. `/static/<file>` serves generated filler whose
+    timing is set by query parameters: `delay` (ms before the response),
+    `bytes` (body size), `kbps` (trickle rate) and `hang` (ms to hold a
+    long poll). The same server answers as `localhost` for third-party
+    stand-ins.
+    """
+
+    def __init__(self, port: int = DEFAULT_PORT):
+        self.port = port
+        self.requests = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._images: Dict[Tuple[str, int], bytes] = {}
+
+    @property
+    def origin(self) -> str:
+        return f"http://{FIRST_PARTY_HOST}:{self.port}"
+
+    @property
+    def third_party_origin(self) -> str:
+        return f"http://{THIRD_PARTY_HOST}:{self.port}"
+
+    def url(self, scenario: str) -> str:
+        return f"{self.origin}/{scenario}/"
+
+    def scenario(self, name: str) -> Optional[Scenario]:
+        return STOREFRONT if name == STOREFRONT.name else SCENARIOS.get(name)
+
+    def resolve(self, path: str, params: Dict[str, str]) -> Tuple[int, str, bytes]:
+        """Status, content type and body for a request path"""
+        parts = path.strip("/").split("/", 1)
+        ext = path[path.rfind("."):] if "." in path.rsplit("/", 1)[-1] else ""
+        if parts[0] == "static" and len(parts) == 2:
+            return 200, CONTENT_TYPES.get(ext, "text/plain"), self._static(parts[1], ext, params)
+        scenario = self.scenario(parts[0])
+        if scenario is None:
+            return 404, "text/plain", b"not found"
+        if len(parts) == 1 or not parts[1]:
+            return 200, CONTENT_TYPES['.html'], scenario.render(self.third_party_origin).encode()
+        if parts[1] in scenario.assets:
+            body = Template(scenario.assets[parts[1]]).safe_substitute(tp=self.third_party_origin)
+            return 200, CONTENT_TYPES.get(ext, "text/plain"), body.encode()
+        return 404, "text/plain", b"not found"
+
+    def _static(self, name: str, ext: str, params: Dict[str, str]) -> bytes:
+        size = int(params.get('bytes', 0))
+        if ext == '.png':
+            key = (name, size)
+            if key not in self._images:
+                self._images[key] = noise_png(size or 10000, seed=zlib.crc32(name.encode()))
+            return self._images[key]
+        if ext == '.gif':
+            return PIXEL_GIF
+        if not ext:
+            return b""
+        return padding(ext, size)
+
+    def start(self) -> "FixtureSite":
+        self._server = ThreadingHTTPServer((FIRST_PARTY_HOST, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.site = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fixture-site", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FixtureSite":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,148 @@
+import argparse
+from typing import List
+
+from agent.src.ablation import DEFAULT_BUDGET_S, DEFAULT_TOP_N
+from agent.src.throttle import ENCODINGS
+from agent.src.utils import non_negative_int, positive_int
+
+DEFAULT_CONCURRENCY = 2
+DEFAULT_SAMPLES = 7
+DEFAULT_WARMUP = 1
+DEFAULT_APPLY_WORKERS = 2
+DEFAULT_LLM_RPM = 20
+# Hours an earlier capture is replayed before the site is fetched live again
+DEFAULT_CAPTURE_MAX_AGE_H = 24
+
+
+def add_concurrency_argument(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        '--concurrency',
+        type=positive_int,
+        default=DEFAULT_CONCURRENCY,
+        help=f'Number of branches to retest at the same time (default: {DEFAULT_CONCURRENCY}; parallel loads '
+             'share the CPU, so throttled mobile samples get noisier, use 1 for the steadiest numbers)'
+    )
+
+
+def add_flow_arguments(parser: argparse.ArgumentParser):
+    """Options of ReportApplyFlow shared by `apply`, `pipeline`, `batch` and the flow's own CLI"""
+    parser.add_argument(
+        '--live',
+        action='store_true',
+        help='Fetch resources live during retests instead of replaying the recorded archive'
+    )
+    add_concurrency_argument(parser)
+    parser.add_argument(
+        '--samples',
+        type=positive_int,
+        default=DEFAULT_SAMPLES,
+        help=f'Maximum LCP samples per branch (default: {DEFAULT_SAMPLES})'
+    )
+    parser.add_argument(
+        '--warmup',
+        type=non_negative_int,
+        default=DEFAULT_WARMUP,
+        help=f'Discarded warm-up runs per branch (default: {DEFAULT_WARMUP})'
+    )
+    parser.add_argument(
+        '--no-llm-cache',
+        action='store_true',
+        help='Bypass the on-disk LLM response cache'
+    )
+    parser.add_argument(
+        '--apply-workers',
+        type=positive_int,
+        default=DEFAULT_APPLY_WORKERS,
+        help=f'Number of suggestions to apply at the same time (default: {DEFAULT_APPLY_WORKERS})'
+    )
+    parser.add_argument(
+        '--llm-rpm',
+        type=positive_int,
+        default=DEFAULT_LLM_RPM,
+        help=f'Maximum LLM-bound calls per minute across workers (default: {DEFAULT_LLM_RPM})'
+    )
+    parser.add_argument(
+        '--no-measurement-cache',
+        action='store_true',
+        help='Re-measure every variant instead of reusing stored samples'
+    )
+    parser.add_argument(
+        '--recapture',
+        action='store_true',
+        help='Fetch assets live even when an earlier capture can be replayed'
+    )
+    parser.add_argument(
+        '--capture-max-age',
+        type=float,
+        default=DEFAULT_CAPTURE_MAX_AGE_H,
+        help=f'Hours after which an earlier capture is fetched live again instead of replayed (default: {DEFAULT_CAPTURE_MAX_AGE_H})'
+    )
+    parser.add_argument(
+        '--profile',
+        choices=['cprofile', 'pyinstrument'],
+        help='Profile each pipeline stage and save the profiles next to the trace'
+    )
+    parser.add_argument(
+        '--serve-encoding',
+        choices=ENCODINGS,
+        default='auto',
+        help='Encoding that sizes throttled transfers of locally served responses (default: auto, as the origin sent them)'
+    )
+    parser.add_argument(
+        '--ablation',
+        action='store_true',
+        help='Block or defer third-party origins and render-blocking resources one at a time and rank them by LCP impact before suggesting'
+    )
+    parser.add_argument(
+        '--ablation-top',
+        type=positive_int,
+        default=DEFAULT_TOP_N,
+        help=f'Render-blocking resources to experiment with (default: {DEFAULT_TOP_N})'
+    )
+    parser.add_argument(
+        '--ablation-budget',
+        type=float,
+        default=DEFAULT_BUDGET_S,
+        help=f'Seconds after which no new ablation round starts (default: {DEFAULT_BUDGET_S})'
+    )
+    parser.add_argument(
+        '--coverage',
+        action='store_true',
+        help='Record JS/CSS coverage up to LCP, report unused bytes per asset and hand unused line ranges to aider'
+    )
+    parser.add_argument(
+        '--coverage-prune',
+        action='store_true',
+        help='Also commit the stylesheets without their unused rules to a branch and compare it (implies --coverage)'
+    )
+
+
+def flow_argument_list(args: argparse.Namespace) -> List[str]:
+    """The options added by add_flow_arguments, as command-line arguments for a child process"""
+    argv = ['--concurrency', str(args.concurrency),
+            '--samples', str(args.samples),
+            '--warmup', str(args.warmup),
+            '--apply-workers', str(args.apply_workers),
+            '--llm-rpm', str(args.llm_rpm),
+            '--capture-max-age', str(args.capture_max_age)]
+    if args.live:
+        argv.append('--live')
+    if args.no_llm_cache:
+        argv.append('--no-llm-cache')
+    if args.no_measurement_cache:
+        argv.append('--no-measurement-cache')
+    if args.recapture:
+        argv.append('--recapture')
+    if args.profile:
+        argv.extend(['--profile', args.profile])
+    if args.serve_encoding != 'auto':
+        argv.extend(['--serve-encoding', args.serve_encoding])
+    if args.ablation:
+        argv.extend(['--ablation',
+                     '--ablation-top', str(args.ablation_top),
+                     '--ablation-budget', str(args.ablation_budget)])
+    if args.coverage:
+        argv.append('--coverage')
+    if args.coverage_prune:
+        argv.append('--coverage-prune')
+    return argv
@@ -0,0 +1,116 @@
+import subprocess
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+class GitObjectReader:
+    """Reads files of any commit straight from the object database.
+
+    Keeps one `git cat-file --batch` process alive per repository and
+    caches blobs by object id, so variants can be served without checking
+    branches out and without touching the working tree.
+    """
+
+    def __init__(self, repo_dir: Path, max_cache_bytes: int = 128 * 1024 * 1024):
+        self.repo_dir = Path(repo_dir)
+        self.max_cache_bytes = max_cache_bytes
+        self._proc = None
+        self._lock = threading.Lock()
+        self._blobs: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cache_bytes = 0
+        self._paths: Dict[Tuple[str, str], Optional[str]] = {}
+        self.stats = {'hits': 0, 'reads': 0}
+
+    def _process(self):
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = subprocess.Popen(
+                ['git', 'cat-file', '--batch'],
+                cwd=self.repo_dir,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE
+            )
+        return self._proc
+
+    def resolve(self, rev: str) -> str:
+        """Pin a branch or commit name to a commit id"""
+        result = subprocess.run(
+            ['git', 'rev-parse', '--verify', f'{rev}^{{commit}}'],
+            cwd=self.repo_dir, capture_output=True, text=True, check=True
+        )
+        return result.stdout.strip()
+
+    def tree(self, rev: str) -> str:
+        """Tree id of a branch or commit; equal trees mean identical files"""
+        result = subprocess.run(
+            ['git', 'rev-parse', '--verify', f'{rev}^{{tree}}'],
+            cwd=self.repo_dir, capture_output=True, text=True, check=True
+        )
+        return result.stdout.strip()
+
+    def _cat(self, name: str) -> Tuple[Optional[str], Optional[bytes]]:
+        proc = self._process()
+        proc.stdin.write(name.encode() + b'\n')
+        proc.stdin.flush()
+        header = proc.stdout.readline().decode().rstrip('\n')
+        # "<name> missing" or "<name> ambiguous"; the name itself may contain spaces
+        if header.endswith((' missing', ' ambiguous')):
+            return None, None
+        oid, obj_type, size = header.split(' ')
+        body = proc.stdout.read(int(size))
+        proc.stdout.read(1)  # trailing newline
+        if obj_type != 'blob':
+            return None, None
+        return oid, body
+
+    def _remember(self, oid: str, body: bytes):
+        if len(body) > self.max_cache_bytes:
+            return
+        self._blobs[oid] = body
+        self._cache_bytes += len(body)
+        while self._cache_bytes > self.max_cache_bytes:
+            _, evicted = self._blobs.popitem(last=False)
+            self._cache_bytes -= len(evicted)
+
+    def read(self, commit: str, path: str) -> Optional[bytes]:
+        """Contents of `path` at `commit`, or None if it does not exist there"""
+        with self._lock:
+            key = (commit, path)
+            if key in self._paths:
+                oid = self._paths[key]
+                if oid is None:
+                    return None
+                if oid in self._blobs:
+                    self._blobs.move_to_end(oid)
+                    self.stats['hits'] += 1
+                    return self._blobs[oid]
+
+            oid, body = self._cat(f'{commit}:{path}')
+            self._paths[key] = oid
+            self.stats['reads'] += 1
+            if oid is not None:
+                self._remember(oid, body)
+            return body
+
+    def close(self):
+        with self._lock:
+            if self._proc and self._proc.poll() is None:
+                self._proc.stdin.close()
+                self._proc.wait()
+            self._proc = None
+
+    def view(self, rev: str) -> "VariantView":
+        return VariantView(self, rev)
+
+
+class VariantView:
+    """Read-only snapshot of one branch or commit of the asset repo"""
+
+    def __init__(self, reader: GitObjectReader, rev: str):
+        self.reader = reader
+        self.rev = rev
+        self.commit = reader.resolve(rev)
+
+    def read(self, path: str) -> Optional[bytes]:
+        return self.reader.read(self.commit, path)
@@ -1,24 +1,22 @@
 from langchain.tools import tool
+from agent.src.metrics import compute_metrics, entries_until_lcp
 
 class LCPFilterTool:
 
+    @staticmethod
     def extract_lcp_score(report_data):
-        # returns the last "end" value in the report_data
-        return report_data[-1]["end"]
+        # returns the start of the LCP entry in the report_data
+        return compute_metrics(report_data).lcp
 
     @staticmethod
     def extract_lcp_events(report_data):
-        # Sort report by start and end times
-        sorted_data = sorted(report_data, key=lambda x: (x['start'], x['end']))
-        
-        # Find the index of the first object with "type": "LCP"
-        lcp_index = next((i for i, x in enumerate(sorted_data) if x['type'] == "LCP"), None)
+        # All objects up to and including LCP, ordered by start and end times
+        events = entries_until_lcp(report_data)
         
-        if lcp_index is None:
+        if events is None:
             return "No LCP event found in the report data."
             
-        # Return all objects up to and including LCP
-        return sorted_data[:lcp_index + 1]
+        return events
 
     @tool("Filter LCP Data")
     def filter_lcp_data(report_data):
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import litellm
+
+DEFAULT_CACHE_DIR = Path(".cache") / "llm"
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class LLMCache:
+    """Content-addressed on-disk cache of LLM responses.
+
+    Entries are keyed by model, a hash of the prompt and the temperature,
+    expire after `ttl_seconds` and are evicted least-recently-used first
+    once the cache grows past `max_bytes`. With `enabled=False` every
+    lookup misses and nothing is written.
+    """
+
+    def __init__(self, root: Path = DEFAULT_CACHE_DIR, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_bytes: int = DEFAULT_MAX_BYTES, enabled: bool = True):
+        self.root = Path(root)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.enabled = enabled and os.getenv("LLM_CACHE_BYPASS", "") not in ("1", "true")
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+
+    @staticmethod
+    def key(model: str, prompt: Any, temperature: Optional[float] = None) -> str:
+        prompt_hash = hashlib.sha256(json.dumps(prompt, sort_keys=True).encode()).hexdigest()
+        raw = json.dumps({'model': model, 'prompt': prompt_hash, 'temperature': temperature})
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, model: str, prompt: Any, temperature: Optional[float] = None) -> Optional[str]:
+        if not self.enabled:
+            return None
+        path = self._path(self.key(model, prompt, temperature))
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.stats['misses'] += 1
+            return None
+
+        if time.time() - entry['created'] > self.ttl_seconds:
+            self.stats['expired'] += 1
+            self.stats['misses'] += 1
+            path.unlink(missing_ok=True)
+            return None
+
+        # Touch for LRU eviction
+        os.utime(path)
+        self.stats['hits'] += 1
+        return entry['response']
+
+    def put(self, model: str, prompt: Any, response: str, temperature: Optional[float] = None):
+        if not self.enabled:
+            return
+        path = self._path(self.key(model, prompt, temperature))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Workers may write the same key at once; each uses its own temp file
+        tmp = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({
+                'created': time.time(),
+                'model': model,
+                'temperature': temperature,
+                'response': response
+            }, f)
+        tmp.replace(path)
+        self._evict()
+
+    def _evict(self):
+        files = []
+        for p in self.root.glob("*/*.json"):
+            try:
+                files.append((p.stat(), p))
+            except FileNotFoundError:
+                # Evicted by another worker meanwhile
+                continue
+        total = sum(stat.st_size for stat, _ in files)
+        if total <= self.max_bytes:
+            return
+        for stat, path in sorted(files, key=lambda f: f[0].st_mtime):
+            path.unlink(missing_ok=True)
+            self.stats['evictions'] += 1
+            total -= stat.st_size
+            if total <= self.max_bytes:
+                break
+
+    def summary(self) -> str:
+        return (f"LLM cache: {self.stats['hits']} hits, {self.stats['misses']} misses"
+                f"{'' if self.enabled else ' (bypassed)'}")
+
+
+def stream_completion(llm, messages: List[Dict[str, str]]) -> Iterator[str]:
+    """Yield a crewai LLM's reply to `messages` chunk by chunk as it streams in"""
+    response = litellm.completion(
+        model=llm.model,
+        messages=messages,
+        stream=True,
+        base_url=getattr(llm, 'base_url', None),
+        api_key=getattr(llm, 'api_key', None),
+        api_version=getattr(llm, 'api_version', None),
+        temperature=getattr(llm, 'temperature', None),
+    )
+    for chunk in response:
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+
+class CachedLLM:
+    """Wraps a crewai LLM so identical `call()`s are answered from the cache"""
+
+    def __init__(self, llm, cache: LLMCache):
+        self.llm = llm
+        self.cache = cache
+
+    def call(self, messages: List[Dict[str, str]], *args, **kwargs) -> str:
+        model = getattr(self.llm, 'model', str(self.llm))
+        temperature = getattr(self.llm, 'temperature', None)
+        cached = self.cache.get(model, messages, temperature)
+        if cached is not None:
+            return cached
+        response = self.llm.call(messages, *args, **kwargs)
+        self.cache.put(model, messages, response, temperature)
+        return response
+
+    def stream(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """Like `call()`, but yields the reply as it streams; a cache hit is one chunk"""
+        model = getattr(self.llm, 'model', str(self.llm))
+        temperature = getattr(self.llm, 'temperature', None)
+        cached = self.cache.get(model, messages, temperature)
+        if cached is not None:
+            yield cached
+            return
+        chunks = []
+        for chunk in stream_completion(self.llm, messages):
+            chunks.append(chunk)
+            yield chunk
+        self.cache.put(model, messages, ''.join(chunks), temperature)
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from agent.src.metrics import PageMetrics
+from agent.src.sampling import VariantSamples
+
+# Bump when measurements change meaning without any of the sources below changing
+COLLECTOR_VERSION = 1
+
+# Modules whose code decides what a measurement is; editing any of them
+# invalidates every stored sample
+_COLLECTOR_SOURCES = ('browser_navigator.py', 'completion.py', 'perf_collector.py',
+                      'metrics.py', 'network_archive.py', 'throttle.py')
+
+
+def measurements_path_for(output_dir: Path) -> Path:
+    """Stored samples sit next to the asset repo, like the network archive"""
+    output_dir = Path(output_dir)
+    return output_dir.parent / f"{output_dir.name}.measurements.json"
+
+
+def collector_fingerprint() -> str:
+    digest = hashlib.sha256(str(COLLECTOR_VERSION).encode())
+    src_dir = Path(__file__).parent
+    for name in _COLLECTOR_SOURCES:
+        digest.update((src_dir / name).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+class MeasurementCache:
+    """LCP samples of past runs, keyed by exactly what was measured.
+
+    The key covers the variant's git tree hash, the URL, the device config
+    (viewport, CPU and network throttling), replay vs. live mode, the
+    replayed archive's digest and the collector fingerprint. An unchanged
+    variant reuses its samples; any change to its files, the throttling,
+    the recorded third-party responses or the collector code misses.
+    """
+
+    def __init__(self, path: Path, enabled: bool = True):
+        self.path = Path(path)
+        self.enabled = enabled
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.collector = collector_fingerprint()
+        if enabled and self.path.exists():
+            with open(self.path) as f:
+                data = json.load(f)
+            # Entries from another collector can never hit again
+            self.entries = {k: v for k, v in data.get('entries', {}).items()
+                            if v.get('collector') == self.collector}
+
+    def key(self, tree: str, url: str, device_config: Dict[str, Any], archive: Optional[str]) -> str:
+        """`archive` is the digest of the replayed archive, None for live loads"""
+        raw = json.dumps({
+            'tree': tree,
+            'url': url,
+            'device': device_config,
+            'replay': archive is not None,
+            'archive': archive,
+            'collector': self.collector,
+        }, sort_keys=True)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key: str) -> List[Dict[str, Any]]:
+        """Stored `{'lcp_ms', 'metrics'}` samples for `key`, oldest first"""
+        if not self.enabled or key not in self.entries:
+            return []
+        return [
+            {'lcp_ms': s['lcp_ms'], 'metrics': PageMetrics(**s['metrics']) if s.get('metrics') else None}
+            for s in self.entries[key]['samples']
+        ]
+
+    def put(self, key: str, variant: VariantSamples, max_samples: int):
+        """Store the newest `max_samples` kept samples of `variant`"""
+        if not self.enabled or not variant.samples:
+            return
+        metrics = variant.metrics if len(variant.metrics) == len(variant.samples) else [None] * len(variant.samples)
+        samples = [
+            {'lcp_ms': lcp, 'metrics': m.to_dict() if m else None}
+            for lcp, m in zip(variant.samples, metrics)
+        ]
+        self.entries[key] = {
+            'branch': variant.branch,
+            'collector': self.collector,
+            'updated': time.time(),
+            'samples': samples[-max_samples:],
+        }
+
+    def save(self):
+        if not self.enabled:
+            return
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'entries': self.entries}, f)
+        tmp.replace(self.path)
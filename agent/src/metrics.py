@@ -0,0 +1,106 @@
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Union
+
+# A main-thread task blocks input for everything above this
+LONG_TASK_BUDGET_MS = 50
+# CLS session windows: shifts less than 1s apart, capped at 5s per window
+CLS_SESSION_GAP_MS = 1000
+CLS_SESSION_MAX_MS = 5000
+
+
+@dataclass
+class PageMetrics:
+    """Core Web Vitals of one page load, in milliseconds (CLS is unitless)"""
+    lcp: Optional[float] = None
+    fcp: Optional[float] = None
+    ttfb: Optional[float] = None
+    tbt: Optional[float] = None
+    cls: Optional[float] = None
+    lcp_url: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _entries(perf_data: Union[Dict[str, Any], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    if isinstance(perf_data, dict):
+        return perf_data.get('data') or []
+    return perf_data or []
+
+
+def compute_metrics(perf_data: Union[Dict[str, Any], List[Dict[str, Any]]]) -> PageMetrics:
+    """Compute LCP, FCP, TTFB, TBT and CLS in a single pass over the timeline.
+
+    Accepts a whole performance report or just its `data` list. LCP comes
+    from the actual `type == "LCP"` entry (the latest candidate wins), not
+    from whatever entry happens to be last.
+    """
+    metrics = PageMetrics()
+    tasks = []
+    shifts = []
+    shift_values_known = True
+
+    for entry in _entries(perf_data):
+        kind = entry.get('type')
+        if kind == 'LCP':
+            if metrics.lcp is None or entry['start'] >= metrics.lcp:
+                metrics.lcp = entry['start']
+                metrics.lcp_url = entry.get('url')
+        elif kind == 'paint' and entry.get('name') == 'first-contentful-paint':
+            metrics.fcp = entry['start']
+        elif kind == 'navigation':
+            # The native collector records responseStart; report.js only has responseEnd,
+            # which is not a TTFB, so its timelines leave TTFB unknown
+            metrics.ttfb = entry.get('ttfb')
+        elif kind == 'TBT':
+            tasks.append((entry['start'], entry.get('duration', 0)))
+        elif kind == 'CLS':
+            if 'value' in entry:
+                shifts.append((entry['start'], entry['value']))
+            else:
+                shift_values_known = False
+
+    fcp = metrics.fcp or 0
+    metrics.tbt = sum(
+        max(0, duration - LONG_TASK_BUDGET_MS)
+        for start, duration in tasks
+        if start >= fcp
+    )
+
+    if shift_values_known:
+        metrics.cls = _session_window_cls(shifts)
+    return metrics
+
+
+def _session_window_cls(shifts) -> float:
+    """Largest session window of layout shifts"""
+    best = current = 0.0
+    window_start = last = None
+    for start, value in sorted(shifts):
+        if (last is None or start - last > CLS_SESSION_GAP_MS
+                or start - window_start > CLS_SESSION_MAX_MS):
+            window_start = start
+            current = 0.0
+        current += value
+        last = start
+        best = max(best, current)
+    return round(best, 4)
+
+
+def entries_until_lcp(perf_data: Union[Dict[str, Any], List[Dict[str, Any]]]) -> Optional[List[Dict[str, Any]]]:
+    """Entries that started before the LCP, ordered by (start, end), ending with the LCP.
+
+    Only the entries before LCP are sorted, not the full timeline.
+    """
+    entries = _entries(perf_data)
+    lcp = None
+    for entry in entries:
+        if entry.get('type') == 'LCP' and (lcp is None or entry['start'] >= lcp['start']):
+            lcp = entry
+    if lcp is None:
+        return None
+
+    key = (lcp['start'], lcp['end'])
+    before = [e for e in entries if e is not lcp and (e['start'], e['end']) <= key]
+    before.sort(key=lambda x: (x['start'], x['end']))
+    return before + [lcp]
@@ -0,0 +1,169 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse, urlunparse
+
+from agent.src.throttle import ThrottledLink
+
+# Headers that no longer describe the stored (already decoded) body
+DROPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+
+def decoded_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    """Response headers that still hold once the body has been decoded"""
+    return {k: v for k, v in headers.items() if k.lower() not in DROPPED_HEADERS}
+
+
+def archive_dir_for(output_dir: Path) -> Path:
+    """Archives sit next to the asset repo so they never end up in its branches"""
+    output_dir = Path(output_dir)
+    return output_dir.parent / f"{output_dir.name}.archive"
+
+
+def _strip_query(url: str) -> str:
+    parsed = urlparse(url)
+    return urlunparse(parsed._replace(query='', fragment=''))
+
+
+class NetworkArchive:
+    """On-disk archive of every response seen during a page load.
+
+    `record` stores status, headers, body and the original fetch time for
+    each request; `replay` serves the whole page load back from disk, so
+    retests are deterministic and work offline. URL-level overrides take
+    precedence over archived responses during replay.
+    """
+
+    def __init__(self, root: Path, honor_timings: bool = False, allow_network: bool = False):
+        self.root = Path(root)
+        self.bodies_dir = self.root / "bodies"
+        self.index_path = self.root / "index.json"
+        self.honor_timings = honor_timings
+        self.allow_network = allow_network
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._by_path: Dict[str, str] = {}
+        self.overrides: Dict[str, Dict[str, Any]] = {}
+        self.stats = {'recorded': 0, 'replayed': 0, 'overridden': 0, 'missed': 0}
+        self.load()
+
+    @staticmethod
+    def _key(method: str, url: str) -> str:
+        return f"{method} {url}"
+
+    def exists(self) -> bool:
+        return self.index_path.exists()
+
+    def digest(self) -> str:
+        """Hash of what replay serves: every entry's status, headers and body hash"""
+        served = {key: {k: v for k, v in entry.items() if k != 'elapsed_ms'}
+                  for key, entry in self.entries.items()}
+        return hashlib.sha256(json.dumps(served, sort_keys=True).encode()).hexdigest()[:16]
+
+    def load(self):
+        if self.index_path.exists():
+            with open(self.index_path) as f:
+                self.entries = json.load(f)['entries']
+            self._by_path = {
+                self._key(e['method'], _strip_query(e['url'])): key
+                for key, e in self.entries.items()
+            }
+
+    def save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.index_path, 'w') as f:
+            json.dump({
+                'saved_at': datetime.datetime.now().isoformat(),
+                'entries': self.entries
+            }, f, indent=2)
+
+    def store(self, request, status: int, headers: Dict[str, str], body: bytes, elapsed_ms: float):
+        """Archive one response"""
+        digest = hashlib.sha1(body).hexdigest()
+        self.bodies_dir.mkdir(parents=True, exist_ok=True)
+        body_path = self.bodies_dir / digest
+        if not body_path.exists():
+            body_path.write_bytes(body)
+
+        key = self._key(request.method, request.url)
+        self.entries[key] = {
+            'method': request.method,
+            'url': request.url,
+            'resource_type': request.resource_type,
+            'status': status,
+            'headers': decoded_headers(headers),
+            # The body is stored decoded; the encoding is kept for throttled replay
+            'encoding': next((v for k, v in headers.items() if k.lower() == 'content-encoding'), None),
+            'body': digest,
+            'size': len(body),
+            'elapsed_ms': round(elapsed_ms, 1),
+        }
+        self._by_path[self._key(request.method, _strip_query(request.url))] = key
+        self.stats['recorded'] += 1
+
+    def override(self, url: str, body: bytes, headers: Optional[Dict[str, str]] = None, status: int = 200):
+        """Serve `body` for `url` instead of the archived response"""
+        self.overrides[url] = {'status': status, 'headers': headers or {}, 'body': body}
+
+    def lookup(self, method: str, url: str) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(self._key(method, url))
+        if entry is None:
+            # Cache busters and session tokens change between runs
+            key = self._by_path.get(self._key(method, _strip_query(url)))
+            entry = self.entries.get(key) if key else None
+        return entry
+
+    def read_body(self, entry: Dict[str, Any]) -> bytes:
+        return (self.bodies_dir / entry['body']).read_bytes()
+
+    async def record_route(self, route, link: ThrottledLink = None):
+        """Route handler that fetches from the network and archives the response"""
+        request = route.request
+        start = time.perf_counter()
+        response = await route.fetch()
+        body = await response.body()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.store(request, response.status, response.headers, body, elapsed_ms)
+        if link:
+            await link.deliver(body, response.headers.get('content-type'),
+                               response.headers.get('content-encoding'), elapsed_ms / 1000)
+        # route.fetch() hands back the decoded body, so its length and encoding headers no longer apply
+        await route.fulfill(status=response.status, headers=decoded_headers(response.headers), body=body)
+
+    async def replay_route(self, route, link: ThrottledLink = None):
+        """Route handler that serves overrides, then archived responses.
+
+        With a `link`, each response is delayed as the page's network
+        profile would have delivered it.
+        """
+        request = route.request
+        override = self.overrides.get(request.url)
+        if override:
+            self.stats['overridden'] += 1
+            if link:
+                await link.deliver(override['body'], override['headers'].get('content-type'))
+            return await route.fulfill(**override)
+
+        entry = self.lookup(request.method, request.url)
+        if entry is None:
+            self.stats['missed'] += 1
+            if self.allow_network:
+                return await route.continue_()
+            return await route.abort('internetdisconnected')
+
+        if self.honor_timings:
+            await asyncio.sleep(entry['elapsed_ms'] / 1000)
+        self.stats['replayed'] += 1
+        body = self.read_body(entry)
+        if link:
+            content_type = next((v for k, v in entry['headers'].items() if k.lower() == 'content-type'), None)
+            elapsed_s = entry['elapsed_ms'] / 1000 if self.honor_timings else 0.0
+            await link.deliver(body, content_type, entry.get('encoding'), elapsed_s)
+        await route.fulfill(
+            status=entry['status'],
+            headers=entry['headers'],
+            body=body
+        )
@@ -1,7 +1,9 @@
 import json
-import os, re
+import os
+from typing import Any, Dict, Iterator, List
 import yaml
 from crewai import LLM
+from agent.src.llm_cache import CachedLLM, stream_completion
 from agent.src.utils import read_report_with_check
 
 # Prompt engineering for structured extraction
@@ -23,47 +25,153 @@ Report:
 {}
 """
 
-pattern = re.compile(
-    r"\s*- summary:\s*(?P<summary>.*?)\s*"
-    r"reasoning:\s*(?P<reasoning>.*?)\s*"
-    r"technical_implementation:\s*(?P<technical_implementation>.*?)\s*"
-    r"metadata:\s*(?P<metadata>.*?)\s*"
-    r"$",
-    re.DOTALL,
-)
+# Fields every suggestion must carry as non-empty strings
+REQUIRED_FIELDS = ("summary", "reasoning", "technical_implementation")
+METADATA_FIELDS = ("impact", "complexity", "affected_metrics")
 
-metadata_pattern = re.compile(
-    r"impact:\s*(?P<impact>.*?)\s*"
-    r"complexity:\s*(?P<complexity>.*?)\s*"
-    r"affected_metrics:\s*(?P<affected_metrics>.*?)\s*"
-    r"$",
-    re.DOTALL,
-)
+
+def validate_suggestion(entry) -> Dict[str, Any]:
+    """Check one parsed YAML entry against the suggestion schema and normalize it.
+
+    Raises ValueError describing the first problem found.
+    """
+    if not isinstance(entry, dict):
+        raise ValueError(f"expected a mapping, got {type(entry).__name__}")
+    suggestion = {}
+    for field in REQUIRED_FIELDS:
+        value = entry.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"missing or empty '{field}'")
+        suggestion[field] = value.strip()
+
+    metadata = entry.get("metadata") or {}
+    if not isinstance(metadata, dict):
+        raise ValueError("'metadata' must be a mapping")
+    metrics = metadata.get("affected_metrics") or []
+    if isinstance(metrics, str):
+        metrics = metrics.strip("[]").split(",")
+    if not isinstance(metrics, list):
+        raise ValueError("'metadata.affected_metrics' must be a list")
+    suggestion["metadata"] = {
+        "impact": str(metadata.get("impact") or "").strip(),
+        "complexity": str(metadata.get("complexity") or "").strip(),
+        "affected_metrics": [str(m).strip() for m in metrics if str(m).strip()],
+    }
+    return suggestion
+
+
+class SuggestionStreamParser:
+    """Splits a streamed YAML list into validated suggestions as it arrives.
+
+    Text is fed in arbitrary chunks. A list item is complete once the next
+    item at the same indentation (or the closing fence) shows up; it is then
+    loaded with `yaml.safe_load` and validated. Malformed items are recorded
+    in `errors` and skipped.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.items = 0
+        self.errors: List[Dict[str, Any]] = []
+        self._pending = ""
+        self._item: List[str] = []
+        self._list: List[str] = []
+        self._indent = None
+        self._done = False
+
+    @property
+    def yaml_text(self) -> str:
+        """The YAML list alone, without fences or the prose around it"""
+        return "\n".join(line[self._indent:] for line in self._list).strip() + "\n" if self._list else ""
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self.text += chunk
+        *lines, self._pending = (self._pending + chunk).split("\n")
+        suggestions = []
+        for line in lines:
+            suggestions.extend(self._line(line))
+        return suggestions
+
+    def close(self) -> List[Dict[str, Any]]:
+        suggestions = self._line(self._pending) if self._pending else []
+        self._pending = ""
+        suggestions.extend(self._flush())
+        self._done = True
+        return suggestions
+
+    def _line(self, line: str) -> List[Dict[str, Any]]:
+        if self._done:
+            return []
+        stripped = line.strip()
+        indent = len(line) - len(line.lstrip())
+        if stripped.startswith("```"):
+            if self._indent is None:
+                return []  # opening fence
+            if indent <= self._indent:
+                # Closing fence; fences nested in block scalars are indented deeper
+                self._done = True
+                return self._flush()
+        is_item = stripped == "-" or stripped.startswith("- ")
+        if is_item and self._indent is None:
+            self._indent = indent
+        if self._indent is None:
+            return []  # text before the list
+        if is_item and indent == self._indent:
+            suggestions = self._flush()
+            self._item = [line]
+            self._list.append(line)
+            return suggestions
+        if stripped and indent <= self._indent and not stripped.startswith("#"):
+            # Back at list level without a new item: trailing prose
+            self._done = True
+            return self._flush()
+        self._item.append(line)
+        self._list.append(line)
+        return []
+
+    def _flush(self) -> List[Dict[str, Any]]:
+        if not self._item:
+            return []
+        text = "\n".join(line[self._indent:] for line in self._item)
+        self._item = []
+        self.items += 1
+        try:
+            loaded = yaml.safe_load(text)
+            if not isinstance(loaded, list) or len(loaded) != 1:
+                raise ValueError("expected a single list item")
+            return [validate_suggestion(loaded[0])]
+        except (yaml.YAMLError, ValueError) as e:
+            self.errors.append({"item": self.items, "error": " ".join(str(e).split())[:200], "text": text})
+            return []
+
+
+def _messages(report_text):
+    return [
+        {"role": "system", "content": "You are a web performance expert."},
+        {"role": "user", "content": PROMPT.format(report_text)},
+    ]
+
+
+def stream_suggestions(report_text, llm, parser: SuggestionStreamParser = None) -> Iterator[Dict[str, Any]]:
+    """Yield validated suggestions while the LLM is still writing the YAML list"""
+    parser = parser or SuggestionStreamParser()
+    messages = _messages(report_text)
+    chunks = llm.stream(messages) if isinstance(llm, CachedLLM) else stream_completion(llm, messages)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
 
 
 def convert_to_yaml(report_text, llm):
-    response = llm.call(
-        [
-            {"role": "system", "content": "You are a web performance expert."},
-            {"role": "user", "content": PROMPT.format(report_text)},
-        ]
-    )
+    response = llm.call(_messages(report_text))
     return response[response.find("```yaml") + 7 : response.rfind("```")].strip()
 
 
 def parse_yaml_performance_report(response, save_path=None):
-    suggestions = ["- summary: " + s.strip() for s in response.split("- summary: ")[1:]]
-    parsed_entries = []
-    for suggestion in suggestions:
-        matches = re.search(pattern, suggestion).groupdict()
-        matches["metadata"] = re.search(
-            metadata_pattern, matches["metadata"]
-        ).groupdict()
-        matches["metadata"]["affected_metrics"] = (
-            matches["metadata"]["affected_metrics"].strip("[]").split(",")
-        )
-        parsed_entries.append(matches)
-    parsed_entries = [p for p in parsed_entries if p and len(p["summary"]) > 0]
+    parser = SuggestionStreamParser()
+    parsed_entries = parser.feed(response) + parser.close()
+    for error in parser.errors:
+        print(f"⚠️ Skipped malformed suggestion #{error['item']}: {error['error']}")
     if save_path:
         with open(save_path, "w") as f:
             json.dump(parsed_entries, f, indent=4)
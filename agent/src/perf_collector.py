@@ -0,0 +1,150 @@
+from typing import Any, Dict, List
+
+# Buffers the observer entries the timeline needs; runs before any page script
+OBSERVER_SCRIPT = """
+(() => {
+  if (window !== window.top) return;
+  performance.setResourceTimingBufferSize(10000);
+  const entries = window.__perfCollectorEntries = [];
+  const pick = (e) => ({
+    entryType: e.entryType,
+    name: e.name,
+    startTime: e.startTime,
+    duration: e.duration,
+    url: e.url || '',
+    value: e.value,
+    hadRecentInput: e.hadRecentInput,
+    interactionId: e.interactionId,
+    scripts: (e.scripts || []).map((s) => s.sourceURL || s.invoker || ''),
+  });
+  const observe = (type, options = {}) => {
+    try {
+      new PerformanceObserver((list) => list.getEntries().forEach((e) => entries.push(pick(e))))
+        .observe({ type, buffered: true, ...options });
+    } catch (e) {
+      // entry type not supported by this browser
+    }
+  };
+  ['largest-contentful-paint', 'layout-shift', 'longtask', 'long-animation-frame', 'paint', 'mark']
+    .forEach((type) => observe(type));
+  observe('event', { durationThreshold: 40 });
+})();
+"""
+
+COLLECT_SCRIPT = """() => ({
+  navigation: performance.getEntriesByType('navigation').map((e) => e.toJSON()),
+  resources: performance.getEntriesByType('resource').map((e) => e.toJSON()),
+  observed: window.__perfCollectorEntries || [],
+})"""
+
+
+def _entry(start, end, url, type_, entry_type, duration=None, size=None, **extra) -> Dict[str, Any]:
+    entry = {
+        'start': round(start),
+        'end': round(end),
+        'url': url,
+        'type': type_,
+        'entryType': entry_type,
+    }
+    if duration is not None:
+        entry['duration'] = round(duration)
+    if size is not None:
+        entry['size'] = size
+    entry.update(extra)
+    return entry
+
+
+class PerformanceCollector:
+    """Builds the performance timeline natively from CDP and PerformanceObserver.
+
+    Produces the same `{url, type, data: [...]}` report shape the hlx
+    report.js used to expose as `window.PERFORMANCE_REPORT_DATA`, without
+    fetching or running any third-party script in the measured page.
+    Transfer sizes come from CDP `Network.loadingFinished`, so they are
+    known even for cross-origin resources without Timing-Allow-Origin.
+    """
+
+    def __init__(self, page, client):
+        self.page = page
+        self.client = client
+        self._request_urls = {}
+        self._sizes = {}
+
+    async def install(self):
+        """Register the observer script and CDP listeners before navigation"""
+        await self.page.add_init_script(OBSERVER_SCRIPT)
+        self.client.on("Network.requestWillBeSent", self._on_request)
+        self.client.on("Network.loadingFinished", self._on_finished)
+        return self
+
+    def reset(self):
+        self._request_urls.clear()
+        self._sizes.clear()
+
+    def _on_request(self, event):
+        self._request_urls[event["requestId"]] = event["request"]["url"]
+
+    def _on_finished(self, event):
+        url = self._request_urls.get(event["requestId"])
+        if url:
+            self._sizes[url] = int(event.get("encodedDataLength", 0))
+
+    def _size(self, entry: Dict[str, Any]) -> int:
+        return entry.get('transferSize') or self._sizes.get(entry.get('name'), 0)
+
+    async def collect(self, url: str, device: str) -> Dict[str, Any]:
+        """Read the buffered entries from the page and build the timeline"""
+        raw = await self.page.evaluate(COLLECT_SCRIPT)
+        data: List[Dict[str, Any]] = []
+
+        for nav in raw['navigation']:
+            data.append(_entry(nav['startTime'], nav['responseEnd'], nav['name'],
+                               'navigation', 'navigation', nav['duration'], self._size(nav),
+                               ttfb=round(nav['responseStart'])))
+
+        # Same grouping as report.js: navigation, resources, then observer entries
+        for res in sorted(raw['resources'], key=lambda r: r['startTime']):
+            data.append(_entry(res['startTime'], res['responseEnd'], res['name'],
+                               res['initiatorType'], 'resource', res['duration'], self._size(res)))
+
+        observed = raw['observed']
+        lcp = [e for e in observed if e['entryType'] == 'largest-contentful-paint']
+        if lcp:
+            last = lcp[-1]
+            data.append(_entry(last['startTime'], last['startTime'], last['url'],
+                               'LCP', 'lcp', name='LCP'))
+
+        shifts = [e for e in observed if e['entryType'] == 'layout-shift' and not e['hadRecentInput']]
+        for i, shift in enumerate(shifts, 1):
+            data.append(_entry(shift['startTime'], shift['startTime'], None, 'CLS', 'cls',
+                               name=f"CLS {i} / {len(shifts)}", value=shift['value']))
+
+        tasks = [e for e in observed if e['entryType'] == 'longtask']
+        for i, task in enumerate(tasks, 1):
+            data.append(_entry(task['startTime'], task['startTime'], None, 'TBT', 'tbt',
+                               task['duration'], name=f"TBT {i} / {len(tasks)}"))
+
+        for e in observed:
+            if e['entryType'] == 'event' and e.get('interactionId'):
+                data.append(_entry(e['startTime'], e['startTime'], None, 'INP', 'inp',
+                                   e['duration'], name=e['name']))
+
+        for e in observed:
+            if e['entryType'] == 'long-animation-frame':
+                scripts = [s for s in e['scripts'] if s]
+                data.append(_entry(e['startTime'], e['startTime'], None,
+                                   'long-animation-frame', 'long-animation-frame',
+                                   e['duration'], name=scripts[0] if scripts else ''))
+
+        for entry_type in ('paint', 'mark'):
+            for e in observed:
+                if e['entryType'] == entry_type:
+                    data.append(_entry(e['startTime'], e['startTime'], None,
+                                       entry_type, entry_type, name=e['name']))
+
+        # Drop the url key where report.js never set one
+        for entry in data:
+            if entry['url'] is None:
+                del entry['url']
+
+        return {'url': url, 'type': device, 'data': data}
@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import json
+import subprocess
+import threading
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agent.src.tracing import tracer
+
+
+class ReportError(RuntimeError):
+    """The node report generator failed or never announced its report"""
+
+
+class PipelineStages:
+    """Wall-clock start/end of each pipeline stage, relative to pipeline start.
+
+    Stages may overlap; `summary()` shows each one on the shared clock so
+    the overlap is visible next to the total. Each stage is also a
+    `stage.<name>` trace span, profiled when a profiler is configured.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: List[Dict[str, Any]] = []
+
+    @asynccontextmanager
+    async def stage(self, name: str):
+        start = time.perf_counter()
+        entry = {'stage': name, 'start_ms': round((start - self.started) * 1000)}
+        try:
+            async with tracer.span(f"stage.{name}", profile=True):
+                yield entry
+        finally:
+            end = time.perf_counter()
+            entry['end_ms'] = round((end - self.started) * 1000)
+            entry['duration_ms'] = round((end - start) * 1000)
+            self.stages.append(entry)
+
+    def total_ms(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000)
+
+    def summary(self) -> str:
+        total = self.total_ms()
+        busy = sum(s['duration_ms'] for s in self.stages)
+        lines = [f"- {s['stage']}: {s['duration_ms'] / 1000:.1f}s "
+                 f"({s['start_ms'] / 1000:.1f}s → {s['end_ms'] / 1000:.1f}s)"
+                 for s in sorted(self.stages, key=lambda s: s['start_ms'])]
+        lines.append(f"- total: {total / 1000:.1f}s wall, {busy / 1000:.1f}s of stage time")
+        return "\n".join(lines)
+
+
+def checkpoint_path_for(output_dir: Path) -> Path:
+    """Stage checkpoints sit next to the asset repo, like the network archive"""
+    output_dir = Path(output_dir)
+    return output_dir.parent / f"{output_dir.name}.checkpoint.json"
+
+
+def _suggestion_hash(suggestion: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(suggestion, sort_keys=True).encode()).hexdigest()
+
+
+class StageCheckpoint:
+    """Stages of one URL's pipeline run that already finished, saved after each one.
+
+    With `resume`, a retried run skips them: the announced report, the
+    capture, the ablation and coverage results, and every suggestion whose
+    branch was applied from the very same suggestion. Without it the run
+    starts over and overwrites the file. The checkpoint is removed once a
+    run completes, so the next run starts fresh.
+    """
+
+    def __init__(self, path: Path, output_dir: Path, resume: bool = False):
+        self.path = Path(path)
+        self.output_dir = Path(output_dir)
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.applied: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if resume and self.path.exists():
+            with open(self.path) as f:
+                data = json.load(f)
+            self.stages = data.get('stages', {})
+            self.applied = data.get('applied', {})
+
+    def done(self, stage: str) -> Optional[Dict[str, Any]]:
+        """What a finished `stage` left behind, or None if it has to run"""
+        return self.stages.get(stage)
+
+    def mark(self, stage: str, **fields):
+        with self._lock:
+            self.stages[stage] = {**fields, 'finished': time.time()}
+            self._save()
+
+    def reuse_applied(self, branch: str, suggestion: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Apply result of `branch`, if it was applied from `suggestion` and still points at that commit"""
+        entry = self.applied.get(branch)
+        if not entry or entry['suggestion'] != _suggestion_hash(suggestion):
+            return None
+        head = subprocess.run(['git', 'rev-parse', '--verify', '-q', branch],
+                              cwd=self.output_dir, capture_output=True, text=True)
+        if head.stdout.strip() != entry['commit']:
+            return None
+        return {**entry['result'], 'reused': True}
+
+    def mark_applied(self, result: Dict[str, Any], suggestion: Dict[str, Any]):
+        """Remember a successfully applied branch; called from apply worker threads"""
+        if result.get('status') != 'applied':
+            return
+        head = subprocess.run(['git', 'rev-parse', '--verify', '-q', result['branch']],
+                              cwd=self.output_dir, capture_output=True, text=True)
+        with self._lock:
+            self.applied[result['branch']] = {
+                'suggestion': _suggestion_hash(suggestion),
+                'commit': head.stdout.strip(),
+                'result': result,
+            }
+            self._save()
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'stages': self.stages, 'applied': self.applied}, f, indent=2)
+        tmp.replace(self.path)
+
+
+async def read_handshake(cmd: List[str], event_name: str,
+                         on_line: Callable[[str], None] = print) -> Tuple[Optional[Dict[str, Any]], int, str]:
+    """Run `cmd` and pick out its `{"event": event_name, ...}` JSON line.
+
+    Every other stdout line is passed to `on_line`. Returns the event (None
+    if it never came), the exit status and the captured stderr.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    event: Optional[Dict[str, Any]] = None
+    stderr_task = asyncio.create_task(process.stderr.read())
+
+    try:
+        async for raw in process.stdout:
+            line = raw.decode(errors='replace').rstrip()
+            if line.startswith('{'):
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    message = None
+                if isinstance(message, dict) and message.get('event') == event_name:
+                    event = message
+                    continue
+            on_line(line)
+
+        stderr = (await stderr_task).decode(errors='replace').strip()
+        return event, await process.wait(), stderr
+    finally:
+        # Cancelled or failed while reading: the child must not keep running (and spending) on its own
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+        stderr_task.cancel()
+
+
+def emit_handshake(event_name: str, **fields):
+    """Print the JSON line a parent process waits for with `read_handshake`"""
+    print(json.dumps({'event': event_name, **fields}), flush=True)
+
+
+async def run_report_process(cmd: List[str], prefix: str = "   [report] ") -> str:
+    """Run the node report generator and return the report path it announces.
+
+    The generator is started with `--handshake` and prints one JSON line
+    `{"event": "report", "path": ...}` (or `"error"`) when the report is on
+    disk. Other output is echoed with `prefix` so it can interleave with
+    concurrently running stages.
+    """
+    cmd = [*cmd, "--handshake"]
+    print(f"Running: {' '.join(cmd)}")
+    event, returncode, stderr = await read_handshake(cmd, 'report', lambda line: print(f"{prefix}{line}"))
+    if returncode != 0:
+        raise ReportError(stderr or f"node exited with status {returncode}")
+    if event is None:
+        raise ReportError("report generator finished without announcing a report")
+    if event.get('error'):
+        raise ReportError(event['error'])
+    return event['path']
@@ -0,0 +1,241 @@
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+DEFAULT_DB_PATH = Path("final_output") / "results.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    host TEXT NOT NULL,
+    device TEXT,
+    model TEXT,
+    started_at TEXT NOT NULL,
+    report_path TEXT,
+    output_directory TEXT,
+    suggestions_count INTEGER,
+    comparison_wall_ms REAL,
+    source TEXT UNIQUE
+);
+CREATE INDEX IF NOT EXISTS runs_url_time ON runs (url, started_at);
+CREATE INDEX IF NOT EXISTS runs_host_time ON runs (host, started_at);
+
+CREATE TABLE IF NOT EXISTS variants (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    version TEXT NOT NULL,
+    branch TEXT,
+    is_baseline INTEGER NOT NULL DEFAULT 0,
+    lcp_ms REAL,
+    improvement_ms REAL,
+    improvement_percent REAL,
+    lcp_p75_ms REAL,
+    lcp_ci_low_ms REAL,
+    lcp_ci_high_ms REAL,
+    sample_count INTEGER,
+    decision TEXT
+);
+CREATE INDEX IF NOT EXISTS variants_run ON variants (run_id);
+
+CREATE TABLE IF NOT EXISTS samples (
+    variant_id INTEGER NOT NULL REFERENCES variants (id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    lcp_ms REAL NOT NULL,
+    PRIMARY KEY (variant_id, idx)
+);
+
+CREATE TABLE IF NOT EXISTS metrics (
+    variant_id INTEGER NOT NULL REFERENCES variants (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (variant_id, name)
+);
+
+CREATE TABLE IF NOT EXISTS suggestions (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    branch TEXT,
+    summary TEXT,
+    reasoning TEXT,
+    technical_implementation TEXT,
+    impact TEXT,
+    complexity TEXT,
+    affected_metrics TEXT,
+    apply_status TEXT,
+    apply_duration_s REAL
+);
+CREATE INDEX IF NOT EXISTS suggestions_run ON suggestions (run_id);
+"""
+
+# Per-variant columns of a performance results row stored in the metrics table
+METRIC_COLUMNS = ('fcp_ms', 'ttfb_ms', 'tbt_ms', 'cls')
+
+
+def _parse_timestamp(timestamp: Optional[str]) -> str:
+    """`YYYYmmdd_HHMMSS` (as used in final_output file names) to SQLite datetime text"""
+    if timestamp:
+        try:
+            return datetime.strptime(timestamp, "%Y%m%d_%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class ResultsStore:
+    """Indexed SQLite store of pipeline runs, their variants, samples, metrics and suggestions.
+
+    `record_run` takes the same summary dict that is written to
+    `optimization_summary_<ts>.json`; `import_final_output` loads existing
+    summaries. Runs are unique by their source file, so importing twice is
+    harmless.
+    """
+
+    def __init__(self, path: Path = DEFAULT_DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def has_source(self, source: str) -> bool:
+        return self.db.execute("SELECT 1 FROM runs WHERE source = ?", (source,)).fetchone() is not None
+
+    def record_run(self, summary: Dict[str, Any], suggestions: List[Dict[str, Any]] = None,
+                   source: str = None) -> Optional[int]:
+        """Store one pipeline run; returns its id, or None if `source` was already stored"""
+        if source and self.has_source(source):
+            return None
+        apply_results = {r['branch']: r for r in summary.get('apply_results') or []}
+        with self.db:
+            run_id = self.db.execute(
+                """INSERT INTO runs (url, host, device, model, started_at, report_path, output_directory,
+                                     suggestions_count, comparison_wall_ms, source)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (summary['url'], urlparse(summary['url']).netloc, summary.get('device'), summary.get('model'),
+                 _parse_timestamp(summary.get('timestamp')), summary.get('report_path'),
+                 summary.get('output_directory'), summary.get('suggestions_count'),
+                 summary.get('comparison_wall_ms'), source)
+            ).lastrowid
+
+            for row in summary.get('performance_results') or []:
+                is_baseline = row.get('version') == 'Original'
+                variant_id = self.db.execute(
+                    """INSERT INTO variants (run_id, version, branch, is_baseline, lcp_ms, improvement_ms,
+                                             improvement_percent, lcp_p75_ms, lcp_ci_low_ms, lcp_ci_high_ms,
+                                             sample_count, decision)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (run_id, row['version'], row.get('branch'), int(is_baseline), row.get('lcp_ms'),
+                     row.get('improvement_ms'), row.get('improvement_percent'), row.get('lcp_p75_ms'),
+                     row.get('lcp_ci_low_ms'), row.get('lcp_ci_high_ms'), row.get('samples'),
+                     row.get('decision'))
+                ).lastrowid
+                self.db.executemany(
+                    "INSERT INTO samples (variant_id, idx, lcp_ms) VALUES (?, ?, ?)",
+                    [(variant_id, i, value) for i, value in enumerate(row.get('lcp_samples') or [])]
+                )
+                self.db.executemany(
+                    "INSERT INTO metrics (variant_id, name, value) VALUES (?, ?, ?)",
+                    [(variant_id, name, row[name]) for name in METRIC_COLUMNS if row.get(name) is not None]
+                )
+
+            for idx, suggestion in enumerate(suggestions or [], 1):
+                branch = f"perf-fix-{idx}"
+                metadata = suggestion.get('metadata') or {}
+                applied = apply_results.get(branch, {})
+                self.db.execute(
+                    """INSERT INTO suggestions (run_id, idx, branch, summary, reasoning, technical_implementation,
+                                                impact, complexity, affected_metrics, apply_status, apply_duration_s)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (run_id, idx, branch, suggestion.get('summary'), suggestion.get('reasoning'),
+                     suggestion.get('technical_implementation'), metadata.get('impact'),
+                     metadata.get('complexity'), json.dumps(metadata.get('affected_metrics') or []),
+                     applied.get('status'), applied.get('duration_s'))
+                )
+        return run_id
+
+    def import_final_output(self, root: Path = Path("final_output")) -> int:
+        """Bulk-load every `optimization_summary_<ts>.json` (and its suggestions) under `root`"""
+        imported = 0
+        for summary_path in sorted(Path(root).glob("*/optimization_summary_*.json")):
+            source = str(summary_path.resolve())
+            if self.has_source(source):
+                continue
+            with open(summary_path) as f:
+                summary = json.load(f)
+            timestamp = summary_path.stem[len("optimization_summary_"):]
+            summary.setdefault('timestamp', timestamp)
+            suggestions_path = summary_path.with_name(f"parsed_suggestions_{timestamp}.json")
+            suggestions = []
+            if suggestions_path.exists():
+                with open(suggestions_path) as f:
+                    suggestions = json.load(f)
+            if self.record_run(summary, suggestions, source) is not None:
+                imported += 1
+        return imported
+
+    def runs(self, url: str = None, host: str = None, since: str = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent runs, optionally for one URL or host and after `since` (YYYY-MM-DD)"""
+        clauses, params = [], []
+        for column, value in (('url', url), ('host', host)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since:
+            clauses.append("started_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.db.execute(
+            f"SELECT * FROM runs {where} ORDER BY started_at DESC LIMIT ?", (*params, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def lcp_history(self, url: str, since: str = None, device: str = None) -> List[Dict[str, Any]]:
+        """Baseline LCP and best branch of every run of `url`, oldest first"""
+        clauses, params = ["r.url = ?"], [url]
+        if since:
+            clauses.append("r.started_at >= ?")
+            params.append(since)
+        if device:
+            clauses.append("r.device = ?")
+            params.append(device)
+        rows = self.db.execute(
+            f"""SELECT r.id AS run_id, r.started_at, r.device,
+                       base.lcp_ms AS baseline_lcp_ms,
+                       best.branch AS best_branch, best.lcp_ms AS best_lcp_ms,
+                       best.improvement_percent, best.decision
+                FROM runs r
+                LEFT JOIN variants base ON base.run_id = r.id AND base.is_baseline = 1
+                LEFT JOIN variants best ON best.id = (
+                    SELECT v.id FROM variants v
+                    WHERE v.run_id = r.id AND v.is_baseline = 0 AND v.lcp_ms IS NOT NULL
+                    ORDER BY v.lcp_ms LIMIT 1)
+                WHERE {' AND '.join(clauses)}
+                ORDER BY r.started_at""",
+            params
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def variants(self, run_id: int) -> List[Dict[str, Any]]:
+        """Variants of one run with their metrics and LCP samples"""
+        variants = [dict(row) for row in self.db.execute(
+            "SELECT * FROM variants WHERE run_id = ? ORDER BY id", (run_id,))]
+        for variant in variants:
+            variant['metrics'] = {row['name']: row['value'] for row in self.db.execute(
+                "SELECT name, value FROM metrics WHERE variant_id = ?", (variant['id'],))}
+            variant['lcp_samples'] = [row['lcp_ms'] for row in self.db.execute(
+                "SELECT lcp_ms FROM samples WHERE variant_id = ? ORDER BY idx", (variant['id'],))]
+        return variants
+
+    def suggestions(self, run_id: int) -> List[Dict[str, Any]]:
+        rows = self.db.execute("SELECT * FROM suggestions WHERE run_id = ? ORDER BY idx", (run_id,)).fetchall()
+        return [{**dict(row), 'affected_metrics': json.loads(row['affected_metrics'] or '[]')} for row in rows]
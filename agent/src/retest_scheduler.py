@@ -0,0 +1,38 @@
+import asyncio
+import time
+from typing import Any, Dict, List, Tuple
+
+from agent.src.metrics import compute_metrics
+
+
+async def retest_branches(flow, branches: List[str], concurrency: int = 2) -> Tuple[List[Dict[str, Any]], float]:
+    """Measure several branches at once, at most `concurrency` at a time.
+
+    Each measurement gets its own read-only variant view of the branch and
+    its own browser context from the flow's pool, so branches never share
+    a working tree or page state. Results come back in `branches` order
+    together with the wall-clock time of the whole comparison.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def measure(branch: str) -> Dict[str, Any]:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                perf_data, _, _ = await flow.retest_performance(branch)
+                page_metrics = compute_metrics(perf_data)
+                if page_metrics.lcp is None:
+                    return {'branch': branch, 'error': 'No LCP entry in the timeline'}
+                return {
+                    'branch': branch,
+                    'lcp_ms': page_metrics.lcp,
+                    'metrics': page_metrics,
+                    'perf_data': perf_data,
+                    'elapsed_ms': (time.perf_counter() - start) * 1000,
+                }
+            except Exception as e:
+                return {'branch': branch, 'error': str(e)}
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(measure(branch) for branch in branches))
+    return list(results), (time.perf_counter() - start) * 1000
@@ -0,0 +1,194 @@
+import random
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from agent.src.metrics import PageMetrics
+
+# Decisions for a variant compared with the baseline
+BETTER = 'better'
+WORSE = 'worse'
+EQUAL = 'equal'
+UNDECIDED = 'undecided'
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Linear-interpolated percentile, p in [0, 100]"""
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def bootstrap_ci(values: List[float], alpha: float = 0.05, rounds: int = 2000,
+                 seed: int = 0) -> Tuple[float, float]:
+    """Bootstrap confidence interval of the median"""
+    rng = random.Random(seed)
+    medians = [statistics.median(rng.choices(values, k=len(values))) for _ in range(rounds)]
+    return percentile(medians, 100 * alpha / 2), percentile(medians, 100 * (1 - alpha / 2))
+
+
+def bootstrap_diff_ci(baseline: List[float], candidate: List[float], alpha: float = 0.05,
+                      rounds: int = 2000, seed: int = 0) -> Tuple[float, float]:
+    """Bootstrap confidence interval of median(baseline) - median(candidate)"""
+    rng = random.Random(seed)
+    diffs = [
+        statistics.median(rng.choices(baseline, k=len(baseline)))
+        - statistics.median(rng.choices(candidate, k=len(candidate)))
+        for _ in range(rounds)
+    ]
+    return percentile(diffs, 100 * alpha / 2), percentile(diffs, 100 * (1 - alpha / 2))
+
+
+class SamplingPlan:
+    """How many samples to take and when a variant counts as decided"""
+
+    def __init__(self, min_samples: int = 3, max_samples: int = 7, warmup: int = 1,
+                 alpha: float = 0.05, equivalence_ms: float = 50):
+        self.min_samples = min(min_samples, max_samples)
+        self.max_samples = max_samples
+        self.warmup = warmup
+        self.alpha = alpha
+        self.equivalence_ms = equivalence_ms
+
+    @property
+    def alpha_per_look(self) -> float:
+        # Bonferroni split across every interim look, so stopping early
+        # does not inflate the false win/loss rate
+        looks = self.max_samples - self.min_samples + 1
+        return self.alpha / looks
+
+
+class VariantSamples:
+    """LCP samples of one variant and the decision reached for it"""
+
+    def __init__(self, branch: str):
+        self.branch = branch
+        self.samples: List[float] = []
+        self.metrics: List[PageMetrics] = []
+        self.warmup: List[float] = []
+        self.errors: List[str] = []
+        # Leading samples reused from earlier runs instead of measured now
+        self.cached = 0
+        self.decision = UNDECIDED
+        self.diff_ci: Optional[Tuple[float, float]] = None
+
+    def summary(self, alpha: float = 0.05) -> Dict[str, Any]:
+        if not self.samples:
+            return {'samples': 0}
+        low, high = bootstrap_ci(self.samples, alpha)
+        return {
+            'median': statistics.median(self.samples),
+            'p75': percentile(self.samples, 75),
+            'ci_low': low,
+            'ci_high': high,
+            'samples': len(self.samples),
+        }
+
+    def metric_medians(self) -> Dict[str, Optional[float]]:
+        """Median FCP, TTFB, TBT and CLS over the kept samples"""
+        medians = {}
+        for name, column in (('fcp', 'fcp_ms'), ('ttfb', 'ttfb_ms'), ('tbt', 'tbt_ms'), ('cls', 'cls')):
+            values = [getattr(m, name) for m in self.metrics if getattr(m, name) is not None]
+            value = statistics.median(values) if values else None
+            medians[column] = value if value is None or name == 'cls' else round(value)
+        return medians
+
+
+def decide(baseline: List[float], candidate: List[float], plan: SamplingPlan) -> Tuple[str, Tuple[float, float]]:
+    """Sequential test on the median difference between baseline and candidate"""
+    low, high = bootstrap_diff_ci(baseline, candidate, plan.alpha_per_look)
+    if low > 0:
+        return BETTER, (low, high)
+    if high < 0:
+        return WORSE, (low, high)
+    if -plan.equivalence_ms <= low and high <= plan.equivalence_ms:
+        return EQUAL, (low, high)
+    return UNDECIDED, (low, high)
+
+
+async def sample_variants(
+    measure_round: Callable[[List[str]], Awaitable[List[Dict[str, Any]]]],
+    baseline: str,
+    candidates: List[str],
+    plan: SamplingPlan,
+    prior: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+    budget_s: Optional[float] = None,
+) -> Dict[str, VariantSamples]:
+    """Interleave samples of every variant until each one is decided.
+
+    `measure_round` measures a list of branches once each and returns
+    `{'branch', 'lcp_ms'}` or `{'branch', 'error'}` per branch. Every round
+    measures each still-undecided candidate plus the baseline whenever it
+    has no more samples than the candidates, in a rotated order so no
+    variant always runs first. Warm-up rounds are discarded.
+
+    `prior` holds samples of unchanged variants from earlier runs; they
+    count as kept samples, so a variant that is already decided (or a
+    baseline that already has enough samples) is not measured again and
+    the rest are only topped up.
+
+    With `budget_s`, no new round starts once that many seconds have
+    passed; variants still undecided keep the samples they have.
+    """
+    variants = {branch: VariantSamples(branch) for branch in [baseline] + candidates}
+    for branch, results in (prior or {}).items():
+        if branch not in variants:
+            continue
+        for result in results[-plan.max_samples:]:
+            variants[branch].samples.append(result['lcp_ms'])
+            if result.get('metrics'):
+                variants[branch].metrics.append(result['metrics'])
+        variants[branch].cached = len(variants[branch].samples)
+    active = list(candidates)
+
+    def update_decisions():
+        base = variants[baseline].samples
+        for branch in list(active):
+            variant = variants[branch]
+            if len(variant.errors) > plan.max_samples // 2:
+                # Keeps failing; stop spending browser time on it
+                active.remove(branch)
+                continue
+            if len(base) < plan.min_samples or len(variant.samples) < plan.min_samples:
+                continue
+            variant.decision, variant.diff_ci = decide(base, variant.samples, plan)
+            if variant.decision != UNDECIDED:
+                active.remove(branch)
+
+    def next_round() -> List[str]:
+        measuring = [b for b in active if len(variants[b].samples) < plan.max_samples]
+        target = max([plan.min_samples] + [len(variants[b].samples) + 1 for b in measuring])
+        needs_baseline = (len(variants[baseline].samples) < target
+                          and len(variants[baseline].errors) <= plan.max_samples // 2)
+        return ([baseline] if needs_baseline else []) + measuring
+
+    async def run_round(branches: List[str], round_idx: int, warming_up: bool):
+        shift = round_idx % len(branches)
+        branches = branches[shift:] + branches[:shift]
+        for result in await measure_round(branches):
+            variant = variants[result['branch']]
+            if 'error' in result:
+                variant.errors.append(result['error'])
+            elif warming_up:
+                variant.warmup.append(result['lcp_ms'])
+            else:
+                variant.samples.append(result['lcp_ms'])
+                if result.get('metrics'):
+                    variant.metrics.append(result['metrics'])
+
+    update_decisions()
+    started = time.perf_counter()
+    for round_idx in range(plan.warmup + plan.max_samples):
+        branches = next_round()
+        if not branches:
+            break
+        if budget_s is not None and time.perf_counter() - started > budget_s:
+            break
+        await run_round(branches, round_idx, round_idx < plan.warmup)
+        update_decisions()
+
+    return variants
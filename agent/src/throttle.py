@@ -0,0 +1,119 @@
+import asyncio
+import gzip
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 'auto' uses whatever encoding the origin served the response with
+ENCODINGS = ('auto', 'identity', 'gzip', 'br')
+
+# Types an origin would compress; images and fonts are already compressed
+_COMPRESSIBLE = ('text/', 'javascript', 'json', 'xml', 'svg', 'wasm')
+
+_MAX_CACHED_SIZES = 4096
+
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    content_type = (content_type or '').lower()
+    return any(marker in content_type for marker in _COMPRESSIBLE)
+
+
+class ThrottledLink:
+    """Emulated download link for the responses Python fulfills itself.
+
+    `route.fulfill` bypasses `Network.emulateNetworkConditions`, so locally
+    served and replayed bytes would otherwise arrive instantly while
+    everything the browser fetches is throttled. Each fulfilled response
+    first waits the profile's latency, then queues on one shared link for
+    its transfer time at the profile's download throughput. The transfer
+    size is the body as the origin would send it: gzip or brotli encoded
+    for compressible types. The body handed to the browser stays decoded
+    (fulfilled bodies are never decoded by the browser), only the timing
+    follows the encoded size.
+    """
+
+    _sizes: "OrderedDict[Tuple[bytes, str], int]" = OrderedDict()
+
+    def __init__(self, network_conditions: Dict[str, Any], encoding: str = 'auto'):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding: {encoding} (expected one of {', '.join(ENCODINGS)})")
+        self.latency_s = max(network_conditions.get('latency', 0), 0) / 1000
+        throughput = network_conditions.get('downloadThroughput', -1)
+        self.bytes_per_s = throughput if throughput and throughput > 0 else None
+        self.encoding = encoding
+        self._free_at = 0.0
+        self.stats = {'responses': 0, 'bytes': 0, 'wire_bytes': 0, 'delay_ms': 0.0}
+
+    @property
+    def active(self) -> bool:
+        return self.latency_s > 0 or self.bytes_per_s is not None
+
+    def _pick_encoding(self, content_type: Optional[str], origin_encoding: Optional[str]) -> str:
+        if self.encoding == 'auto':
+            encoding = (origin_encoding or 'identity').lower()
+            encoding = encoding if encoding in ('gzip', 'br') else 'identity'
+        else:
+            encoding = self.encoding
+        if encoding != 'identity' and not is_compressible(content_type):
+            return 'identity'
+        if encoding == 'br' and brotli is None:
+            # Without the optional brotli package, gzip is the closest stand-in
+            return 'gzip'
+        return encoding
+
+    def wire_size(self, body: bytes, content_type: Optional[str] = None,
+                  origin_encoding: Optional[str] = None) -> Tuple[int, str]:
+        """Bytes the origin would put on the wire for `body`, and their encoding"""
+        encoding = self._pick_encoding(content_type, origin_encoding)
+        if encoding == 'identity' or not body:
+            return len(body), 'identity'
+        key = (hashlib.sha1(body).digest(), encoding)
+        size = self._sizes.get(key)
+        if size is None:
+            if encoding == 'gzip':
+                size = len(gzip.compress(body, compresslevel=6))
+            else:
+                size = len(brotli.compress(body, quality=11))
+            self._sizes[key] = size
+            if len(self._sizes) > _MAX_CACHED_SIZES:
+                self._sizes.popitem(last=False)
+        else:
+            self._sizes.move_to_end(key)
+        return size, encoding
+
+    async def deliver(self, body: bytes, content_type: Optional[str] = None,
+                      origin_encoding: Optional[str] = None, elapsed_s: float = 0.0):
+        """Wait until `body` would have arrived over the throttled link.
+
+        `elapsed_s` is time the response already spent on the real network
+        (a live fetch or an archived fetch time); it counts towards the
+        emulated delay instead of adding to it.
+        """
+        if not self.active:
+            return
+        wire, _ = self.wire_size(body, content_type, origin_encoding)
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        transfer_s = wire / self.bytes_per_s if self.bytes_per_s else 0.0
+        # The first byte comes after one latency; the body then waits for the link
+        start = max(now - elapsed_s + self.latency_s, self._free_at)
+        done = start + transfer_s
+        self._free_at = done
+        delay = max(done - now, 0.0)
+        self.stats['responses'] += 1
+        self.stats['bytes'] += len(body)
+        self.stats['wire_bytes'] += wire
+        self.stats['delay_ms'] += delay * 1000
+        if delay:
+            await asyncio.sleep(delay)
+
+    def summary(self) -> str:
+        return (f"{self.stats['responses']} fulfilled responses throttled, "
+                f"{self.stats['wire_bytes'] / 1024:.0f}KB on the wire "
+                f"({self.stats['bytes'] / 1024:.0f}KB decoded), "
+                f"{self.stats['delay_ms']:.0f}ms added")
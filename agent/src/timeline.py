@@ -0,0 +1,268 @@
+import argparse
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+
+# Resource types that can hold up rendering of the LCP element
+BLOCKING_TYPES = ('navigation', 'script', 'link', 'css', 'img', 'other')
+
+
+class Interner:
+    """Maps repeated strings (URLs, types, origins) to small integer ids"""
+
+    def __init__(self):
+        self.ids: Dict[Optional[str], int] = {}
+        self.values: List[Optional[str]] = []
+
+    def __call__(self, value: Optional[str]) -> int:
+        idx = self.ids.get(value)
+        if idx is None:
+            idx = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return idx
+
+
+class _IntervalNode:
+    """Node of a static centered interval tree over entry indices"""
+
+    __slots__ = ('center', 'by_start', 'starts', 'by_end', 'ends', 'left', 'right')
+
+    def __init__(self, idx: np.ndarray, start: np.ndarray, end: np.ndarray):
+        self.center = float(np.median((start[idx] + end[idx]) / 2))
+        here = idx[(start[idx] <= self.center) & (end[idx] >= self.center)]
+        left = idx[end[idx] < self.center]
+        right = idx[start[idx] > self.center]
+
+        order = np.argsort(start[here], kind='stable')
+        self.by_start = here[order]
+        self.starts = start[self.by_start]
+        order = np.argsort(-end[here], kind='stable')
+        self.by_end = here[order]
+        self.ends = -end[self.by_end]
+        self.left = _IntervalNode(left, start, end) if len(left) else None
+        self.right = _IntervalNode(right, start, end) if len(right) else None
+
+    def stab(self, t: float, out: List[np.ndarray]):
+        node = self
+        while node is not None:
+            if t < node.center:
+                out.append(node.by_start[:np.searchsorted(node.starts, t, side='right')])
+                node = node.left
+            else:
+                out.append(node.by_end[:np.searchsorted(node.ends, -t, side='right')])
+                node = node.right
+
+
+class Timeline:
+    """Array-backed, indexed form of the `data` entries of a performance report.
+
+    start/end/duration/size live in NumPy arrays; URLs, types and origins
+    are interned ids shared across timelines. A centered interval tree and
+    start/end orderings answer overlap and "finished before" queries in
+    logarithmic time plus output size.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]], url: str = None, device: str = None,
+                 interner: Interner = None):
+        self.url = url
+        self.device = device
+        self.strings = interner or Interner()
+        n = len(entries)
+        self.start = np.fromiter((e.get('start', 0) for e in entries), dtype=np.float64, count=n)
+        self.end = np.fromiter((e.get('end', e.get('start', 0)) for e in entries), dtype=np.float64, count=n)
+        self.duration = np.fromiter((e.get('duration', 0) or 0 for e in entries), dtype=np.float64, count=n)
+        self.size = np.fromiter((e.get('size', 0) or 0 for e in entries), dtype=np.int64, count=n)
+        self.url_id = np.fromiter((self.strings(e.get('url')) for e in entries), dtype=np.int32, count=n)
+        self.type_id = np.fromiter((self.strings(e.get('type')) for e in entries), dtype=np.int32, count=n)
+        self.name_id = np.fromiter((self.strings(e.get('name')) for e in entries), dtype=np.int32, count=n)
+        self.origin_id = np.fromiter(
+            (self.strings(self._origin(e.get('url'))) for e in entries), dtype=np.int32, count=n)
+
+        self.by_start = np.argsort(self.start, kind='stable')
+        self.by_end = np.argsort(self.end, kind='stable')
+        self._sorted_starts = self.start[self.by_start]
+        self._sorted_ends = self.end[self.by_end]
+        self._tree = None
+
+    @staticmethod
+    def _origin(url: Optional[str]) -> Optional[str]:
+        if not url:
+            return None
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    @classmethod
+    def from_report(cls, perf_data: Dict[str, Any], interner: Interner = None) -> "Timeline":
+        return cls(perf_data.get('data') or [], perf_data.get('url'), perf_data.get('type'), interner)
+
+    @classmethod
+    def load(cls, path: Path, interner: Interner = None) -> "Timeline":
+        with open(path) as f:
+            return cls.from_report(json.load(f), interner)
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def _type_mask(self, types) -> np.ndarray:
+        ids = [self.strings.ids[t] for t in types if t in self.strings.ids]
+        return np.isin(self.type_id, ids)
+
+    def entry(self, i: int) -> Dict[str, Any]:
+        """Rebuild the original-style dict for entry `i`"""
+        values = self.strings.values
+        entry = {
+            'start': self.start[i].item(),
+            'end': self.end[i].item(),
+            'url': values[self.url_id[i]],
+            'type': values[self.type_id[i]],
+            'duration': self.duration[i].item(),
+            'size': self.size[i].item(),
+        }
+        name = values[self.name_id[i]]
+        if name is not None:
+            entry['name'] = name
+        return entry
+
+    def entries(self, indices) -> List[Dict[str, Any]]:
+        return [self.entry(i) for i in indices]
+
+    @property
+    def lcp_index(self) -> Optional[int]:
+        lcp_id = self.strings.ids.get('LCP')
+        if lcp_id is None:
+            return None
+        candidates = np.flatnonzero(self.type_id == lcp_id)
+        if not len(candidates):
+            return None
+        return int(candidates[np.argmax(self.start[candidates])])
+
+    @property
+    def lcp(self) -> Optional[float]:
+        i = self.lcp_index
+        return None if i is None else float(self.start[i])
+
+    def overlapping(self, t0: float, t1: float = None) -> np.ndarray:
+        """Indices of entries whose [start, end] intersects [t0, t1]"""
+        if t1 is None:
+            t1 = t0
+        if self._tree is None and len(self):
+            self._tree = _IntervalNode(np.arange(len(self)), self.start, self.end)
+        found: List[np.ndarray] = []
+        if self._tree is not None:
+            self._tree.stab(t0, found)
+        lo = np.searchsorted(self._sorted_starts, t0, side='right')
+        hi = np.searchsorted(self._sorted_starts, t1, side='right')
+        found.append(self.by_start[lo:hi])
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def finished_before(self, t: float) -> np.ndarray:
+        """Indices of entries that ended at or before `t`, in end order"""
+        return self.by_end[:np.searchsorted(self._sorted_ends, t, side='right')]
+
+    def overlapping_lcp(self) -> np.ndarray:
+        lcp = self.lcp
+        return np.empty(0, dtype=np.int64) if lcp is None else self.overlapping(lcp)
+
+    def finished_before_lcp(self) -> np.ndarray:
+        lcp = self.lcp
+        return np.empty(0, dtype=np.int64) if lcp is None else self.finished_before(lcp)
+
+    def blocking_chain(self, t: float = None) -> List[int]:
+        """Walk back from `t` (default LCP) through the latest-finishing resource each step.
+
+        Starting at `t`, picks the blocking-type resource that finished last
+        before the cursor, moves the cursor to that resource's start and
+        repeats until the navigation request or nothing is left. Returns the
+        chain in load order.
+        """
+        t = self.lcp if t is None else t
+        if t is None:
+            return []
+        blocking = self._type_mask(BLOCKING_TYPES)
+        chain = []
+        cursor = t
+        while True:
+            done = self.finished_before(cursor)
+            candidates = done[blocking[done] & (self.start[done] < cursor)]
+            if not len(candidates):
+                break
+            i = int(candidates[-1])
+            chain.append(i)
+            if self.strings.values[self.type_id[i]] == 'navigation':
+                break
+            cursor = self.start[i]
+        return chain[::-1]
+
+    def bytes_per_origin(self, before: float = None) -> Dict[str, int]:
+        """Transferred bytes per origin, optionally only for entries finished by `before`"""
+        indices = np.arange(len(self)) if before is None else self.finished_before(before)
+        totals = np.bincount(self.origin_id[indices], weights=self.size[indices],
+                             minlength=len(self.strings.values))
+        return {
+            self.strings.values[i]: int(total)
+            for i, total in enumerate(totals)
+            if total and self.strings.values[i] is not None
+        }
+
+
+class TimelineSet:
+    """Lazily loaded timelines of many saved `performance_report_*.json` files.
+
+    Reports are parsed on first access and share one interner, so URLs and
+    types repeated across thousands of runs are stored once.
+    """
+
+    def __init__(self, paths: List[Path]):
+        self.paths = [Path(p) for p in paths]
+        self.strings = Interner()
+        self._loaded: Dict[int, Timeline] = {}
+
+    @classmethod
+    def from_dir(cls, directory: Path, pattern: str = "**/performance_report_*.json") -> "TimelineSet":
+        return cls(sorted(Path(directory).glob(pattern)))
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __getitem__(self, i: int) -> Timeline:
+        if i not in self._loaded:
+            self._loaded[i] = Timeline.load(self.paths[i], self.strings)
+        return self._loaded[i]
+
+    def __iter__(self) -> Iterator[Timeline]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize what happened before LCP across saved performance reports")
+    parser.add_argument("directory", help="Directory to search for performance_report_*.json files")
+    parser.add_argument("--top", type=int, default=10, help="Number of rows to show (default: 10)")
+    args = parser.parse_args()
+
+    timelines = TimelineSet.from_dir(args.directory)
+    origin_bytes = Counter()
+    chain_urls = Counter()
+    lcps = []
+    for timeline in timelines:
+        if timeline.lcp is None:
+            continue
+        lcps.append(timeline.lcp)
+        origin_bytes.update(timeline.bytes_per_origin(before=timeline.lcp))
+        chain_urls.update(timeline.strings.values[timeline.url_id[i]] for i in timeline.blocking_chain())
+
+    print(f"Reports: {len(timelines)}, with LCP: {len(lcps)}")
+    if lcps:
+        print(f"Median LCP: {np.median(lcps):.0f}ms")
+    print("\nBytes before LCP per origin:")
+    for origin, total in origin_bytes.most_common(args.top):
+        print(f"- {origin}: {total / 1024:.1f} KiB")
+    print("\nMost frequent blocking-chain resources:")
+    for url, count in chain_urls.most_common(args.top):
+        print(f"- {count}x {url}")
@@ -0,0 +1,211 @@
+import asyncio
+import contextvars
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+PROFILERS = ('cprofile', 'pyinstrument')
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """One timed region; use with `with` or `async with`, nest freely"""
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: Dict[str, Any], profile: bool):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.profile = profile
+        self.parent: Optional[Span] = None
+        self.start = 0.0
+        self.duration = 0.0
+        self._token = None
+        self._profiler = None
+
+    def set(self, **attrs):
+        """Attach attributes known only once the span is running"""
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self.parent = _current_span.get()
+        self._token = _current_span.set(self)
+        if self.profile:
+            self._profiler = self.tracer._start_profile()
+        self.lane = self.tracer._lane()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        if self._profiler is not None:
+            self.attrs['profile'] = self.tracer._stop_profile(self._profiler, self.name)
+        if exc_type is not None:
+            self.attrs['error'] = f"{exc_type.__name__}: {exc}"
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # A generator span finalized from another context
+            pass
+        self.tracer._record(self)
+        return False
+
+    async def __aenter__(self) -> "Span":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class Tracer:
+    """Collects spans of the whole run and exports them as a Chrome trace.
+
+    Spans are cheap (two clock reads and a list append), so they are always
+    on. Each asyncio task and each thread gets its own lane (`tid`), which
+    keeps concurrent retests and apply workers from overlapping in the
+    trace viewer. With a profiler configured, spans opened with
+    `profile=True` are also profiled; one profile runs at a time.
+    """
+
+    def __init__(self):
+        self.epoch = time.perf_counter()
+        self.events: List[Dict[str, Any]] = []
+        self.profiler: Optional[str] = None
+        self.profile_dir = Path("final_output") / "profiles"
+        self._lock = threading.Lock()
+        self._lanes: Dict[Any, int] = {}
+        self._lane_names: Dict[int, str] = {}
+        self._profiling = False
+        self._profile_count = 0
+
+    def configure(self, profiler: Optional[str] = None, profile_dir: Path = None):
+        if profiler and profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler: {profiler} (expected one of {', '.join(PROFILERS)})")
+        self.profiler = profiler
+        if profile_dir:
+            self.profile_dir = Path(profile_dir)
+
+    def span(self, name: str, profile: bool = False, **attrs) -> Span:
+        return Span(self, name, attrs, profile)
+
+    def traced(self, name: str = None):
+        """Decorator form of `span` for sync and async functions"""
+        def decorate(func):
+            span_name = name or func.__qualname__
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    async with self.span(span_name):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def _lane(self) -> int:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        if task is not None:
+            key, label = ('task', task.get_name()), task.get_name()
+        else:
+            thread = threading.current_thread()
+            key, label = ('thread', thread.ident), thread.name
+        with self._lock:
+            if key not in self._lanes:
+                lane = self._lanes[key] = len(self._lanes) + 1
+                self._lane_names[lane] = label
+            return self._lanes[key]
+
+    def _record(self, span: Span):
+        args = {k: v if isinstance(v, (str, int, float, bool, type(None))) else str(v)
+                for k, v in span.attrs.items()}
+        if span.parent is not None:
+            args['parent'] = span.parent.name
+        with self._lock:
+            self.events.append({
+                'name': span.name,
+                'cat': span.name.split('.')[0],
+                'ph': 'X',
+                'ts': round((span.start - self.epoch) * 1e6),
+                'dur': round(span.duration * 1e6),
+                'pid': os.getpid(),
+                'tid': span.lane,
+                'args': args,
+            })
+
+    def _start_profile(self):
+        with self._lock:
+            if not self.profiler or self._profiling:
+                return None
+            self._profiling = True
+        if self.profiler == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                print("⚠️ pyinstrument is not installed; falling back to cProfile")
+                self.profiler = 'cprofile'
+            else:
+                profiler = Profiler(async_mode='enabled')
+                profiler.start()
+                return profiler
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _stop_profile(self, profiler, name: str) -> str:
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        self._profile_count += 1
+        stem = f"{self._profile_count:02d}_{name.replace('/', '_')}"
+        try:
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+                path = self.profile_dir / f"{stem}.prof"
+                profiler.dump_stats(path)
+            else:
+                profiler.stop()
+                path = self.profile_dir / f"{stem}.html"
+                path.write_text(profiler.output_html())
+        finally:
+            with self._lock:
+                self._profiling = False
+        return str(path)
+
+    def export(self, path: Path) -> Path:
+        """Write a Chrome trace (open in chrome://tracing or ui.perfetto.dev)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            metadata = [
+                {'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': lane, 'args': {'name': label}}
+                for lane, label in self._lane_names.items()
+            ]
+            events = metadata + sorted(self.events, key=lambda e: e['ts'])
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return path
+
+    def summary(self, top: int = 10) -> str:
+        """Total time per span name, largest first"""
+        totals = defaultdict(lambda: [0, 0.0])
+        with self._lock:
+            for event in self.events:
+                totals[event['name']][0] += 1
+                totals[event['name']][1] += event['dur'] / 1e6
+        rows = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        return "\n".join(f"- {name}: {total:.1f}s ({count}x)" for name, (count, total) in rows)
+
+
+# Shared by every module of one run
+tracer = Tracer()
@@ -1,9 +1,26 @@
+import argparse
 import os
 import re
 import requests
 from urllib.parse import urlparse
 
 
+def positive_int(value: str) -> int:
+    """argparse type for counts that must be at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def non_negative_int(value: str) -> int:
+    """argparse type for counts that may be 0"""
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be at least 0, got {value}")
+    return number
+
+
 def url_to_folder_name(url: str) -> str:
     """
     Convert a URL to a safe folder name that includes path information.
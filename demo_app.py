@@ -12,6 +12,7 @@ import sys
 
 # Add parent directory to path to import from agent
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agent.src.results_store import ResultsStore
 from agent.src.utils import url_to_folder_name
 
 # Page configuration
@@ -203,6 +204,12 @@ with col1:
                     # Wait for process to complete
                     process.wait()
                     
+                    # The pipeline records its own run; this also picks up a summary it wrote
+                    # but could not record, so every demo run reaches the results database
+                    store = ResultsStore()
+                    store.import_final_output()
+                    store.close()
+                    
                     progress_bar.progress(100)
                     status_text.text("Pipeline completed!")
                     
@@ -303,7 +310,8 @@ with col1:
                             </div>
                             """, unsafe_allow_html=True)
                             
-                            # Create comprehensive summary
+                            # Summary of the scraped output; not an optimization_summary, which
+                            # the pipeline writes and records itself and would be imported twice
                             summary = {
                                 'url': url,
                                 'device': device,
@@ -313,7 +321,7 @@ with col1:
                                 'suggestions_count': suggestions_count
                             }
                             
-                            summary_filename = domain_dir / f"optimization_summary_{timestamp}.json"
+                            summary_filename = domain_dir / f"demo_summary_{timestamp}.json"
                             with open(summary_filename, 'w') as f:
                                 json.dump(summary, f, indent=2)
                             
@@ -17,6 +17,7 @@ async function main() {
   const outputSuffix = argv.outputSuffix;
   const blockRequests = argv.blockRequests;
   const model = argv.model;
+  const handshake = argv.handshake;
   
   // Load URLs
   const urls = loadUrls(argv);
@@ -31,7 +32,7 @@ async function main() {
   
   // Process each URL
   for (const url of urls) {
-    await processUrl(url, action, deviceType, skipCache, outputSuffix, blockRequests, model);
+    await processUrl(url, action, deviceType, skipCache, outputSuffix, blockRequests, model, handshake);
     
     // Small delay between processing URLs
     if (urls.length > 1) {
@@ -51,6 +51,11 @@ export function parseArguments() {
       type: 'string',
       default: ''
     })
+    .option('handshake', {
+      describe: 'Print one JSON line per URL with the report path once it is written',
+      type: 'boolean',
+      default: false
+    })
     .check((argv) => {
       if (!argv.url && !argv.urls) {
         throw new Error('Either --url or --urls must be provided');
@@ -2,7 +2,8 @@ import collecetAction from './collect.js';
 import rulesAction from './rules.js';
 // import runAgent from './agent.js';
 import runPrompt from './multishot-prompt.js';
-import { getNormalizedUrl } from '../utils.js';
+import path from 'path';
+import { getCachePath, getNormalizedUrl } from '../utils.js';
 
 export async function handleAgentAction(pageUrl, deviceType) {
   // const result = await runAgent(pageUrl, deviceType);
@@ -10,7 +11,15 @@ export async function handleAgentAction(pageUrl, deviceType) {
   return { error: "Agent action not implemented yet" };
 }
 
-export async function processUrl(pageUrl, action, deviceType, skipCache, outputSuffix, blockRequests, model) {
+/**
+ * Writes a single JSON line to stdout so a calling process can pick up the result
+ * without scraping logs. Bypasses console.group indentation on purpose.
+ */
+function emitHandshake(event) {
+  process.stdout.write(`${JSON.stringify({ event: 'report', ...event })}\n`);
+}
+
+export async function processUrl(pageUrl, action, deviceType, skipCache, outputSuffix, blockRequests, model, handshake = false) {
   console.group(`Processing: ${pageUrl}`);
   
   try {
@@ -33,6 +42,12 @@ export async function processUrl(pageUrl, action, deviceType, skipCache, outputS
           blockRequests,
           model
         });
+        if (handshake) {
+          const reportPath = getCachePath(normalizedUrl.url, deviceType, 'report', '', true, model);
+          emitHandshake(result instanceof Error
+            ? { url: pageUrl, error: result.message }
+            : { url: pageUrl, path: path.resolve(reportPath) });
+        }
         break;
         
       case 'collect':
@@ -61,6 +76,9 @@ export async function processUrl(pageUrl, action, deviceType, skipCache, outputS
   } catch (error) {
     console.error(`❌ Error processing ${pageUrl}:`, error);
     console.groupEnd();
+    if (handshake) {
+      emitHandshake({ url: pageUrl, error: error.message });
+    }
     return { error: error.message };
   }
 } 
\ No newline at end of file
@@ -16,6 +16,7 @@ import shutil
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # Import url_to_folder_name after adding to path
+from agent.src.flow_options import add_concurrency_argument, add_flow_arguments, flow_argument_list
 from agent.src.utils import url_to_folder_name
 
 def run_report(args):
@@ -36,20 +37,182 @@ def run_report(args):
     print(f"Running: {' '.join(cmd)}")
     subprocess.run(cmd)
 
+def save_trace(trace_path):
+    """Export every span of this run as a Chrome trace and list the slowest ones"""
+    from agent.src.tracing import tracer
+    tracer.export(trace_path)
+    print(f"\n🧵 Trace saved to: {trace_path} (open in ui.perfetto.dev or chrome://tracing)")
+    print(tracer.summary())
+
 def apply_report(args):
     """Apply performance suggestions from a report"""
     # Import here to avoid issues if dependencies aren't installed
     from agent.report_apply_flow import ReportApplyFlow
+    from agent.src.sampling import SamplingPlan
+    from agent.src.tracing import tracer
+    from datetime import datetime
     import asyncio
     
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    domain_dir = Path("final_output") / url_to_folder_name(args.url)
+    tracer.configure(profiler=args.profile, profile_dir=domain_dir / f"profiles_{timestamp}")
+    
     flow = ReportApplyFlow(
         report_path=args.report_path,
         url=args.url,
         device=args.device,
-        headless=args.headless
+        headless=args.headless,
+        replay=not args.live,
+        concurrency=args.concurrency,
+        sampling=SamplingPlan(max_samples=args.samples, warmup=args.warmup),
+        llm_cache=not args.no_llm_cache,
+        apply_workers=args.apply_workers,
+        llm_rpm=args.llm_rpm,
+        measurement_cache=not args.no_measurement_cache,
+        recapture=args.recapture,
+        serve_encoding=args.serve_encoding,
+        ablation=args.ablation,
+        ablation_top=args.ablation_top,
+        ablation_budget_s=args.ablation_budget,
+        coverage=args.coverage,
+        coverage_prune=args.coverage_prune,
+        capture_max_age_h=args.capture_max_age
     )
     
-    asyncio.run(flow.run())
+    try:
+        with tracer.span('apply', url=args.url, device=args.device):
+            asyncio.run(flow.run())
+    finally:
+        save_trace(domain_dir / f"trace_{timestamp}.json")
+
+def run_batch(args):
+    """Run the complete pipeline for every URL of a list or sitemap"""
+    from agent.src.batch import SKIPPED, BatchRunner, BatchState, load_urls, split_folder_collisions, write_results
+    from datetime import datetime
+    import asyncio
+    
+    urls = load_urls(args.urls)
+    state = BatchState(Path(args.state))
+    
+    # URLs sharing an output folder would overwrite each other's asset repo
+    unique_urls, collisions = split_folder_collisions(urls)
+    for url, owner in collisions.items():
+        state.update(url, status=SKIPPED, error=f"same output folder as {owner}")
+        print(f"⚠️ Skipping {url}: same output folder as {owner}")
+    
+    # Options forwarded to every `run.py pipeline` child process
+    pipeline_args = ["--device", args.device, *flow_argument_list(args)]
+    if args.model:
+        pipeline_args.extend(["--model", args.model])
+    if args.skip_cache:
+        pipeline_args.append("--skip-cache")
+    
+    runner = BatchRunner(
+        state=state,
+        pipeline_args=pipeline_args,
+        log_dir=Path(args.state).parent / "batch_logs",
+        workers=args.workers,
+        per_host=args.per_host,
+        retries=args.retries,
+        backoff_s=args.backoff
+    )
+    try:
+        asyncio.run(runner.run(unique_urls))
+    except KeyboardInterrupt:
+        print(f"\n⏸️  Interrupted; run the same command again to resume from {args.state}")
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    write_results(state, urls, Path("final_output") / f"batch_results_{timestamp}.csv")
+
+def run_results(args):
+    """Query the results database"""
+    from agent.src.results_store import ResultsStore
+    
+    store = ResultsStore(Path(args.db))
+    try:
+        if args.action == "import":
+            imported = store.import_final_output(Path(args.root))
+            print(f"✅ Imported {imported} runs from {args.root} into {store.path}")
+        elif args.action == "runs":
+            for run in store.runs(url=args.url, host=args.host, since=args.since, limit=args.limit):
+                print(f"#{run['id']}  {run['started_at']}  {run['device'] or '-'}  {run['url']}  "
+                      f"({run['suggestions_count'] or 0} suggestions)")
+        elif args.action == "history":
+            if not args.url:
+                print("❌ history needs --url")
+                return
+            for row in store.lcp_history(args.url, since=args.since, device=args.device):
+                best = (f"{row['best_branch']} {row['best_lcp_ms']:.0f}ms ({row['improvement_percent']:+.1f}%, {row['decision']})"
+                        if row['best_branch'] else "-")
+                baseline = f"{row['baseline_lcp_ms']:.0f}ms" if row['baseline_lcp_ms'] is not None else "-"
+                print(f"{row['started_at']}  {row['device'] or '-'}  baseline {baseline}  best {best}")
+        elif args.action == "show":
+            if args.run is None:
+                print("❌ show needs --run")
+                return
+            for variant in store.variants(args.run):
+                print(f"{variant['version']} ({variant['branch']}): LCP {variant['lcp_ms']}ms, "
+                      f"{variant['decision']}, samples {variant['lcp_samples']}, metrics {variant['metrics']}")
+            for suggestion in store.suggestions(args.run):
+                print(f"- {suggestion['branch']} [{suggestion['apply_status'] or '-'}] {suggestion['summary']}")
+    finally:
+        store.close()
+
+def run_bench(args):
+    """Benchmark the collector and the pipeline against the local fixture site"""
+    from agent.src.benchmark import (compare_results, environment, latest_result, run_accuracy,
+                                     run_e2e, save_result)
+    from agent.src.fixture_site import SCENARIOS, FixtureSite
+    from datetime import datetime
+    import asyncio
+    
+    scenarios = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        print(f"❌ Unknown scenarios: {', '.join(unknown)} (available: {', '.join(SCENARIOS)})")
+        sys.exit(2)
+    
+    result = {
+        'timestamp': datetime.now().strftime("%Y%m%d_%H%M%S"),
+        'environment': environment(),
+        'config': {'device': args.device, 'runs': args.runs, 'warmup': args.warmup, 'scenarios': scenarios,
+                   'e2e': not args.no_e2e, 'e2e_samples': args.e2e_samples, 'concurrency': args.concurrency},
+    }
+    
+    async def run_all():
+        with FixtureSite(port=args.port) as site:
+            print(f"🧪 Fixture site at {site.origin} (third party: {site.third_party_origin})")
+            print(f"\n📏 Collector accuracy and overhead: {len(scenarios)} scenarios x {args.runs} runs")
+            result['accuracy'] = await run_accuracy(site, scenarios, args.device, args.runs, args.warmup)
+            if not args.no_e2e:
+                print(f"\n🚀 End-to-end pipeline on the storefront page (LLM and aider stubbed)")
+                result['e2e'] = await run_e2e(site, args.device, args.e2e_samples, args.concurrency)
+    
+    asyncio.run(run_all())
+    
+    print("\n📊 Accuracy (|collector LCP - element timing|) and overhead:")
+    for name, scenario in result['accuracy']['scenarios'].items():
+        summary = scenario['summary']
+        print(f"- {name}: LCP {summary['lcp_median_ms']}ms, error median {summary['abs_error_median_ms']}ms "
+              f"p95 {summary['abs_error_p95_ms']}ms, {summary['wall_median_ms']}ms per measurement "
+              f"({summary['after_lcp_median_ms']}ms after LCP), below floor {summary['below_floor']}, "
+              f"deadline hits {summary['deadline_hits']}")
+    if result.get('e2e'):
+        e2e = result['e2e']
+        print(f"- e2e: {e2e['total_ms'] / 1000:.1f}s total, compare {e2e['comparison_wall_ms'] / 1000:.1f}s, "
+              f"{e2e['decisions_correct']}/{len(e2e['decisions'])} decisions as expected")
+    
+    path = save_result(result)
+    print(f"\n💾 Benchmark results saved to: {path}")
+    
+    baseline = Path(args.baseline) if args.baseline else latest_result(path.parent, exclude=path)
+    if baseline and baseline.exists():
+        print(f"\n📉 Compared with {baseline}:")
+        with open(baseline) as f:
+            regressions = compare_results(json.load(f), result)
+        if regressions and args.fail_on_regression:
+            print(f"❌ {len(regressions)} regressions")
+            sys.exit(1)
 
 def run_agent_script(args):
     """Run the original agent scripts"""
@@ -74,21 +237,31 @@ def run_agent_script(args):
 
 def run_pipeline(args):
     """Run the complete pipeline: generate report and apply suggestions"""
-    import time
     from pathlib import Path
     from agent.report_apply_flow import ReportApplyFlow
+    from agent.src.coverage import CoverageReport
+    from agent.src.pipeline_stages import (PipelineStages, ReportError, StageCheckpoint, checkpoint_path_for,
+                                           emit_handshake, run_report_process)
+    from agent.src.results_store import ResultsStore
+    from agent.src.sampling import SamplingPlan
+    from agent.src.tracing import tracer
     import asyncio
     import csv
     from datetime import datetime
     
+    # One timestamp names every file this run leaves in final_output/<host>/
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    hostname = url_to_folder_name(args.url)
+    trace_path = Path("final_output") / hostname / f"trace_{timestamp}.json"
+    tracer.configure(profiler=args.profile, profile_dir=trace_path.parent / f"profiles_{timestamp}")
+    
     print("🚀 Starting automated performance optimization pipeline")
     print(f"📍 Target URL: {args.url}")
     print(f"📱 Device: {args.device}")
     print(f"🤖 Model: {args.model or 'default'}")
     print("-" * 60)
     
-    # Step 1: Generate the report
-    print("\n📊 Step 1: Generating performance report...")
+    # The report and the asset capture are independent, so they run side by side
     report_cmd = [
         "node", "report/index.js",
         "--action", "prompt",
@@ -102,122 +275,156 @@ def run_pipeline(args):
     if args.model:
         report_cmd.extend(["--model", args.model])
     
-    print(f"Running: {' '.join(report_cmd)}")
-    result = subprocess.run(report_cmd, capture_output=True, text=True)
-    
-    if result.returncode != 0:
-        print(f"❌ Error generating report: {result.stderr}")
-        return
-    
-    # Extract the report path from the output
-    report_path = None
-    for line in result.stdout.split('\n'):
-        if 'Report saved to:' in line or 'reports/' in line:
-            # Try to find the path
-            parts = line.split()
-            for part in parts:
-                if 'reports/' in part and '.md' in part:
-                    report_path = part.strip()
-                    break
-    
-    # If we couldn't find it in output, look for the most recent report
-    if not report_path:
-        reports_dir = Path("reports")
-        if reports_dir.exists():
-            # Get the most recent .summary.md file
-            md_files = list(reports_dir.glob("*.summary.md"))
-            if md_files:
-                report_path = str(max(md_files, key=lambda p: p.stat().st_mtime))
-    
-    if not report_path or not Path(report_path).exists():
-        print("❌ Could not find generated report. Please check the output.")
-        return
-    
-    print(f"✅ Report generated: {report_path}")
-    
-    # Optional delay to ensure file is fully written
-    time.sleep(2)
-    
-    # Step 2: Apply the suggestions
-    print(f"\n🔧 Step 2: Applying performance suggestions...")
-    print(f"📄 Using report: {report_path}")
+    # The report path is filled in once the generator announces it
+    flow = ReportApplyFlow(
+        report_path=None,
+        url=args.url,
+        device=args.device,
+        headless=args.headless,
+        replay=not args.live,
+        concurrency=args.concurrency,
+        sampling=SamplingPlan(max_samples=args.samples, warmup=args.warmup),
+        llm_cache=not args.no_llm_cache,
+        apply_workers=args.apply_workers,
+        llm_rpm=args.llm_rpm,
+        measurement_cache=not args.no_measurement_cache,
+        recapture=args.recapture,
+        serve_encoding=args.serve_encoding,
+        ablation=args.ablation,
+        ablation_top=args.ablation_top,
+        ablation_budget_s=args.ablation_budget,
+        coverage=args.coverage,
+        coverage_prune=args.coverage_prune,
+        capture_max_age_h=args.capture_max_age
+    )
+    stages = PipelineStages()
+    # Stages an interrupted run of this URL already finished are skipped with --resume
+    output_root = Path("output") / hostname
+    checkpoint = StageCheckpoint(checkpoint_path_for(output_root), output_root, resume=args.resume)
+    if checkpoint.done('capture'):
+        # That run's capture is the one to keep, even with --recapture or past --capture-max-age
+        flow.recapture = False
+        flow.capture_max_age_h = None
+    
+    def announce(**fields):
+        """Tell a parent `run.py batch` how this pipeline ended"""
+        if args.handshake:
+            emit_handshake('pipeline', url=args.url, **fields)
+    
+    async def report_stage():
+        print(f"\n📊 Step 1: Generating performance report...")
+        done = checkpoint.done('report')
+        if done and Path(done['path']).exists():
+            print(f"♻️  Reusing the report of an interrupted run: {done['path']}")
+            return done['path']
+        async with stages.stage('report'):
+            report_path = await run_report_process(report_cmd)
+        checkpoint.mark('report', path=report_path)
+        return report_path
+    
+    async def capture_stage(report_task):
+        print(f"\n🌐 Step 1b: Capturing website assets while the report runs...")
+        if flow.can_replay_capture():
+            # Nothing to fetch: load once the report's browser is gone,
+            # so the load is as clean as any master sample
+            print("⏳ The capture replays an earlier one; waiting for the report so it counts as a master sample")
+            await asyncio.wait({report_task})
+        async with stages.stage('capture'):
+            perf_data, _ = await flow.fetch_website_assets()
+        if not report_task.done():
+            flow.discard_capture_sample("the report generator's browser was running at the same time")
+        checkpoint.mark('capture')
+        # Their loads are compared with (and stored next to) uncontended samples, so they
+        # wait for the report's browser too; their tables are added to the report text below
+        if (args.ablation or flow.coverage) and not report_task.done():
+            print("⏳ Waiting for the report generator before measuring ablations and coverage")
+            await asyncio.wait({report_task})
+        if args.ablation:
+            done = checkpoint.done('ablation')
+            if done:
+                flow.ablation_results, flow.ablation_baseline_ms = done['results'], done['baseline_ms']
+                print(f"♻️  Reusing {len(flow.ablation_results)} ablation results of an interrupted run")
+            else:
+                async with stages.stage('ablation'):
+                    await flow.ablate_resources(perf_data)
+                checkpoint.mark('ablation', results=flow.ablation_results, baseline_ms=flow.ablation_baseline_ms)
+        if flow.coverage:
+            done = checkpoint.done('coverage')
+            if done:
+                flow.coverage_report = CoverageReport.from_dict(done['report']) if done['report'] else None
+                flow.extra_branches.extend(done['branches'])
+                print("♻️  Reusing the coverage report of an interrupted run")
+            else:
+                async with stages.stage('coverage'):
+                    await flow.capture_coverage()
+                checkpoint.mark('coverage', report=flow.coverage_report.to_dict() if flow.coverage_report else None,
+                                branches=flow.extra_branches)
     
     async def run_flow_with_results():
         """Async function to run the flow and capture results"""
-        flow = ReportApplyFlow(
-            report_path=report_path,
-            url=args.url,
-            device=args.device,
-            headless=args.headless
-        )
-        
         # Store performance results
         performance_results = []
         
-        print("🚀 Starting Report Apply Flow\n")
+        report_task = asyncio.create_task(report_stage())
+        capture_task = asyncio.create_task(capture_stage(report_task))
+        try:
+            report_path, _ = await asyncio.gather(report_task, capture_task)
+        except ReportError as e:
+            print(f"❌ Error generating report: {e}")
+            announce(error=f"Error generating report: {e}")
+            return None
+        finally:
+            # Neither stage may outlive a failed sibling: the capture uses the browser
+            # pool closed after this, and the report generator makes paid LLM calls
+            for task in (report_task, capture_task):
+                task.cancel()
+            await asyncio.gather(report_task, capture_task, return_exceptions=True)
         
-        # Read the report
-        report_data = flow.read_report()
+        if not report_path or not Path(report_path).exists():
+            print(f"❌ Could not find generated report ({report_path}). Please check the output.")
+            announce(error=f"Announced report not found: {report_path}")
+            return None
+        
+        print(f"✅ Report generated: {report_path}")
+        flow.report_path = Path(report_path)
         
-        # Fetch website assets
-        await flow.fetch_website_assets()
+        # Step 2: Apply the suggestions
+        print(f"\n🔧 Step 2: Applying performance suggestions...")
+        report_data = flow.read_report()
         
-        # Parse suggestions
+        # Parse suggestions and apply each one as soon as it is streamed in
         if isinstance(report_data, dict) and 'content' in report_data:
-            suggestions = flow.parse_suggestions(report_data['content'])
+            report_content = report_data['content']
         else:
-            suggestions = flow.parse_suggestions(str(report_data))
+            report_content = str(report_data)
+        report_content = flow.with_measurements(report_content)
+        async with stages.stage('suggest+apply'):
+            flow.apply_suggestions(flow.stream_suggestions(report_content), checkpoint=checkpoint)
+        suggestions = flow.suggestions
         
-        # Apply suggestions
         if suggestions:
-            flow.apply_suggestions()
-            
-            # Re-test performance for each branch
-            print("\n📊 Performance comparison:")
-            print("-" * 50)
-            
-            # Test original
-            original_data, _, original_lcp = await flow.retest_performance("master")
-            print(f"Original LCP: {original_lcp}ms")
-            performance_results.append({
-                'version': 'Original',
-                'branch': 'master',
-                'lcp_ms': original_lcp,
-                'improvement_ms': 0,
-                'improvement_percent': 0.0
-            })
-            
-            # Test each suggestion branch
-            for idx in range(1, len(suggestions) + 1):
-                branch_name = f"perf-fix-{idx}"
-                try:
-                    _, _, modified_lcp = await flow.retest_performance(branch_name)
-                    improvement = original_lcp - modified_lcp
-                    percent = (improvement / original_lcp) * 100 if original_lcp > 0 else 0
-                    
-                    print(f"{branch_name} LCP: {modified_lcp}ms "
-                          f"({'✅ ' if improvement > 0 else '❌ '}"
-                          f"{improvement:+.0f}ms, {percent:+.1f}%)")
-                    
-                    performance_results.append({
-                        'version': f'Optimization {idx}',
-                        'branch': branch_name,
-                        'lcp_ms': modified_lcp,
-                        'improvement_ms': improvement,
-                        'improvement_percent': round(percent, 1)
-                    })
-                except Exception as e:
-                    print(f"{branch_name}: Error - {str(e)}")
-            
-            # Return to master branch
-            subprocess.run(['git', 'checkout', 'master'], 
-                         cwd=flow.output_dir, check=True)
+            # Re-test master and every branch concurrently
+            async with stages.stage('compare'):
+                performance_results = await flow.compare_branches(len(suggestions))
         
-        return performance_results, flow.output_dir, len(suggestions) if suggestions else 0
+        return performance_results, flow.output_dir, len(suggestions) if suggestions else 0, report_path
+    
+    async def run_flow_and_close():
+        try:
+            return await run_flow_with_results()
+        finally:
+            await flow.close()
     
     try:
         # Run the async flow
-        performance_results, output_dir, suggestions_count = asyncio.run(run_flow_with_results())
+        with tracer.span('pipeline', url=args.url, device=args.device):
+            outcome = asyncio.run(run_flow_and_close())
+        if outcome is None:
+            return
+        performance_results, output_dir, suggestions_count, report_path = outcome
+        
+        print("\n⏱️  Stage timings:")
+        print(stages.summary())
         
         print("\n✅ Pipeline completed successfully!")
         print("\n📈 Summary:")
@@ -225,15 +432,33 @@ def run_pipeline(args):
         print(f"- Optimized assets: output/{url_to_folder_name(args.url)}/")
         print(f"- Git branches created: perf-fix-1 through perf-fix-{suggestions_count}")
         
+        summary_filename = None
+        # Run summary, saved as JSON below when there are results to compare
+        summary = {
+            'url': args.url,
+            'device': args.device,
+            'model': args.model,
+            'timestamp': timestamp,
+            'report_path': report_path,
+            'output_directory': f"output/{url_to_folder_name(args.url)}/",
+            'performance_results': performance_results,
+            'suggestions_count': suggestions_count,
+            'apply_results': list(flow.apply_results.values()),
+            'comparison_wall_ms': round(flow.comparison_wall_ms),
+            'retest_concurrency': args.concurrency,
+            'stage_timings': stages.stages,
+            'trace': str(trace_path),
+            'baseline_capture': flow.capture_summary(),
+            'ablation': flow.ablation_results,
+            'coverage': flow.coverage_report.to_dict() if flow.coverage_report else None
+        }
+        
         # Save performance results to CSV
         if performance_results:
             # Create final_output directory
             final_output_dir = Path("final_output")
             final_output_dir.mkdir(exist_ok=True)
             
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            hostname = url_to_folder_name(args.url)
-            
             # Create domain-specific subdirectory
             domain_dir = final_output_dir / hostname
             domain_dir.mkdir(exist_ok=True)
@@ -242,11 +467,14 @@ def run_pipeline(args):
             csv_filename = domain_dir / f"performance_results_{timestamp}.csv"
             
             with open(csv_filename, 'w', newline='') as csvfile:
-                fieldnames = ['version', 'branch', 'lcp_ms', 'improvement_ms', 'improvement_percent']
+                fieldnames = ['version', 'branch', 'lcp_ms', 'improvement_ms', 'improvement_percent',
+                              'lcp_p75_ms', 'lcp_ci_low_ms', 'lcp_ci_high_ms', 'samples', 'decision',
+                              'fcp_ms', 'ttfb_ms', 'tbt_ms', 'cls', 'lcp_samples']
                 writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
                 
                 writer.writeheader()
-                writer.writerows(performance_results)
+                for row in performance_results:
+                    writer.writerow({**row, 'lcp_samples': ' '.join(str(x) for x in row['lcp_samples'])})
             
             print(f"\n📊 Performance results saved to: {csv_filename}")
             
@@ -263,29 +491,32 @@ def run_pipeline(args):
                 dest_yaml = domain_dir / f"suggestions_{timestamp}.yaml"
                 shutil.copy2(source_yaml, dest_yaml)
             
-            # Create comprehensive summary JSON in domain subdirectory
-            summary = {
-                'url': args.url,
-                'device': args.device,
-                'model': args.model,
-                'timestamp': timestamp,
-                'report_path': report_path,
-                'output_directory': f"output/{url_to_folder_name(args.url)}/",
-                'performance_results': performance_results,
-                'suggestions_count': suggestions_count
-            }
-            
             summary_filename = domain_dir / f"optimization_summary_{timestamp}.json"
             with open(summary_filename, 'w') as f:
                 json.dump(summary, f, indent=2)
             
             print(f"📋 Summary saved to: {summary_filename}")
+            
             print(f"\n✅ All results saved to: final_output/{hostname}/")
         
+        # Index every run, also those without suggestions or results, so history has no gaps
+        store = ResultsStore()
+        store.record_run(summary, flow.suggestions,
+                         source=str(summary_filename.resolve()) if summary_filename else None)
+        store.close()
+        print(f"🗄️  Run recorded in: {store.path}")
+        
+        announce(summary=str(summary_filename.resolve()) if summary_filename else None,
+                 suggestions=suggestions_count)
+        checkpoint.clear()
+        
     except Exception as e:
         print(f"❌ Error applying suggestions: {str(e)}")
+        announce(error=str(e))
         import traceback
         traceback.print_exc()
+    finally:
+        save_trace(trace_path)
 
 def main():
     parser = argparse.ArgumentParser(
@@ -323,6 +554,7 @@ Examples:
     apply_parser.add_argument("--url", required=True, help="URL of the website")
     apply_parser.add_argument("--device", choices=["mobile", "desktop"], default="desktop")
     apply_parser.add_argument("--headless", action="store_true", help="Run browser in headless mode")
+    add_flow_arguments(apply_parser)
     
     # Pipeline command (new!)
     pipeline_parser = subparsers.add_parser("pipeline", help="Run complete pipeline (report + apply)")
@@ -331,6 +563,47 @@ Examples:
     pipeline_parser.add_argument("--model", help="LLM model to use (e.g., gpt-4o, gemini-2.0-flash-exp)")
     pipeline_parser.add_argument("--skip-cache", action="store_true", help="Skip cache for report generation")
     pipeline_parser.add_argument("--headless", action="store_true", default=True, help="Run browser in headless mode")
+    add_flow_arguments(pipeline_parser)
+    pipeline_parser.add_argument("--handshake", action="store_true", help="Print one JSON line with the summary path when done")
+    pipeline_parser.add_argument("--resume", action="store_true", help="Skip the stages an interrupted run of this URL already finished")
+    
+    # Batch command
+    batch_parser = subparsers.add_parser("batch", help="Run the pipeline for many URLs, resumably")
+    batch_parser.add_argument("--urls", required=True, help="Sitemap XML, JSON array or text file with one URL per line")
+    batch_parser.add_argument("--device", choices=["mobile", "desktop"], default="mobile")
+    batch_parser.add_argument("--model", help="LLM model to use (e.g., gpt-4o, gemini-2.0-flash-exp)")
+    batch_parser.add_argument("--skip-cache", action="store_true", help="Skip cache for report generation")
+    add_flow_arguments(batch_parser)
+    batch_parser.add_argument("--workers", type=int, default=4, help="Number of URLs to run at the same time (default: 4)")
+    batch_parser.add_argument("--per-host", type=int, default=1, help="Maximum URLs of the same host at the same time (default: 1)")
+    batch_parser.add_argument("--retries", type=int, default=2, help="Retries per failed URL (default: 2)")
+    batch_parser.add_argument("--backoff", type=float, default=30, help="Initial retry delay in seconds, doubled on each retry (default: 30)")
+    batch_parser.add_argument("--state", default="final_output/batch_state.json", help="Progress file used to resume an interrupted batch")
+    
+    # Results database command
+    results_parser = subparsers.add_parser("results", help="Query or import the results database")
+    results_parser.add_argument("action", choices=["import", "runs", "history", "show"], help="What to do")
+    results_parser.add_argument("--db", default="final_output/results.db", help="Path to the results database")
+    results_parser.add_argument("--root", default="final_output", help="Directory to import existing results from")
+    results_parser.add_argument("--url", help="Only runs of this URL")
+    results_parser.add_argument("--host", help="Only runs of this host")
+    results_parser.add_argument("--device", choices=["mobile", "desktop"], help="Only runs on this device")
+    results_parser.add_argument("--since", help="Only runs on or after this date (YYYY-MM-DD)")
+    results_parser.add_argument("--limit", type=int, default=50, help="Maximum runs to list (default: 50)")
+    results_parser.add_argument("--run", type=int, help="Run id for `show`")
+    
+    # Benchmark command
+    bench_parser = subparsers.add_parser("bench", help="Benchmark measurement and the pipeline on a local fixture site")
+    bench_parser.add_argument("--scenarios", help="Comma-separated fixture scenarios (default: all)")
+    bench_parser.add_argument("--device", choices=["mobile", "desktop"], default="desktop")
+    bench_parser.add_argument("--runs", type=int, default=5, help="Measurements per scenario (default: 5)")
+    bench_parser.add_argument("--warmup", type=int, default=1, help="Discarded measurements before the first run (default: 1)")
+    bench_parser.add_argument("--no-e2e", action="store_true", help="Skip the end-to-end pipeline run")
+    bench_parser.add_argument("--e2e-samples", type=int, default=5, help="Maximum LCP samples per branch in the end-to-end run (default: 5)")
+    add_concurrency_argument(bench_parser)
+    bench_parser.add_argument("--port", type=int, default=8765, help="Port of the fixture server (default: 8765)")
+    bench_parser.add_argument("--baseline", help="Earlier benchmark JSON to compare with (default: the latest one)")
+    bench_parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 when a metric regressed")
     
     # Agent scripts command
     agent_parser = subparsers.add_parser("agent", help="Run agent scripts")
@@ -356,6 +629,12 @@ Examples:
         apply_report(args)
     elif args.command == "pipeline":
         run_pipeline(args)
+    elif args.command == "batch":
+        run_batch(args)
+    elif args.command == "results":
+        run_results(args)
+    elif args.command == "bench":
+        run_bench(args)
     elif args.command == "agent":
         run_agent_script(args)
 